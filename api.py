@@ -3,114 +3,375 @@ API Client
 """
 
 import os
-import threading
+from concurrent.futures import Future
+from typing import Callable, Iterator
 
 import requests
 
 from config import config
-from image.management import check_wallpapers, delete_files, generate_code
-from image.processing import process_image
+from fleet import publish_manifest, save_manifest
+from image.cache import (
+    ARCHIVE_VARIANTS,
+    discard_cached,
+    get_render_key,
+    get_render_path,
+    get_source_variant,
+    has_original,
+    render_frame,
+    rerender_files,
+    save_original,
+)
+from image.management import check_wallpapers_batch, delete_files
+from image.retention import archive, get_latest_day
+from journal import journal
 from logger import app_logger
+from polling import poller
+from records import Record, iter_json_batches
+from region import select_records
+from scheduler import JobScheduler, check_timeout, start_timeout
+from sync_profiler import profiled
+from throttle import is_bulk_allowed, limiter
 
+# maximum time of downloading and processing a single image in seconds, counted from the start of the transfer
+DOWNLOAD_TIMEOUT = 5 * 60
 
-def check_new_data() -> None:
+CHUNK_SIZE = 64 * 1024
+
+scheduler = JobScheduler(max_workers=4, name="Downloader")
+
+# validators and records of the last API response by url, unchanged data are not sent again
+last_responses: dict[str, tuple[dict[str, str], list[Record]]] = {}
+
+
+@profiled
+def check_new_data(on_latest: Callable[[str], None] | None = None) -> None:
     """
     Checks whether new data are available and, if available, triggers recording
+
+    Images are downloaded in background from the newest one, function waits only for the newest image. Missing
+    images are scheduled while the response is still being received unless frames are selected by region or
+    downloads are deferred. In fleet mode data are taken from the upstream instance instead of EPIC
+    :param on_latest: called with path of the newest image as soon as it is ready
     :return: None
     """
-    # get last image
     try:
-        app_logger.info("Connecting to API")
-        response = requests.get("https://epic.gsfc.nasa.gov/api/natural", timeout=30)
-        response.raise_for_status()
-        response_json = response.json()
+        # check actual wallpapers
+        latest, valid, invalid = check_wallpapers_batch()
 
-        app_logger.debug("Response parsed to json")
+        # render again files invalidated e.g. by change of resolution, originals are stored so no download is needed
+        rendered = rerender_files(invalid)
+        if rendered:
+            valid = valid + rendered
+            invalid = [file for file in invalid if file not in rendered]
+            latest = max(valid)
 
-        last_record = response_json[-1]
+        # delete invalid files and folders
+        delete_files(invalid)
+        if config.retention_enabled:
+            archive.discard(invalid)
+            archive.adopt(valid)
+            archive.enforce(protected=set(get_latest_day(valid)))
 
-        # generate code
-        code = generate_code(last_record["date"])
+        # get records, the first downloads start before the whole response is received
+        app_logger.info("Connecting to API")
+        stored = set(valid)
+        streamed = config.region is None and (bool(config.fleet_url) or is_bulk_allowed())
+        all_records: list[Record] = []
+        futures: dict[str, Future[str | None]] = {}
+        for batch in fetch_records(f"{config.fleet_url or config.api_url}/api/natural"):
+            priority = -len(all_records)
+            all_records.extend(batch)
+            if streamed:
+                # records of every chunk are scheduled from the newest so idle workers start with it, later chunks
+                # contain newer records so they get higher priority
+                ordered = sorted(enumerate(batch), key=lambda pair: pair[1].code, reverse=True)
+                ordered = [(index, record) for index, record in ordered if f"{record.code}.png" not in stored]
+                journal.add_many({record.code: record.image for _, record in ordered})
+                for index, record in ordered:
+                    futures[record.code] = submit_download(record, priority=priority - index - 1)
+        if config.fleet_port:
+            save_manifest(all_records)
 
-        # check actual wallpapers
-        latest, valid, invalid = check_wallpapers()
+        # only frames showing the configured region are downloaded
+        records = all_records
+        if config.region is not None:
+            records = select_records(records, config.region, config.region_frames, config.region_max_angle)
+        if not records:
+            app_logger.warning("No frames to download")
+            return
 
-        # delete invalid files and folders
-        delete_files(invalid)
+        code = records[-1].code
+        if config.adaptive_polling:
+            poller.observe(code)
 
         # check for new images
-        if not latest or latest < code:
+        # the newest frame may be missing while a newer one is stored, e.g. frame not showing the region
+        if not latest or latest < code or f"{code}.png" not in stored:
+            if not config.fleet_url and not is_bulk_allowed():
+                app_logger.info(f"New images available, downloads deferred to hours {config.bulk_hours}")
+                return
 
-            # download the latest photos
-            for record in response_json:
-                start_thread(record)
+            # download the latest photos which are not stored or scheduled yet
+            missing = [
+                record for record in records if f"{record.code}.png" not in stored and record.code not in futures
+            ]
+            missing.sort(key=lambda record: record.code, reverse=True)
+            futures.update(zip((record.code for record in missing), schedule_downloads(missing)))
 
-            # delete old valid
-            delete_files(valid)
+            # delete old valid, in retention mode they are kept in the archive
+            if not config.retention_enabled:
+                codes = {record.code for record in records}
+                old = [file for file in valid if file[:14] not in codes]
+                delete_files(old)
+                discard_cached(old)
 
-        app_logger.info("Join working threads")
-        for thread in threading.enumerate()[2:]:
-            thread.join()
-        app_logger.info("All threads joined")
+            if futures:
+                wait_for_latest(futures[max(futures)], on_latest)
 
     except requests.exceptions.ConnectionError as exception:
         app_logger.critical(f"Connection Error: {exception}")
+    except (requests.exceptions.RequestException, ValueError) as exception:
+        app_logger.critical(f"API response can't be used: {exception!r}")
 
 
-def start_thread(record: dict[str, str]) -> None:
+def fetch_records(url: str) -> Iterator[list[Record]]:
+    """
+    Get records from API with conditional request, records are parsed from the response stream as they arrive,
+    records of the previous response are reused when the server answers 304 Not Modified
+    :param url: url of the API endpoint
+    :return: iterator of lists of records parsed from every received chunk, in order of the response
+    :raises requests.exceptions.HTTPError: when server returns error status
+    :raises requests.exceptions.RequestException: when response is interrupted
+    :raises ValueError: when response is not a JSON array of records
     """
-    Collect data from API record, create and start thread
+    validators, records = last_responses.get(url, ({}, []))
+    with requests.get(url, headers=validators, timeout=30, stream=True) as response:
+        if response.status_code == 304 and url in last_responses:
+            app_logger.info("API data not modified since the last sync")
+            yield records
+            return
+        response.raise_for_status()
+        records = []
+        try:
+            for items in iter_json_batches(response.iter_content(CHUNK_SIZE)):
+                batch = [Record.from_json(item) for item in items]
+                records.extend(batch)
+                yield batch
+        except (KeyError, TypeError, AttributeError) as exception:
+            raise ValueError(f"Invalid record in API response: {exception!r}") from exception
+        app_logger.debug(f"{len(records)} records parsed from response")
+        validators = {}
+        if response.headers.get("ETag"):
+            validators["If-None-Match"] = response.headers["ETag"]
+        if response.headers.get("Last-Modified"):
+            validators["If-Modified-Since"] = response.headers["Last-Modified"]
+    last_responses[url] = (validators, records)
+
+
+def schedule_downloads(records: list[Record]) -> list[Future[str | None]]:
+    """
+    Schedule download of every record, the newest image gets the highest priority
+    :param records: records of the data from API
+    :return: futures of the jobs ordered from the newest image
+    """
+    records = sorted(records, key=lambda record: record.code, reverse=True)
+    # the journal is saved once for all jobs
+    journal.add_many({record.code: record.image for record in records})
+    return [submit_download(record, priority) for priority, record in enumerate(records)]
+
+
+def submit_download(record: Record, priority: int = 0) -> Future[str | None]:
+    """
+    Schedule download job of record which is already in the journal
     :param record: record of the data from API
-    :return: nothing
-    """
-    date = record["date"]
-    code = generate_code(date)
-    thread_name = f"Thread_{record['image']}"
-    kwargs = {"code": code, "image_name": record["image"]}
-    # create Thread object
-    thread = threading.Thread(
-        target=download_and_save_image,
-        name=thread_name,
-        kwargs=kwargs,
-        daemon=True,
+    :param priority: lower value is downloaded first
+    :return: future of the job
+    """
+    kwargs = {"code": record.code, "image_name": record.image}
+    app_logger.debug(f"New job scheduled with kwargs: {kwargs}")
+    return scheduler.submit(
+        record.image,
+        download_and_save_image,
+        priority=priority,
+        timeout=DOWNLOAD_TIMEOUT,
+        defer_timeout=True,
+        **kwargs,
     )
-    app_logger.debug(f"New thread initialized with kwargs: {kwargs}")
 
-    # start Thread object
-    thread.start()
 
+def resume_downloads() -> list[Future[str | None]]:
+    """
+    Schedule jobs left in the journal by the previous run, finished steps are not repeated
+    :return: futures of the jobs ordered from the newest image
+    """
+    entries = dict(journal.entries)
+    if entries:
+        states = ", ".join(f"{code} {entry['state']}" for code, entry in sorted(entries.items()))
+        app_logger.info(f"Resuming {len(entries)} unfinished jobs: {states}")
+    return schedule_downloads([Record(entry["image"], code) for code, entry in entries.items()])
 
-def download_and_save_image(code: str, image_name: str) -> None:
+
+def shutdown_downloads(timeout: float) -> bool:
+    """
+    Cancel waiting jobs and wait for running ones, unfinished jobs stay in the journal for the next start
+    :param timeout: maximum time of waiting for running jobs in seconds
+    :return: True if no job was interrupted
+    """
+    cancelled = scheduler.cancel_all()
+    finished = scheduler.wait(timeout)
+    unfinished = len(journal.entries)
+    app_logger.info(f"Downloads stopped, {cancelled} waiting jobs cancelled, {unfinished} jobs left in the journal")
+    if not finished:
+        app_logger.warning(f"Jobs {scheduler.pending()} didn't finish in {timeout} seconds")
+    return finished
+
+
+def wait_for_latest(future: Future[str | None], on_latest: Callable[[str], None] | None) -> None:
+    """
+    Wait for the newest image and publish it, other jobs continue in background
+    :param future: future of the newest image job
+    :param on_latest: called with path of the newest image
+    :return: None
+    """
+    try:
+        image_path = future.result(timeout=DOWNLOAD_TIMEOUT)
+    except Exception as exception:  # pylint: disable=broad-exception-caught
+        app_logger.error(f"The newest image is not ready: {exception!r}")
+        return
+    app_logger.info(f"The newest image is ready, {len(scheduler.pending())} jobs in background")
+    if image_path and on_latest:
+        on_latest(image_path)
+
+
+def get_archive_url(code: str, image_name: str, variant: str) -> str:
+    """
+    Construct url of the image in EPIC archive
+    :param code: Date and time of taking the picture recorded in a string
+    :param image_name: Name of image in api
+    :param variant: archive variant, png, jpg or thumbs
+    :return: url
+    """
+    extension = ARCHIVE_VARIANTS[variant][0]
+    return f"{config.api_url}/archive/natural/{code[0:4]}/{code[4:6]}/{code[6:8]}/{variant}/{image_name}.{extension}"
+
+
+def fetch_archive_image(url: str) -> bytes | None:
+    """
+    Download image from EPIC archive within limits of download rate and number of concurrent transfers, timeout of
+    the download job starts when the transfer begins
+    :param url: url of the image
+    :return: content of the image or None if it is not available
+    :raises TimeoutError: when the download job exceeded its timeout
+    """
+    with limiter.transfer():
+        start_timeout()
+        with requests.get(url, timeout=30, stream=True) as response:
+            if response.status_code != 200:
+                return None
+            content = bytearray()
+            for chunk in response.iter_content(CHUNK_SIZE):
+                check_timeout()
+                limiter.consume(len(chunk))
+                content += chunk
+    return bytes(content)
+
+
+def download_and_save_image(code: str, image_name: str) -> str | None:
     """
     Downloads and saves an image in a folder
+
+    The original is kept in the data folder and the wallpaper is rendered from it, if the original is already
+    stored it is only rendered. The smallest archive variant covering the screen height is downloaded unless
+    source quality is set. In fleet mode rendered wallpaper is downloaded from the upstream instance instead, the
+    original is downloaded from EPIC in bulk hours when upstream can't render the frame for current settings. Frame
+    which upstream hasn't stored yet is left for the next sync
     Image name:
         YearMonthDayHourMinuteSecond
     Format:
         PNG
     :param code: Date and time of taking the picture recorded in a string
     :param image_name: Name of image in api
-    :return: None
+    :return: path to saved image or None if image was not downloaded
     """
     try:
-        app_logger.debug("Connecting to image archive and downloading image")
-        request = requests.get(
-            f"https://epic.gsfc.nasa.gov/archive/natural/" f"{code[0:4]}/{code[4:6]}/{code[6:8]}/png/{image_name}.png",
-            timeout=30,
-        )
-        if request.status_code == 200:
-            # path to image
+        from_upstream = bool(config.fleet_url)
+        if from_upstream and not os.path.isfile(get_render_path(code)):
+            try:
+                if not download_render(code):
+                    return None
+            except FileNotFoundError as exception:
+                # e.g. upstream stores smaller variant than this screen needs, frame is rendered from EPIC original
+                if not is_bulk_allowed():
+                    app_logger.info(f"{exception}, download from EPIC deferred to hours {config.bulk_hours}")
+                    return None
+                app_logger.warning(f"{exception}, original is downloaded from EPIC")
+                from_upstream = False
+        if not from_upstream and not has_original(code):
+            variant = get_source_variant()
+            app_logger.debug(f"Connecting to image archive and downloading image in variant {variant}")
+            content = fetch_archive_image(get_archive_url(code, image_name, variant))
+            if content is None:
+                return None
             app_logger.debug("Image downloaded")
-            image_path = os.path.join(config.image_path, code + ".png")
-
-            # save image
-            app_logger.debug("Image saving")
-            with open(image_path, "wb") as f:
-                f.write(request.content)
-            app_logger.debug("Image saved")
-
-            # resize image
-            app_logger.debug("Image processing")
-            process_image(image_path, code)
-            app_logger.debug("End of image processing")
+            save_original(code, content, variant)
+        journal.mark(code, "downloaded")
+        if config.fleet_port:
+            publish_manifest()
+
+        # resize image
+        app_logger.debug("Image processing")
+        image_path = render_frame(code)
+        app_logger.debug("End of image processing")
+        journal.mark(code, "rendered")
+
+        if config.retention_enabled:
+            archive.add(code + ".png")
+        return image_path
     except requests.exceptions.ConnectionError as exception:
         app_logger.error(f"Unknown exception: {exception}")
+    finally:
+        # job interrupted by shutdown never gets here and stays in the journal
+        journal.remove(code)
+    return None
+
+
+def download_render(code: str) -> bool:
+    """
+    Download frame rendered for current settings from the upstream instance into render cache, interrupted
+    download is resumed with range request (renders never change for the same cache key)
+    :param code: Date and time of taking the picture recorded in a string
+    :return: True if render was downloaded
+    :raises FileNotFoundError: when upstream can't provide the render
+    :raises TimeoutError: when the download job exceeded its timeout
+    """
+    start_timeout()
+    render_path = get_render_path(code)
+    part_path = f"{render_path}.part"
+    os.makedirs(os.path.dirname(render_path), exist_ok=True)
+    offset = os.path.getsize(part_path) if os.path.isfile(part_path) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+    app_logger.debug(f"Downloading render {code} from upstream instance, offset {offset}")
+    try:
+        with requests.get(
+            f"{config.fleet_url}/renders/{get_render_key()}/{code}.png", headers=headers, timeout=30, stream=True
+        ) as response:
+            if response.status_code == 416:
+                os.remove(part_path)
+                return False
+            if response.status_code == 404:
+                raise FileNotFoundError(f"Render {code} not available on upstream instance")
+            if response.status_code == 503:
+                app_logger.info(f"Frame {code} not stored on upstream instance yet")
+                return False
+            if response.status_code not in (200, 206):
+                app_logger.error(f"Upstream instance returned {response.status_code} for render {code}")
+                return False
+            with open(part_path, "ab" if response.status_code == 206 else "wb") as fp:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    check_timeout()
+                    fp.write(chunk)
+    except requests.exceptions.ChunkedEncodingError as exception:
+        app_logger.error(f"Download of render {code} interrupted: {exception}")
+        return False
+    os.replace(part_path, render_path)
+    return True
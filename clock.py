@@ -0,0 +1,98 @@
+"""
+Clock and sleep abstraction
+"""
+
+import datetime
+import threading
+import time
+
+
+class SystemClock:
+    """
+    Clock using system time, used by default
+    """
+
+    def time(self) -> float:
+        """
+        Current timestamp
+        :return: seconds since epoch
+        """
+        return time.time()
+
+    def now(self) -> datetime.datetime:
+        """
+        Current local date and time
+        :return: datetime
+        """
+        return datetime.datetime.fromtimestamp(self.time())
+
+    def sleep(self, seconds: float) -> None:
+        """
+        Block for given number of seconds
+        :param seconds: time to sleep
+        :return: None
+        """
+        time.sleep(seconds)
+
+
+class SimulatedClock(SystemClock):
+    """
+    Clock which moves only when somebody sleeps, sleeping returns immediately
+    """
+
+    def __init__(self, start: float) -> None:
+        """
+        Init clock
+        :param start: initial timestamp
+        """
+        self._time = start
+        self._lock = threading.Lock()
+        self.slept = 0.0
+
+    def time(self) -> float:
+        """
+        Current simulated timestamp
+        :return: seconds since epoch
+        """
+        with self._lock:
+            return self._time
+
+    def sleep(self, seconds: float) -> None:
+        """
+        Move clock forward without waiting
+        :param seconds: time to sleep
+        :return: None
+        """
+        self.advance(seconds)
+
+    def advance(self, seconds: float) -> None:
+        """
+        Move clock forward
+        :param seconds: time to move
+        :return: None
+        """
+        with self._lock:
+            self._time += max(seconds, 0)
+            self.slept += max(seconds, 0)
+
+
+_clock: SystemClock = SystemClock()
+
+
+def get_clock() -> SystemClock:
+    """
+    Get clock used by the app
+    :return: clock
+    """
+    return _clock
+
+
+def set_clock(clock: SystemClock) -> SystemClock:
+    """
+    Replace clock used by the app, e.g. with simulated one
+    :param clock: new clock
+    :return: previous clock
+    """
+    global _clock  # pylint: disable=global-statement
+    previous, _clock = _clock, clock
+    return previous
@@ -11,9 +11,26 @@ from typing import Any, Callable, Type
 
 from logger import app_logger
 
-SetterType = Callable[[Any, tuple[int, int] | str], None]
+SetterType = Callable[[Any, Any], None]
 
 HALF_AN_HOUR = 30 * 60
+ONE_DAY = 24 * 60 * 60
+ONE_KILOBYTE = 1024
+ONE_MEGABYTE = 1024 * 1024
+# time in seconds running downloads may take to finish after shutdown is requested
+SHUTDOWN_TIMEOUT = 30
+
+EPIC_URL = "https://epic.gsfc.nasa.gov"
+SOURCE_QUALITIES = ("auto", "thumbs", "jpg", "png")
+
+# value restored by safe_setter when validation fails, by annotated type
+SETTER_DEFAULTS: dict[str, Any] = {
+    "str": "",
+    "int": 0,
+    "bool": False,
+    "tuple[float, float] | None": None,
+    "tuple[int, int] | None": None,
+}
 
 
 def safe_setter(func: SetterType) -> SetterType:
@@ -22,15 +39,12 @@ def safe_setter(func: SetterType) -> SetterType:
     """
 
     @functools.wraps(func)
-    def wrapper(self: Any, value: tuple[int, int] | str) -> None:
+    def wrapper(self: Any, value: Any) -> None:
         try:
             func(self, value)
         except (ValueError, AttributeError) as exception:
             app_logger.critical(exception)
-            if self.__annotations__.get(f"{func.__name__}_type") == "str":
-                value = ""
-            else:
-                value = (0, 0)
+            value = SETTER_DEFAULTS.get(self.__annotations__.get(f"{func.__name__}_type"), (0, 0))
             setattr(self, f"_{func.__name__}", value)
 
     return wrapper
@@ -64,6 +78,24 @@ class Config(metaclass=ConfigMeta):
     resolution_type: tuple[int, int]
     image_path_type: str
     sync_interval_type: int
+    use_compositor_type: bool
+    data_path_type: str
+    retention_budget_type: int
+    retention_max_age_type: int
+    profiling_type: bool
+    api_url_type: str
+    source_quality_type: str
+    fleet_url_type: str
+    fleet_port_type: int
+    fleet_host_type: str
+    region_type: tuple[float, float] | None
+    region_frames_type: int
+    region_max_angle_type: int
+    download_rate_type: int
+    max_transfers_type: int
+    bulk_hours_type: tuple[int, int] | None
+    adaptive_polling_type: bool
+    shutdown_timeout_type: int
 
     def __init__(self) -> None:
         """
@@ -72,7 +104,26 @@ class Config(metaclass=ConfigMeta):
         self.resolution = self.get_screen_resolution()
         self.image_path = self.get_image_path()
         self.sync_interval = HALF_AN_HOUR
+        self.use_compositor = self.get_env_flag("NASA_API_COMPOSITOR")
+        self.data_path = self.get_data_path()
+        self.retention_budget = self.get_env_int("NASA_API_RETENTION_BUDGET_MB") * ONE_MEGABYTE
+        self.retention_max_age = self.get_env_int("NASA_API_RETENTION_DAYS") * ONE_DAY
+        self.profiling = self.get_env_flag("NASA_API_PROFILE")
+        self.api_url = os.environ.get("NASA_API_URL", EPIC_URL)
+        self.source_quality = os.environ.get("NASA_API_SOURCE_QUALITY", "auto").strip().lower()
+        self.fleet_url = os.environ.get("NASA_API_FLEET_URL", "")
+        self.fleet_port = self.get_env_int("NASA_API_FLEET_PORT")
+        self.fleet_host = os.environ.get("NASA_API_FLEET_HOST", "127.0.0.1").strip()
+        self.region = self.get_env_coordinates("NASA_API_REGION")
+        self.region_frames = self.get_env_int("NASA_API_REGION_FRAMES")
+        self.region_max_angle = self.get_env_int("NASA_API_REGION_MAX_ANGLE")
+        self.download_rate = self.get_env_int("NASA_API_DOWNLOAD_RATE_KB") * ONE_KILOBYTE
+        self.max_transfers = self.get_env_int("NASA_API_MAX_TRANSFERS")
+        self.bulk_hours = self.get_env_hours("NASA_API_BULK_HOURS")
+        self.adaptive_polling = self.get_env_flag("NASA_API_ADAPTIVE_POLLING")
+        self.shutdown_timeout = self.get_env_int("NASA_API_SHUTDOWN_TIMEOUT", SHUTDOWN_TIMEOUT)
         app_logger.info(f"Image path: {self.image_path}")
+        app_logger.info(f"Data path: {self.data_path}")
         app_logger.info(f"screen resolution: {self.resolution}")
 
     @property
@@ -143,6 +194,382 @@ class Config(metaclass=ConfigMeta):
             )
         self._sync_interval = value
 
+    @property
+    def use_compositor(self) -> bool:
+        """
+        Property for use_compositor
+        :return: True if frames are composed in pooled buffers
+        """
+        return self._use_compositor
+
+    @use_compositor.setter
+    @safe_setter
+    def use_compositor(self, value: bool) -> None:
+        """
+        Setter for use_compositor decorated by error logger
+        :param value: value to set
+        :return:
+        """
+        if not isinstance(value, bool):
+            raise ValueError(f"use_compositor should be of type bool, current {type(value)}")
+        self._use_compositor = value
+
+    @property
+    def data_path(self) -> str:
+        """
+        Property for data_path
+        :return: path to folder with application data (indexes, caches, reports)
+        """
+        return self._data_path
+
+    @data_path.setter
+    @safe_setter
+    def data_path(self, value: str) -> None:
+        """
+        Setter for data_path decorated by error logger
+        :param value: value to set
+        :return:
+        """
+        if not isinstance(value, str):
+            raise ValueError(f"data_path should be of type str, current {type(value)}")
+        self._data_path = value
+
+    @property
+    def retention_budget(self) -> int:
+        """
+        Property for retention_budget
+        :return: disk budget of the archive in bytes, 0 means no budget
+        """
+        return self._retention_budget
+
+    @retention_budget.setter
+    @safe_setter
+    def retention_budget(self, value: int) -> None:
+        """
+        Setter for retention_budget decorated by error logger
+        :param value: value to set
+        :return:
+        """
+        if not isinstance(value, int) or value < 0:
+            raise ValueError(f"retention_budget should be non-negative int, current {value!r}")
+        self._retention_budget = value
+
+    @property
+    def retention_max_age(self) -> int:
+        """
+        Property for retention_max_age
+        :return: maximum age of archived frames in seconds, 0 means no limit
+        """
+        return self._retention_max_age
+
+    @retention_max_age.setter
+    @safe_setter
+    def retention_max_age(self, value: int) -> None:
+        """
+        Setter for retention_max_age decorated by error logger
+        :param value: value to set
+        :return:
+        """
+        if not isinstance(value, int) or value < 0:
+            raise ValueError(f"retention_max_age should be non-negative int, current {value!r}")
+        self._retention_max_age = value
+
+    @property
+    def retention_enabled(self) -> bool:
+        """
+        Archive is kept when disk budget or age limit is set
+        :return: True if retention mode is on
+        """
+        return bool(self.retention_budget or self.retention_max_age)
+
+    @property
+    def profiling(self) -> bool:
+        """
+        Property for profiling
+        :return: True if sync cycles are profiled
+        """
+        return self._profiling
+
+    @profiling.setter
+    @safe_setter
+    def profiling(self, value: bool) -> None:
+        """
+        Setter for profiling decorated by error logger
+        :param value: value to set
+        :return:
+        """
+        if not isinstance(value, bool):
+            raise ValueError(f"profiling should be of type bool, current {type(value)}")
+        self._profiling = value
+
+    @property
+    def api_url(self) -> str:
+        """
+        Property for api_url
+        :return: base url of EPIC API and image archive
+        """
+        return self._api_url
+
+    @api_url.setter
+    @safe_setter
+    def api_url(self, value: str) -> None:
+        """
+        Setter for api_url decorated by error logger
+        :param value: value to set
+        :return:
+        """
+        if not isinstance(value, str) or not value.startswith(("http://", "https://")):
+            raise ValueError(f"api_url should be http or https url, current {value!r}")
+        self._api_url = value.rstrip("/")
+
+    @property
+    def source_quality(self) -> str:
+        """
+        Property for source_quality
+        :return: archive variant of downloaded images, auto chooses the smallest one covering the screen height
+        """
+        return self._source_quality
+
+    @source_quality.setter
+    @safe_setter
+    def source_quality(self, value: str) -> None:
+        """
+        Setter for source_quality decorated by error logger
+        :param value: value to set
+        :return:
+        """
+        if value not in SOURCE_QUALITIES:
+            raise ValueError(f"source_quality should be one of {SOURCE_QUALITIES}, current {value!r}")
+        self._source_quality = value
+
+    @property
+    def fleet_url(self) -> str:
+        """
+        Property for fleet_url
+        :return: url of upstream instance which frames are synced from, empty when syncing from EPIC
+        """
+        return self._fleet_url
+
+    @fleet_url.setter
+    @safe_setter
+    def fleet_url(self, value: str) -> None:
+        """
+        Setter for fleet_url decorated by error logger
+        :param value: value to set
+        :return:
+        """
+        if not isinstance(value, str) or (value and not value.startswith(("http://", "https://"))):
+            raise ValueError(f"fleet_url should be empty or http or https url, current {value!r}")
+        self._fleet_url = value.rstrip("/")
+
+    @property
+    def fleet_port(self) -> int:
+        """
+        Property for fleet_port
+        :return: port of fleet cache service for other instances, 0 when disabled
+        """
+        return self._fleet_port
+
+    @fleet_port.setter
+    @safe_setter
+    def fleet_port(self, value: int) -> None:
+        """
+        Setter for fleet_port decorated by error logger
+        :param value: value to set
+        :return:
+        """
+        if not isinstance(value, int) or not 0 <= value <= 65535:
+            raise ValueError(f"fleet_port should be a port number, current {value!r}")
+        self._fleet_port = value
+
+    @property
+    def fleet_host(self) -> str:
+        """
+        Property for fleet_host
+        :return: address fleet cache service listens on
+        """
+        return self._fleet_host
+
+    @fleet_host.setter
+    @safe_setter
+    def fleet_host(self, value: str) -> None:
+        """
+        Setter for fleet_host decorated by error logger
+        :param value: value to set
+        :return:
+        """
+        if not isinstance(value, str) or not value:
+            raise ValueError(f"fleet_host should be non-empty str, current {value!r}")
+        self._fleet_host = value
+
+    @property
+    def region(self) -> tuple[float, float] | None:
+        """
+        Property for region
+        :return: latitude and longitude of the region which should face the camera, None when all frames are used
+        """
+        return self._region
+
+    @region.setter
+    @safe_setter
+    def region(self, value: tuple[float, float] | None) -> None:
+        """
+        Setter for region decorated by error logger
+        :param value: value to set
+        :return:
+        """
+        match value:
+            case None:
+                self._region = None
+            case (int() | float() as lat, int() | float() as lon) if -90 <= lat <= 90 and -180 <= lon <= 180:
+                self._region = (float(lat), float(lon))
+            case _:
+                raise ValueError(f"region should be None or tuple of latitude and longitude, current {value!r}")
+
+    @property
+    def region_frames(self) -> int:
+        """
+        Property for region_frames
+        :return: number of frames closest to the region which are downloaded, 0 means no limit
+        """
+        return self._region_frames
+
+    @region_frames.setter
+    @safe_setter
+    def region_frames(self, value: int) -> None:
+        """
+        Setter for region_frames decorated by error logger
+        :param value: value to set
+        :return:
+        """
+        if not isinstance(value, int) or value < 0:
+            raise ValueError(f"region_frames should be non-negative int, current {value!r}")
+        self._region_frames = value
+
+    @property
+    def region_max_angle(self) -> int:
+        """
+        Property for region_max_angle
+        :return: maximum angular distance in degrees between the region and the centre of the frame, 0 means no limit
+        """
+        return self._region_max_angle
+
+    @region_max_angle.setter
+    @safe_setter
+    def region_max_angle(self, value: int) -> None:
+        """
+        Setter for region_max_angle decorated by error logger
+        :param value: value to set
+        :return:
+        """
+        if not isinstance(value, int) or not 0 <= value <= 180:
+            raise ValueError(f"region_max_angle should be int from 0 to 180, current {value!r}")
+        self._region_max_angle = value
+
+    @property
+    def download_rate(self) -> int:
+        """
+        Property for download_rate
+        :return: maximum total rate of image downloads in bytes per second, 0 means no limit
+        """
+        return self._download_rate
+
+    @download_rate.setter
+    @safe_setter
+    def download_rate(self, value: int) -> None:
+        """
+        Setter for download_rate decorated by error logger
+        :param value: value to set
+        :return:
+        """
+        if not isinstance(value, int) or value < 0:
+            raise ValueError(f"download_rate should be non-negative int, current {value!r}")
+        self._download_rate = value
+
+    @property
+    def max_transfers(self) -> int:
+        """
+        Property for max_transfers
+        :return: maximum number of concurrent image downloads, 0 means no limit
+        """
+        return self._max_transfers
+
+    @max_transfers.setter
+    @safe_setter
+    def max_transfers(self, value: int) -> None:
+        """
+        Setter for max_transfers decorated by error logger
+        :param value: value to set
+        :return:
+        """
+        if not isinstance(value, int) or value < 0:
+            raise ValueError(f"max_transfers should be non-negative int, current {value!r}")
+        self._max_transfers = value
+
+    @property
+    def bulk_hours(self) -> tuple[int, int] | None:
+        """
+        Property for bulk_hours
+        :return: first hour and hour after the daily window of image downloads, None when downloads are not limited
+        """
+        return self._bulk_hours
+
+    @bulk_hours.setter
+    @safe_setter
+    def bulk_hours(self, value: tuple[int, int] | None) -> None:
+        """
+        Setter for bulk_hours decorated by error logger
+        :param value: value to set
+        :return:
+        """
+        match value:
+            case None:
+                self._bulk_hours = None
+            case (int() as start, int() as end) if 0 <= start < 24 and 0 <= end < 24:
+                self._bulk_hours = (start, end)
+            case _:
+                raise ValueError(f"bulk_hours should be None or tuple of hours, current {value!r}")
+
+    @property
+    def adaptive_polling(self) -> bool:
+        """
+        Property for adaptive_polling
+        :return: True if delay between syncs is learned from times of data arrival
+        """
+        return self._adaptive_polling
+
+    @adaptive_polling.setter
+    @safe_setter
+    def adaptive_polling(self, value: bool) -> None:
+        """
+        Setter for adaptive_polling decorated by error logger
+        :param value: value to set
+        :return:
+        """
+        if not isinstance(value, bool):
+            raise ValueError(f"adaptive_polling should be of type bool, current {type(value)}")
+        self._adaptive_polling = value
+
+    @property
+    def shutdown_timeout(self) -> int:
+        """
+        Property for shutdown_timeout
+        :return: time in seconds running downloads may take to finish after shutdown is requested
+        """
+        return self._shutdown_timeout
+
+    @shutdown_timeout.setter
+    @safe_setter
+    def shutdown_timeout(self, value: int) -> None:
+        """
+        Setter for shutdown_timeout decorated by error logger
+        :param value: value to set
+        :return:
+        """
+        if not isinstance(value, int) or value < 0:
+            raise ValueError(f"shutdown_timeout should be non-negative int, current {value!r}")
+        self._shutdown_timeout = value
+
     @staticmethod
     def get_screen_resolution() -> tuple[int, int]:
         """
@@ -160,5 +587,73 @@ class Config(metaclass=ConfigMeta):
         """
         return os.path.join(os.getcwd(), "images")
 
+    @staticmethod
+    def get_data_path() -> str:
+        """
+        Construct path to application data folder
+        :return: path to folder
+        """
+        return os.path.join(os.getcwd(), "data")
+
+    @staticmethod
+    def get_env_flag(name: str) -> bool:
+        """
+        Read boolean switch from environment variable
+        :param name: name of environment variable
+        :return: True if variable is set to 1, true, yes or on
+        """
+        return os.environ.get(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+    @staticmethod
+    def get_env_coordinates(name: str) -> tuple[float, float] | None:
+        """
+        Read latitude and longitude from environment variable
+        :param name: name of environment variable
+        :return: coordinates e.g. (52.23, 21.01) for value "52.23,21.01", None when variable is not set or not valid
+        """
+        value = os.environ.get(name, "").strip()
+        if not value:
+            return None
+        try:
+            lat, lon = (float(part) for part in value.split(","))
+        except ValueError:
+            app_logger.critical(f"{name} should be latitude and longitude separated by comma, current {value!r}")
+            return None
+        return lat, lon
+
+    @staticmethod
+    def get_env_hours(name: str) -> tuple[int, int] | None:
+        """
+        Read daily window from environment variable
+        :param name: name of environment variable
+        :return: hours e.g. (22, 6) for value "22-6", None when variable is not set or not valid
+        """
+        value = os.environ.get(name, "").strip()
+        if not value:
+            return None
+        try:
+            start, end = (int(part) for part in value.split("-"))
+        except ValueError:
+            app_logger.critical(f"{name} should be two hours separated by dash, current {value!r}")
+            return None
+        return start, end
+
+    @staticmethod
+    def get_env_int(name: str, default: int = 0) -> int:
+        """
+        Read integer setting from environment variable
+        :param name: name of environment variable
+        :param default: value used when variable is not set or is not a number
+        :return: value of variable
+        """
+        value = os.environ.get(name, "").strip()
+        if not value:
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            app_logger.critical(f"{name} should be an integer, current {value!r}")
+            return default
+
 
 config = Config()
@@ -0,0 +1,315 @@
+"""
+Fleet cache service, instance syncing from EPIC shares its manifest and rendered frames with other instances
+"""
+
+import json
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, BinaryIO
+
+from config import config
+from image.cache import find_original, get_render_path, render_for_key
+from image.management import generate_code
+from logger import app_logger
+from records import Record
+
+RENDER_PATTERN = re.compile(r"^/renders/(?P<key>\w+)/(?P<code>\d{14})\.png$")
+RANGE_PATTERN = re.compile(r"^bytes=(?P<start>\d*)-(?P<end>\d*)$")
+
+CHUNK_SIZE = 64 * 1024
+
+_manifest_lock = threading.Lock()
+
+
+def get_manifest_path() -> str:
+    """
+    Construct path to the manifest served to other instances, it lists only frames stored by this instance
+    :return: path to file
+    """
+    return os.path.join(config.data_path, "manifest.json")
+
+
+def get_response_path() -> str:
+    """
+    Construct path to the last response of EPIC API
+    :return: path to file
+    """
+    return os.path.join(config.data_path, "response.json")
+
+
+def write_records(path: str, records: list[Record]) -> None:
+    """
+    Write records in format of API response, file is replaced atomically
+    :param path: path to file
+    :param records: records of the data from API
+    :return: None
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as fp:
+        json.dump([record.to_json() for record in records], fp)
+    os.replace(f"{path}.tmp", path)
+
+
+def read_records(path: str) -> list[Record]:
+    """
+    Read records saved in format of API response
+    :param path: path to file
+    :return: records, empty if file does not exist or is broken
+    """
+    try:
+        with open(path, encoding="utf-8") as fp:
+            return [Record.from_json(record) for record in json.load(fp)]
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as exception:
+        app_logger.error(f"Records in {path} can't be read: {exception!r}")
+        return []
+
+
+def is_stored(code: str) -> bool:
+    """
+    Check if frame can be served to other instances, i.e. its original or render for current settings is stored
+    :param code: Coded date and time
+    :return: True if frame is stored
+    """
+    return find_original(code) is not None or os.path.isfile(get_render_path(code))
+
+
+def save_manifest(records: list[Record]) -> None:
+    """
+    Save records of the last EPIC API response and publish manifest of the frames which are already stored
+    :param records: records of the data from API
+    :return: None
+    """
+    with _manifest_lock:
+        write_records(get_response_path(), records)
+    publish_manifest()
+
+
+def publish_manifest() -> None:
+    """
+    Publish manifest listing frames of the last EPIC API response which are stored, it is called again whenever a
+    frame is stored so other instances never get frames that are still being downloaded or that are never
+    downloaded (deferred to bulk hours or not showing the region)
+    :return: None
+    """
+    with _manifest_lock:
+        records = [record for record in read_records(get_response_path()) if is_stored(record.code)]
+        write_records(get_manifest_path(), records)
+    app_logger.debug(f"Manifest of {len(records)} stored frames published")
+
+
+def get_manifest_codes(path: str | None = None) -> set[str]:
+    """
+    Codes of frames listed in the published manifest
+    :param path: path to file with records, the published manifest by default
+    :return: set of codes
+    """
+    try:
+        with open(path or get_manifest_path(), encoding="utf-8") as fp:
+            return {generate_code(record["date"]) for record in json.load(fp)}
+    except (OSError, ValueError, KeyError, TypeError) as exception:
+        app_logger.error(f"Manifest can't be read: {exception!r}")
+        return set()
+
+
+def get_etag(stat: os.stat_result) -> str:
+    """
+    Entity tag of the file, changes when the file is replaced
+    :param stat: status of the file
+    :return: quoted tag
+    """
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """
+    Parse single byte range of Range header
+    :param header: value of the header e.g. bytes=100-199, bytes=100- or bytes=-100
+    :param size: size of the file
+    :return: first and last byte, None if header is not a single byte range
+    :raises ValueError: when range is not satisfiable
+    """
+    match = RANGE_PATTERN.match(header.strip())
+    if match is None or not (match["start"] or match["end"]):
+        return None
+    if not match["start"]:
+        start, end = max(size - int(match["end"]), 0), size - 1
+    else:
+        start = int(match["start"])
+        end = min(int(match["end"]), size - 1) if match["end"] else size - 1
+    if start > end or start >= size:
+        raise ValueError(f"Range {header} not satisfiable for size {size}")
+    return start, end
+
+
+class FleetServer:
+    """
+    HTTP service sharing the manifest and rendered frames
+
+    GET /api/natural returns stored frames of the last EPIC API response, GET /renders/<key>/<code>.png returns
+    frame rendered for render cache key of the client, frames for new resolutions are rendered from stored originals
+    on the first request. Frames of the response which aren't stored yet get 503, frames which can't be rendered
+    for the key get 404. Responses have ETag and support conditional and range requests.
+    """
+
+    def __init__(self, port: int, host: str = "127.0.0.1") -> None:
+        """
+        Init server
+        :param port: port to listen on, 0 chooses free port
+        :param host: address to listen on, only local connections are accepted by default
+        """
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="FleetServer", daemon=True)
+
+    @property
+    def url(self) -> str:
+        """
+        Base url of the server
+        :return: url
+        """
+        host, port = self._server.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    def start(self) -> None:
+        """
+        Start serving in background thread
+        :return: None
+        """
+        self._thread.start()
+        app_logger.info(f"Fleet cache service started at {self.url}")
+
+    def stop(self) -> None:
+        """
+        Stop server
+        :return: None
+        """
+        self._server.shutdown()
+        self._server.server_close()
+
+    @staticmethod
+    def resolve(path: str) -> tuple[str | None, int]:
+        """
+        Find file for request path
+        :param path: path of the request
+        :return: path to file and 200, or None and status of the error
+        """
+        if path == "/api/natural":
+            manifest_path = get_manifest_path()
+            return (manifest_path, 200) if os.path.isfile(manifest_path) else (None, 404)
+        match = RENDER_PATTERN.match(path)
+        if match is None:
+            return None, 404
+        if match["code"] not in get_manifest_codes():
+            # frame is listed by EPIC but not downloaded yet, the client should try again later
+            if match["code"] in get_manifest_codes(get_response_path()):
+                return None, 503
+            return None, 404
+        render_path = render_for_key(match["code"], match["key"])
+        return render_path, 200 if render_path else 404
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        """
+        Create request handler bound to this server
+        :return: handler class
+        """
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """
+            Handler of manifest and render requests
+            """
+
+            def do_GET(self) -> None:  # pylint: disable=invalid-name
+                """
+                Serve file
+                :return: None
+                """
+                self.serve(send_body=True)
+
+            def do_HEAD(self) -> None:  # pylint: disable=invalid-name
+                """
+                Serve headers of file
+                :return: None
+                """
+                self.serve(send_body=False)
+
+            def serve(self, send_body: bool) -> None:
+                """
+                Send file or its part
+                :param send_body: send content, False for HEAD requests
+                :return: None
+                """
+                try:
+                    path, status = server.resolve(self.path.split("?")[0])
+                except (OSError, SyntaxError) as exception:
+                    app_logger.error(f"Fleet request {self.path} failed: {exception!r}")
+                    self.send_error(500)
+                    return
+                if path is None:
+                    self.send_error(status)
+                    return
+                # file is opened first so replaced manifest can't mix headers and content of two versions
+                with open(path, "rb") as fp:
+                    stat = os.fstat(fp.fileno())
+                    etag, size = get_etag(stat), stat.st_size
+                    if self.headers.get("If-None-Match") in (etag, "*"):
+                        self.send_response(304)
+                        self.send_header("ETag", etag)
+                        self.end_headers()
+                        return
+                    start, end = 0, size - 1
+                    byte_range = None
+                    if self.headers.get("Range") and self.headers.get("If-Range", etag) == etag:
+                        try:
+                            byte_range = parse_range(self.headers["Range"], size)
+                        except ValueError:
+                            self.send_response(416)
+                            self.send_header("Content-Range", f"bytes */{size}")
+                            self.end_headers()
+                            return
+                    if byte_range is not None:
+                        start, end = byte_range
+                        self.send_response(206)
+                        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+                    else:
+                        self.send_response(200)
+                    self.send_header("Content-Type", "application/json" if path.endswith(".json") else "image/png")
+                    self.send_header("Content-Length", str(end - start + 1))
+                    self.send_header("ETag", etag)
+                    self.send_header("Accept-Ranges", "bytes")
+                    self.end_headers()
+                    if send_body:
+                        self.send_file(fp, start, end - start + 1)
+
+            def send_file(self, fp: BinaryIO, offset: int, length: int) -> None:
+                """
+                Copy part of file to the response
+                :param fp: opened file
+                :param offset: first byte
+                :param length: number of bytes
+                :return: None
+                """
+                fp.seek(offset)
+                while length > 0:
+                    chunk = fp.read(min(CHUNK_SIZE, length))
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    length -= len(chunk)
+                    with server._lock:  # pylint: disable=protected-access
+                        server.bytes_sent += len(chunk)
+
+            def log_message(self, format: str, *args: Any) -> None:  # pylint: disable=redefined-builtin
+                """
+                Redirect request log to app logger
+                :return: None
+                """
+                app_logger.debug(f"Fleet cache service: {format % args}")
+
+        return Handler
@@ -0,0 +1,168 @@
+"""
+Batch rendering of originals outside the sync loop
+"""
+
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable
+
+from PIL import Image, ImageDraw
+
+from config import config
+from image.compositor import compositor
+from image.processing import (
+    connect_images,
+    get_description_image,
+    process_image,
+    resize_image,
+)
+from logger import app_logger
+
+# code of the frame in names of originals e.g. 20240208003145.png, 20240208003145.jpg or epic_1b_20240208003633.png
+CODE_PATTERN = re.compile(r"(?<!\d)(?P<code>\d{14})(?!\d)")
+ORIGINAL_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+
+def find_originals(source: str) -> dict[str, str]:
+    """
+    Find originals in the folder, the newest file is taken when there are more originals of the same frame
+    :param source: folder with originals
+    :return: paths to originals by code
+    """
+    originals: dict[str, str] = {}
+    for file in sorted(os.listdir(source)):
+        match = CODE_PATTERN.search(file)
+        if match is None or not file.lower().endswith(ORIGINAL_EXTENSIONS):
+            continue
+        path = os.path.join(source, file)
+        code = match["code"]
+        if code not in originals or os.path.getmtime(path) > os.path.getmtime(originals[code]):
+            originals[code] = path
+    return originals
+
+
+def is_up_to_date(original_path: str, output_path: str, resolution: tuple[int, int]) -> bool:
+    """
+    Check if output was rendered from the current original in given resolution
+    :param original_path: path to original
+    :param output_path: path to rendered image
+    :param resolution: size of rendered image
+    :return: True if output doesn't need to be rendered again
+    """
+    if not os.path.isfile(output_path) or os.path.getmtime(output_path) < os.path.getmtime(original_path):
+        return False
+    try:
+        with Image.open(output_path) as image:
+            return image.size == resolution
+    except (OSError, SyntaxError):
+        return False
+
+
+def render_original(original_path: str, code: str, output_path: str, resolution: tuple[int, int]) -> str:
+    """
+    Render single original, output is replaced atomically
+    :param original_path: path to original
+    :param code: Coded date and time
+    :param output_path: path to rendered image
+    :param resolution: size of rendered image
+    :return: path to rendered image
+    """
+    process_image(original_path, code, output_path=f"{output_path}.tmp", resolution=resolution)
+    os.replace(f"{output_path}.tmp", output_path)
+    return output_path
+
+
+def render_directory(
+    source: str,
+    destination: str,
+    resolution: tuple[int, int] | None = None,
+    workers: int | None = None,
+    force: bool = False,
+    progress: Callable[[int, int, str], None] | None = None,
+) -> tuple[list[str], list[str], list[str]]:
+    """
+    Render all originals from the folder on all cores, outputs which are newer than originals and have the right
+    size are skipped
+    :param source: folder with originals
+    :param destination: folder for rendered images named <code>.png
+    :param resolution: size of rendered images, screen size by default
+    :param workers: number of processes, number of cores by default
+    :param force: render also outputs which are up to date
+    :param progress: called with number of finished frames (including skipped), number of all frames and code after
+        every rendered frame
+    :return: codes of rendered, skipped and failed frames
+    """
+    resolution = resolution or config.resolution
+    os.makedirs(destination, exist_ok=True)
+    originals = find_originals(source)
+    rendered: list[str] = []
+    failed: list[str] = []
+    skipped = {
+        code
+        for code, path in originals.items()
+        if not force and is_up_to_date(path, os.path.join(destination, f"{code}.png"), resolution)
+    }
+    app_logger.info(f"Rendering {len(originals) - len(skipped)} of {len(originals)} originals from {source}")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(render_original, path, code, os.path.join(destination, f"{code}.png"), resolution): code
+            for code, path in originals.items()
+            if code not in skipped
+        }
+        for future in as_completed(futures):
+            code = futures[future]
+            try:
+                future.result()
+                rendered.append(code)
+            except (OSError, SyntaxError, ValueError) as exception:
+                app_logger.error(f"Rendering of {code} failed: {exception!r}")
+                failed.append(code)
+            except BrokenProcessPool as exception:
+                # a worker process died (e.g. killed when out of memory), the pool can't render anything else
+                remaining = [frame for frame in futures.values() if frame not in rendered and frame not in failed]
+                app_logger.error(f"Rendering stopped, {len(remaining)} frames not rendered: {exception!r}")
+                failed.extend(remaining)
+            if progress:
+                progress(len(skipped) + len(rendered) + len(failed), len(originals), code)
+            if len(rendered) + len(failed) == len(futures):
+                break
+    return sorted(rendered), sorted(skipped), sorted(failed)
+
+
+def benchmark_render(frames: int = 10, resolution: tuple[int, int] | None = None) -> dict[str, float]:
+    """
+    Measure time of every stage of rendering synthetic original, images are connected both by connect_images and
+    in pooled frame of the compositor
+    :param frames: number of rendered frames
+    :param resolution: size of rendered images, screen size by default
+    :return: average time of one frame in seconds by stage
+    """
+    resolution = resolution or config.resolution
+    results = dict.fromkeys(("resize", "description", "connect", "compose", "encode"), 0.0)
+    with tempfile.TemporaryDirectory(prefix="nasa_api_bench_") as directory:
+        original_path = os.path.join(directory, "original.png")
+        original = Image.new("RGB", (2048, 2048), "black")
+        ImageDraw.Draw(original).ellipse((0, 0, 2047, 2047), (20, 90, 200))
+        original.save(original_path)
+        for index in range(frames):
+            start = time.perf_counter()
+            earth_image = resize_image(original_path, size=resolution[1])
+            results["resize"] += time.perf_counter() - start
+            start = time.perf_counter()
+            description_image = get_description_image("20240208003145")
+            results["description"] += time.perf_counter() - start
+            start = time.perf_counter()
+            connect_images(earth_image, description_image, resolution)
+            results["connect"] += time.perf_counter() - start
+            start = time.perf_counter()
+            image = compositor.compose(earth_image, description_image, resolution)
+            results["compose"] += time.perf_counter() - start
+            start = time.perf_counter()
+            image.save(os.path.join(directory, f"{index}.png"), format="PNG")
+            results["encode"] += time.perf_counter() - start
+    return {stage: seconds / frames for stage, seconds in results.items()}
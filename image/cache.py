@@ -0,0 +1,300 @@
+"""
+Originals and render cache
+"""
+
+import os
+import re
+import shutil
+import threading
+
+from config import config
+from image.processing import TEMPLATE_VERSION, process_image
+from logger import app_logger
+
+# variants of EPIC archive from the smallest: folder name, file extension and size of the square image
+ARCHIVE_VARIANTS: dict[str, tuple[str, int]] = {
+    "thumbs": ("jpg", 120),
+    "jpg": ("jpg", 1024),
+    "png": ("png", 2048),
+}
+
+RENDER_KEY_PATTERN = re.compile(
+    r"^(?P<width>\d{1,5})x(?P<height>\d{1,5})_(?P<variant>thumbs|jpg|png)_v(?P<version>\d+)$"
+)
+
+# largest side of frames rendered on request of other instances
+MAX_RENDER_SIZE = 8192
+# maximum number of render cache keys of other instances rendered on request
+MAX_REQUESTED_KEYS = 4
+
+_render_lock = threading.Lock()
+
+
+def get_originals_path() -> str:
+    """
+    Construct path to folder with downloaded originals
+    :return: path to folder
+    """
+    return os.path.join(config.data_path, "originals")
+
+
+def get_source_variant() -> str:
+    """
+    Archive variant used for current settings, in auto mode the smallest one not smaller than the screen height
+    :return: name of variant
+    """
+    if config.source_quality in ARCHIVE_VARIANTS:
+        return config.source_quality
+    for variant, (_, size) in ARCHIVE_VARIANTS.items():
+        if size >= config.resolution[1]:
+            return variant
+    return "png"
+
+
+def get_original_path(code: str, variant: str = "png") -> str:
+    """
+    Construct path to downloaded original of the frame
+    :param code: Coded date and time
+    :param variant: archive variant of the original
+    :return: path to file e.g. 20240208000342.png, 20240208000342.jpg or 20240208000342.thumbs.jpg
+    """
+    extension = ARCHIVE_VARIANTS[variant][0]
+    name = code if variant == extension else f"{code}.{variant}"
+    return os.path.join(get_originals_path(), f"{name}.{extension}")
+
+
+def find_original(code: str, variant: str | None = None) -> str | None:
+    """
+    Find stored original of the frame which is at least as large as the variant
+    :param code: Coded date and time
+    :param variant: minimal archive variant, any stored original is accepted by default
+    :return: path to file or None if there is no such original
+    """
+    variants = list(ARCHIVE_VARIANTS)
+    for candidate in variants[variants.index(variant) if variant else 0 :]:
+        original_path = get_original_path(code, candidate)
+        if os.path.isfile(original_path):
+            return original_path
+    return None
+
+
+def get_renders_path() -> str:
+    """
+    Construct path to folder with render cache
+    :return: path to folder
+    """
+    return os.path.join(config.data_path, "renders")
+
+
+def get_render_key() -> str:
+    """
+    Name of render cache folder for current settings
+    :return: resolution, source variant and template version e.g. 1920x1080_png_v1
+    """
+    return f"{config.resolution[0]}x{config.resolution[1]}_{get_source_variant()}_v{TEMPLATE_VERSION}"
+
+
+def get_render_path(code: str, key: str | None = None) -> str:
+    """
+    Construct path to cached render of the frame
+    :param code: Coded date and time
+    :param key: name of render cache folder, current settings by default
+    :return: path to file
+    """
+    return os.path.join(get_renders_path(), key or get_render_key(), code + ".png")
+
+
+def has_original(code: str) -> bool:
+    """
+    Check if original of the frame good enough for current settings is stored
+    :param code: Coded date and time
+    :return: True if original exists
+    """
+    return find_original(code, get_source_variant()) is not None
+
+
+def save_original(code: str, content: bytes, variant: str = "png") -> str:
+    """
+    Save downloaded original, file is replaced atomically and originals of other variants are removed
+    :param code: Coded date and time
+    :param content: downloaded image
+    :param variant: archive variant of the original
+    :return: path to original
+    """
+    original_path = get_original_path(code, variant)
+    os.makedirs(os.path.dirname(original_path), exist_ok=True)
+    with open(f"{original_path}.tmp", "wb") as fp:
+        fp.write(content)
+    os.replace(f"{original_path}.tmp", original_path)
+    remove_originals(code, keep=original_path)
+    app_logger.debug(f"Original {code} saved in variant {variant}")
+    return original_path
+
+
+def remove_originals(code: str, keep: str | None = None) -> None:
+    """
+    Remove stored originals of the frame in all variants
+    :param code: Coded date and time
+    :param keep: path to original which should be kept
+    :return: None
+    """
+    for variant in ARCHIVE_VARIANTS:
+        original_path = get_original_path(code, variant)
+        if original_path != keep and os.path.isfile(original_path):
+            os.remove(original_path)
+
+
+def write_render(original_path: str, code: str, render_path: str, resolution: tuple[int, int] | None = None) -> None:
+    """
+    Render original into the cache, every thread writes its own temporary file so a download job and a request of
+    other instance rendering the same frame never share it; render is replaced atomically
+    :param original_path: path to original
+    :param code: Coded date and time
+    :param render_path: path to render
+    :param resolution: size of rendered image, screen size by default
+    :return: None
+    """
+    temporary_path = f"{render_path}.{threading.get_ident()}.tmp"
+    try:
+        process_image(original_path, code, output_path=temporary_path, resolution=resolution)
+        os.replace(temporary_path, render_path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def render_frame(code: str) -> str:
+    """
+    Put wallpaper of the frame into the image folder
+
+    Wallpaper is taken from render cache, if it is missing it is rendered from stored original of the current
+    source variant or a larger one
+    :param code: Coded date and time
+    :return: path to wallpaper in the image folder
+    :raises FileNotFoundError: when original good enough for current settings is not stored
+    """
+    render_path = get_render_path(code)
+    if not os.path.isfile(render_path):
+        original_path = find_original(code, get_source_variant())
+        if original_path is None:
+            raise FileNotFoundError(f"Original of {code} is not stored")
+        os.makedirs(os.path.dirname(render_path), exist_ok=True)
+        app_logger.debug(f"Rendering {code} with key {get_render_key()}")
+        write_render(original_path, code, render_path)
+    else:
+        app_logger.debug(f"Render cache hit for {code}")
+
+    image_path = os.path.join(config.image_path, code + ".png")
+    link_file(render_path, image_path)
+    return image_path
+
+
+def get_requested_keys() -> list[str]:
+    """
+    Render cache keys of other instances, i.e. all cache folders except the one of current settings
+    :return: names of cache folders
+    """
+    renders_path = get_renders_path()
+    if not os.path.isdir(renders_path):
+        return []
+    own_key = get_render_key()
+    return [
+        key for key in os.listdir(renders_path) if key != own_key and os.path.isdir(os.path.join(renders_path, key))
+    ]
+
+
+def render_for_key(code: str, key: str) -> str | None:
+    """
+    Get cached render of the frame for settings of other instance, it is rendered from stored original if needed
+    :param code: Coded date and time
+    :param key: name of render cache folder e.g. 1280x720_jpg_v1
+    :return: path to render or None if key is not valid, original is not good enough or the limit of keys is
+        reached
+    """
+    match = RENDER_KEY_PATTERN.match(key)
+    if match is None or int(match["version"]) != TEMPLATE_VERSION:
+        return None
+    resolution = int(match["width"]), int(match["height"])
+    if not 0 < min(resolution) <= max(resolution) <= MAX_RENDER_SIZE:
+        return None
+    render_path = get_render_path(code, key)
+    with _render_lock:
+        if not os.path.isfile(render_path):
+            original_path = find_original(code, match["variant"])
+            if original_path is None:
+                return None
+            if not os.path.isdir(os.path.dirname(render_path)) and len(get_requested_keys()) >= MAX_REQUESTED_KEYS:
+                app_logger.warning(f"Render cache key {key} refused, {MAX_REQUESTED_KEYS} keys already rendered")
+                return None
+            os.makedirs(os.path.dirname(render_path), exist_ok=True)
+            app_logger.info(f"Rendering {code} on request with key {key}")
+            write_render(original_path, code, render_path, resolution)
+    return render_path
+
+
+def link_file(source: str, destination: str) -> None:
+    """
+    Place file at destination as hard link, or as copy when links are not supported; destination is replaced
+    atomically and the temporary file is created next to the source so it never appears in the image folder
+    :param source: existing file
+    :param destination: new path
+    :return: None
+    """
+    temporary_path = f"{source}.link"
+    if os.path.exists(temporary_path):
+        os.remove(temporary_path)
+    try:
+        os.link(source, temporary_path)
+    except OSError:
+        shutil.copyfile(source, temporary_path)
+    os.replace(temporary_path, destination)
+
+
+def rerender_files(files: list[str]) -> list[str]:
+    """
+    Render again wallpapers which have stored originals, e.g. after change of resolution
+    :param files: filenames from the image folder
+    :return: filenames which were rendered
+    """
+    rendered = []
+    for file in sorted(files, reverse=True):
+        code = file[:14]
+        if file != code + ".png" or not has_original(code):
+            continue
+        try:
+            render_frame(code)
+            rendered.append(file)
+        except (OSError, SyntaxError) as exception:
+            app_logger.error(f"Rendering of {file} failed: {exception}")
+    app_logger.info(f"Rendered {len(rendered)} files from stored originals")
+    return rendered
+
+
+def discard_cached(files: list[str]) -> None:
+    """
+    Remove originals and renders of all resolutions for frames removed from the image folder
+    :param files: filenames
+    :return: None
+    """
+    renders_path = get_renders_path()
+    keys = os.listdir(renders_path) if os.path.isdir(renders_path) else []
+    for file in files:
+        remove_originals(file[:14])
+        for path in [os.path.join(renders_path, key, file) for key in keys]:
+            if os.path.isfile(path):
+                os.remove(path)
+    app_logger.debug(f"Cache of {len(files)} files removed")
+
+
+def prune_renders() -> None:
+    """
+    Remove render cache folders built with older template versions
+    :return: None
+    """
+    renders_path = get_renders_path()
+    if not os.path.isdir(renders_path):
+        return
+    for key in os.listdir(renders_path):
+        if not key.endswith(f"_v{TEMPLATE_VERSION}"):
+            shutil.rmtree(os.path.join(renders_path, key), ignore_errors=True)
+            app_logger.info(f"Outdated render cache {key} removed")
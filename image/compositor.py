@@ -0,0 +1,73 @@
+"""
+Frame compositor with reusable buffers
+"""
+
+import threading
+
+from PIL import Image
+
+from logger import app_logger
+
+# width and height of the rotated description image
+DESCRIPTION_SIZE = (50, 600)
+
+
+class FrameCompositor:
+    """
+    Pool of preallocated frames, one per resolution in every thread
+
+    Background stays black for the whole lifetime of the frame, earth and description are pasted at the same place
+    in every frame and fully overwrite their regions, so the frame is never allocated nor cleared again. Every thread
+    has its own frames so workers never wait for each other, composed frame is valid until the thread composes the
+    next one and should be encoded right away.
+    """
+
+    def __init__(self) -> None:
+        """
+        Init empty pool
+        """
+        self._local = threading.local()
+
+    def get_frame(self, resolution: tuple[int, int]) -> Image.Image:
+        """
+        Get frame of the current thread for resolution, allocate it on first use
+        :param resolution: width and height of the frame
+        :return: frame
+        """
+        frames: dict[tuple[int, int], Image.Image] | None = getattr(self._local, "frames", None)
+        if frames is None:
+            frames = self._local.frames = {}
+        if resolution not in frames:
+            app_logger.debug(f"Allocating frame for resolution {resolution} in {threading.current_thread().name}")
+            frames[resolution] = Image.new("RGB", resolution, "black")
+        return frames[resolution]
+
+    def compose(
+        self, earth_image: Image.Image, description_image: Image.Image, resolution: tuple[int, int]
+    ) -> Image.Image:
+        """
+        Connect images in pooled frame, result is equal to connect_images
+        :param earth_image: image of the earth resized to the screen height
+        :param description_image: rotated image with description
+        :param resolution: width and height of the frame
+        :return: pooled frame with connected images
+        """
+        app_logger.debug("Connecting images in pooled frame")
+        width, height = resolution
+        frame = self.get_frame(resolution)
+        if earth_image.size != (height, height) or description_image.size != DESCRIPTION_SIZE:
+            # regions of the previous frame would not be fully overwritten
+            frame.paste((0, 0, 0), (0, 0, width, height))
+        frame.paste(description_image, (width - DESCRIPTION_SIZE[0], (height - DESCRIPTION_SIZE[1]) // 2))
+        frame.paste(earth_image, ((width - height) // 2, 0))
+        return frame
+
+    def clear(self) -> None:
+        """
+        Release frames of the current thread
+        :return: None
+        """
+        self._local.frames = {}
+
+
+compositor = FrameCompositor()
@@ -7,8 +7,9 @@ import os
 import shutil
 
 from config import config
-from image.validators import validate_file
+from image.validators import validate_file, validate_files
 from logger import app_logger
+from sync_profiler import profiled
 
 
 def check_or_create_image_path() -> None:
@@ -22,6 +23,7 @@ def check_or_create_image_path() -> None:
     app_logger.info("Image path exist")
 
 
+@profiled
 def check_wallpapers() -> tuple[str | None, list[str], list[str]]:
     """
     Retrieves the date of the latest image from the folder, if the date is newer than the current date, forces a new
@@ -44,6 +46,22 @@ def check_wallpapers() -> tuple[str | None, list[str], list[str]]:
     return max(valid) if valid else None, valid, invalid
 
 
+@profiled
+def check_wallpapers_batch(max_workers: int | None = None) -> tuple[str | None, list[str], list[str]]:
+    """
+    Works like check_wallpapers but validates the whole folder at once with validate_files, it is much faster
+    for folders with many files
+    :param max_workers: number of threads used to check file content
+    :return: latest, valid, invalid
+    """
+    files = os.listdir(config.image_path)
+    app_logger.debug(f"Number of files in folder: {len(files)}")
+
+    valid, invalid = validate_files(files, max_workers=max_workers)
+    app_logger.debug(f"Number of valid/invalid files: {len(valid)}/{len(invalid)}")
+    return max(valid) if valid else None, valid, invalid
+
+
 def generate_code(date: str) -> str:
     """
     Concatenates a date into a string
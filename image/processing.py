@@ -7,18 +7,25 @@ import datetime
 from PIL import Image, ImageDraw, ImageFont
 
 from config import config
+from image.compositor import compositor
 from logger import app_logger
+from sync_profiler import profiled
 
+# version of the wallpaper layout, increase it when caption layout or encoder changes so cached renders are rebuilt
+TEMPLATE_VERSION = 1
 
-def resize_image(image_path: str) -> Image.Image:
+
+def resize_image(image_path: str, size: int | None = None) -> Image.Image:
     """
     Open image and resize to the screen size (image is square)
     :param image_path: path to image
+    :param size: width and height of resized image, height of the screen by default
     :return: resized image
     """
     app_logger.debug("Resizing original image")
-    image = Image.open(image_path)
-    return image.resize((config.resolution[1], config.resolution[1]))
+    size = size or config.resolution[1]
+    with Image.open(image_path) as image:
+        return image.resize((size, size))
 
 
 def get_description_image(code: str) -> Image.Image:
@@ -31,7 +38,11 @@ def get_description_image(code: str) -> Image.Image:
     date_and_time = datetime.datetime.strptime(code, "%Y%m%d%H%M%S")
     # font
     font_size = 15
-    font = ImageFont.truetype("arial.ttf", font_size)
+    try:
+        font: ImageFont.FreeTypeFont | ImageFont.ImageFont = ImageFont.truetype("arial.ttf", font_size)
+    except OSError:
+        app_logger.warning("Font arial.ttf not found, default font used")
+        font = ImageFont.load_default(font_size)
 
     # text to set up
     text_image = Image.new("L", (600, 50), 0)
@@ -44,39 +55,58 @@ def get_description_image(code: str) -> Image.Image:
     return text_image.rotate(90, expand=True, fillcolor="white")
 
 
-def connect_images(earth_image: Image.Image, description_image: Image.Image) -> Image.Image:
+def connect_images(
+    earth_image: Image.Image,
+    description_image: Image.Image,
+    resolution: tuple[int, int] | None = None,
+) -> Image.Image:
     """
     Create background image and paste photo and description on it
     :param earth_image: image of the earth
     :param description_image: image with description
+    :param resolution: size of created image, screen size by default
     :return: connected images
     """
     app_logger.debug("Connecting images")
+    width, height = resolution or config.resolution
     # paste image with text
-    image = Image.new("RGB", config.resolution, "black")
+    image = Image.new("RGB", (width, height), "black")
     image.paste(
         description_image,
-        (config.resolution[0] - 50, (config.resolution[1] - 600) // 2),
+        (width - 50, (height - 600) // 2),
     )
 
     # paste earth_image
-    image.paste(earth_image, ((config.resolution[0] - config.resolution[1]) // 2, 0))
+    image.paste(earth_image, ((width - height) // 2, 0))
     return image
 
 
-def process_image(image_path: str, code: str) -> None:
+@profiled
+def process_image(
+    image_path: str,
+    code: str,
+    output_path: str | None = None,
+    resolution: tuple[int, int] | None = None,
+) -> None:
     """
     Creates a new image from an existing one based on the monitor dimensions and includes
     information about the image's origin
     :param image_path: Path to file
     :param code: Coded date and time
+    :param output_path: Path to save created image, by default the original file is overwritten
+    :param resolution: size of created image, screen size by default
     :return: None
     """
+    resolution = resolution or config.resolution
     # images
-    original_image = resize_image(image_path=image_path)
+    original_image = resize_image(image_path=image_path, size=resolution[1])
     text_image = get_description_image(code=code)
-    image = connect_images(earth_image=original_image, description_image=text_image)
+    if config.use_compositor:
+        # pooled frame is encoded directly and reused by the next frame of this thread
+        image = compositor.compose(original_image, text_image, resolution)
+    else:
+        image = connect_images(earth_image=original_image, description_image=text_image, resolution=resolution)
 
     # save image
-    image.save(image_path)
+    image.save(output_path or image_path, format="PNG")
     app_logger.debug("Connected images saved")
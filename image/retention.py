@@ -0,0 +1,225 @@
+"""
+Archive retention
+"""
+
+import datetime
+import json
+import os
+import threading
+from typing import TypedDict
+
+from clock import get_clock
+from config import config
+from image.cache import discard_cached, find_original
+from image.management import delete_files
+from logger import app_logger
+
+
+class ArchiveEntry(TypedDict):
+    """
+    Information about a single archived frame
+    """
+
+    size: int
+    added: float
+    displayed: float
+
+
+def get_frame_time(file: str) -> float:
+    """
+    Get timestamp of the moment the frame was taken from its filename
+    :param file: filename YYYYmmddHHMMSS.png
+    :return: timestamp
+    """
+    return datetime.datetime.strptime(file[:14], "%Y%m%d%H%M%S").timestamp()
+
+
+def select_evictions(
+    entries: dict[str, ArchiveEntry],
+    budget: int,
+    max_age: int,
+    now: float,
+    protected: set[str] | None = None,
+) -> list[str]:
+    """
+    Choose frames to be removed from the archive
+
+    Frames older than max_age are removed first, then least recently displayed frames (never displayed frames are
+    ordered from the oldest) until the archive fits the budget
+    :param entries: archived frames
+    :param budget: disk budget in bytes, 0 means no budget
+    :param max_age: maximum age of the frame in seconds, 0 means no limit
+    :param now: current timestamp
+    :param protected: frames which can't be removed
+    :return: filenames to be removed
+    """
+    protected = protected or set()
+    candidates = sorted(
+        (file for file in entries if file not in protected),
+        key=lambda file: (entries[file]["displayed"], file),
+    )
+    evicted = []
+    if max_age:
+        evicted = [file for file in candidates if now - get_frame_time(file) > max_age]
+
+    if budget:
+        removed = set(evicted)
+        total = sum(entry["size"] for file, entry in entries.items() if file not in removed)
+        for file in candidates:
+            if total <= budget:
+                break
+            if file not in removed:
+                evicted.append(file)
+                total -= entries[file]["size"]
+    return evicted
+
+
+class ArchiveIndex:
+    """
+    Index of frames kept in the image folder and their originals, saved as JSON in the data folder
+    """
+
+    def __init__(self, path: str | None = None) -> None:
+        """
+        Init index, entries are loaded on first use
+        :param path: path to JSON file, by default archive.json in the data folder
+        """
+        self._path = path
+        self._entries: dict[str, ArchiveEntry] | None = None
+        self._loaded_path = ""
+        self._lock = threading.RLock()
+
+    @property
+    def path(self) -> str:
+        """
+        Path to index file
+        :return: path
+        """
+        return self._path or os.path.join(config.data_path, "archive.json")
+
+    @property
+    def entries(self) -> dict[str, ArchiveEntry]:
+        """
+        Archived frames, loaded from disk on first access and when the data folder changes
+        :return: filename to entry mapping
+        """
+        with self._lock:
+            if self._entries is None or self._loaded_path != self.path:
+                self._loaded_path = self.path
+                self._entries = self.load()
+            return self._entries
+
+    def load(self) -> dict[str, ArchiveEntry]:
+        """
+        Read index file
+        :return: filename to entry mapping, empty if file does not exist or is broken
+        """
+        try:
+            with open(self.path, encoding="utf-8") as fp:
+                entries: dict[str, ArchiveEntry] = json.load(fp)
+            app_logger.debug(f"Archive index loaded with {len(entries)} entries")
+            return entries
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as exception:
+            app_logger.error(f"Archive index can't be loaded: {exception}")
+            return {}
+
+    def save(self) -> None:
+        """
+        Write index file, the file is replaced atomically
+        :return: None
+        """
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temporary_path = f"{self.path}.tmp"
+            with open(temporary_path, "w", encoding="utf-8") as fp:
+                json.dump(self.entries, fp)
+            os.replace(temporary_path, self.path)
+
+    def add(self, file: str, save: bool = True) -> None:
+        """
+        Add frame from the image folder to the index, size includes stored original
+        :param file: filename
+        :param save: write index to disk
+        :return: None
+        """
+        size = os.path.getsize(os.path.join(config.image_path, file))
+        original_path = find_original(file[:14])
+        if original_path is not None:
+            size += os.path.getsize(original_path)
+        with self._lock:
+            self.entries[file] = {"size": size, "added": get_clock().time(), "displayed": 0.0}
+            if save:
+                self.save()
+        app_logger.debug(f"File {file} added to archive")
+
+    def adopt(self, files: list[str]) -> None:
+        """
+        Add valid frames which are missing in the index, e.g. stored before retention was enabled
+        :param files: valid filenames from the image folder
+        :return: None
+        """
+        with self._lock:
+            missing = [file for file in files if file not in self.entries]
+            for file in missing:
+                self.add(file, save=False)
+            if missing:
+                self.save()
+
+    def discard(self, files: list[str]) -> None:
+        """
+        Remove frames from the index
+        :param files: filenames
+        :return: None
+        """
+        with self._lock:
+            removed = [file for file in files if self.entries.pop(file, None) is not None]
+            if removed:
+                self.save()
+
+    def mark_displayed(self, file: str) -> None:
+        """
+        Save the moment the frame was displayed
+        :param file: filename
+        :return: None
+        """
+        with self._lock:
+            if file in self.entries:
+                self.entries[file]["displayed"] = get_clock().time()
+                self.save()
+
+    def enforce(self, protected: set[str] | None = None) -> list[str]:
+        """
+        Remove frames exceeding the disk budget or age limit from disk and index
+        :param protected: frames which can't be removed
+        :return: removed filenames
+        """
+        with self._lock:
+            evicted = select_evictions(
+                self.entries,
+                budget=config.retention_budget,
+                max_age=config.retention_max_age,
+                now=get_clock().time(),
+                protected=protected,
+            )
+            delete_files(evicted)
+            discard_cached(evicted)
+            self.discard(evicted)
+        app_logger.info(f"Archive retention removed {len(evicted)} files")
+        return evicted
+
+
+def get_latest_day(files: list[str]) -> list[str]:
+    """
+    Filter frames taken on the same day as the latest frame
+    :param files: filenames
+    :return: filenames of the latest day
+    """
+    if not files:
+        return []
+    day = max(files)[:8]
+    return [file for file in files if file.startswith(day)]
+
+
+archive = ArchiveIndex()
@@ -0,0 +1,178 @@
+"""
+Time-lapse export of a day's frames
+"""
+
+import os
+from typing import IO, Any, Callable, Iterable
+
+from PIL import GifImagePlugin, Image
+
+from config import config
+from image.cache import find_original, get_render_path
+from image.processing import connect_images, get_description_image, resize_image
+from image.retention import get_latest_day
+from image.validators import (
+    check_file_extension,
+    check_filename_without_extension,
+    check_if_file_is_not_broken,
+    check_length_of_file,
+)
+from logger import app_logger
+
+TIMELAPSE_FORMATS = {".gif": "GIF", ".webp": "WEBP"}
+
+
+def is_usable_frame(file: str) -> bool:
+    """
+    Check if time-lapse frame can be rendered from the wallpaper, frames of any date are accepted (validate_file
+    accepts only future dates) and like in check_new_data frames with stored original or render are usable even if
+    the wallpaper was rendered for other resolution
+    :param file: filename from the image folder
+    :return: True if name is a code of the frame and original, render or the wallpaper itself can be read
+    """
+    if not (check_file_extension(file) and check_length_of_file(file) and check_filename_without_extension(file)):
+        return False
+    code = file[:14]
+    if find_original(code) is not None or os.path.isfile(get_render_path(code)):
+        return True
+    return check_if_file_is_not_broken(file)
+
+
+def get_day_frames(day: str | None = None) -> list[str]:
+    """
+    Usable wallpapers of the day in order of time
+    :param day: date of frames e.g. 20240208, the latest day by default
+    :return: filenames from the image folder
+    """
+    files = [file for file in os.listdir(config.image_path) if day is None or file.startswith(day)]
+    frames = [file for file in files if is_usable_frame(file)]
+    if day is None:
+        frames = get_latest_day(frames)
+    return sorted(frames)
+
+
+def render_timelapse_frame(file: str, resolution: tuple[int, int]) -> Image.Image:
+    """
+    Render frame of the time-lapse with caption, cached render or the wallpaper is scaled as it is when original
+    is not stored
+    :param file: filename from the image folder
+    :param resolution: size of the frame
+    :return: rendered frame
+    """
+    code = file[:14]
+    original_path = find_original(code)
+    if original_path is not None:
+        earth_image = resize_image(original_path, size=resolution[1])
+        return connect_images(earth_image, get_description_image(code), resolution)
+    render_path = get_render_path(code)
+    if not os.path.isfile(render_path):
+        render_path = os.path.join(config.image_path, file)
+    with Image.open(render_path) as image:
+        return image.convert("RGB").resize(resolution)
+
+
+class LazyFrames(Image.Image):
+    """
+    Multi-frame image which renders frame only when it is seeked, so encoders iterating over frames keep a single
+    frame in memory
+    """
+
+    def __init__(self, files: list[str], render: Callable[[str], Image.Image]) -> None:
+        """
+        Init image with the first frame
+        :param files: filenames of frames
+        :param render: function rendering frame from filename
+        """
+        super().__init__()
+        self._files = files
+        self._render = render
+        self._frame = -1
+        self.n_frames = len(files)
+        self.seek(0)
+
+    def seek(self, frame: int) -> None:
+        """
+        Render frame and make it the current one
+        :param frame: index of frame
+        :return: None
+        """
+        if frame == self._frame:
+            return
+        image = self._render(self._files[frame])
+        self.im = image.im
+        self._mode = image.mode
+        self._size = image.size
+        self._frame = frame
+
+    def tell(self) -> int:
+        """
+        Index of the current frame
+        :return: index
+        """
+        return self._frame
+
+
+def write_gif(fp: IO[bytes], frames: Iterable[Image.Image], duration: int) -> int:
+    """
+    Write animated GIF frame by frame, every frame gets its own palette
+    :param fp: output file
+    :param frames: RGB frames
+    :param duration: display time of every frame in milliseconds
+    :return: number of written frames
+    """
+    count = 0
+    for frame in frames:
+        frame = frame.quantize(256)
+        if not count:
+            header, _ = GifImagePlugin.getheader(frame, info={"loop": 0, "duration": duration})
+            fp.write(b"".join(header))
+        data = GifImagePlugin.getdata(  # type: ignore[no-untyped-call]
+            frame, duration=duration, include_color_table=True
+        )
+        fp.write(b"".join(data))
+        count += 1
+    fp.write(b";")
+    return count
+
+
+def export_timelapse(
+    output_path: str,
+    day: str | None = None,
+    resolution: tuple[int, int] | None = None,
+    duration: int = 200,
+    **params: Any,
+) -> int:
+    """
+    Export the day's frames as animated GIF or WebP, format is chosen by file extension
+
+    Frames are rendered and passed to the encoder one at a time, so memory use doesn't depend on number of frames.
+    GIF is written to the file as frames come, WebP encoder keeps only the compressed frames.
+    :param output_path: path to animation, file is replaced atomically
+    :param day: date of frames e.g. 20240208, the latest day by default
+    :param resolution: size of the animation, screen size by default
+    :param duration: display time of every frame in milliseconds
+    :param params: additional options of the WebP encoder e.g. quality
+    :return: number of exported frames
+    :raises ValueError: when format is not supported or there are no frames of the day
+    """
+    image_format = TIMELAPSE_FORMATS.get(os.path.splitext(output_path)[1].lower())
+    if image_format is None:
+        raise ValueError(f"Unsupported time-lapse format of {output_path}, use one of {list(TIMELAPSE_FORMATS)}")
+    files = get_day_frames(day)
+    if not files:
+        raise ValueError(f"No usable frames of day {day or 'latest'}")
+    resolution = resolution or config.resolution
+
+    def render(file: str) -> Image.Image:
+        return render_timelapse_frame(file, resolution)
+
+    app_logger.info(f"Exporting {len(files)} frames to {output_path}")
+    with open(f"{output_path}.tmp", "wb") as fp:
+        if image_format == "GIF":
+            count = write_gif(fp, map(render, files), duration)
+        else:
+            LazyFrames(files, render).save(fp, format="WEBP", save_all=True, duration=duration, loop=0, **params)
+            count = len(files)
+    os.replace(f"{output_path}.tmp", output_path)
+    app_logger.info(f"Time-lapse of {count} frames saved to {output_path}")
+    return count
@@ -3,8 +3,10 @@ Image validation
 """
 
 import os.path
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import numpy as np
 from PIL import Image
 
 from config import config
@@ -89,3 +91,52 @@ def validate_file(file: str) -> bool:
             app_logger.info(f"Image error detected with validator: {validator.__name__} {validator.__doc__}")
             return False
     return True
+
+
+def check_filenames(files: list[str]) -> list[bool]:
+    """
+    Run filename validators over the whole listing at once
+
+    Works like check_file_extension, check_length_of_file, check_filename_without_extension and check_date_of_image
+    but the current date is generated only once per batch
+    :param files: filenames to check
+    :return: list of results in the same order as files
+    """
+    if not files:
+        return []
+    names = np.array(files, dtype=str)
+    stems = names.astype("<U14")
+    mask = np.char.endswith(names, ".png") & (np.char.str_len(names) == 18)
+    # isdecimal accepts the same digits as int(), isdigit accepts also superscripts which int() rejects
+    digits = np.char.isdecimal(stems)
+    # int() accepts also signs, whitespaces and underscores, fall back to it for names which are not plain digits
+    for index in np.flatnonzero(mask & ~digits):
+        digits[index] = check_filename_without_extension(files[index])
+    pattern = datetime.now().strftime("%Y%m%d%H%M%S")
+    return (mask & digits & (stems > pattern)).tolist()  # type: ignore[no-any-return]
+
+
+def validate_files(files: list[str], max_workers: int | None = None) -> tuple[list[str], list[str]]:
+    """
+    Validate a batch of files
+
+    Cheap filename checks are run for the whole listing at once, files which pass them are opened and verified
+    by check_if_file_is_not_broken on a thread pool
+    :param files: filenames to validate
+    :param max_workers: number of threads used to check file content
+    :return: valid, invalid in the same order as files
+    """
+    names_valid = check_filenames(files)
+    candidates = [file for file, is_valid in zip(files, names_valid) if is_valid]
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="Validator") as executor:
+        content_valid = dict(zip(candidates, executor.map(check_if_file_is_not_broken, candidates)))
+
+    valid = []
+    invalid = []
+    for file in files:
+        if content_valid.get(file, False):
+            valid.append(file)
+            continue
+        invalid.append(file)
+    app_logger.info(f"Batch validation: {len(files) - len(candidates)} files with wrong name")
+    return valid, invalid
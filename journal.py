@@ -0,0 +1,145 @@
+"""
+Journal of unfinished download jobs
+"""
+
+import json
+import os
+import threading
+from typing import Literal, TypedDict
+
+from config import config
+from logger import app_logger
+
+JobState = Literal["pending", "downloaded", "rendered"]
+JOB_STATES: tuple[JobState, ...] = ("pending", "downloaded", "rendered")
+
+
+class JournalEntry(TypedDict):
+    """
+    Progress of a single download job
+    """
+
+    image: str
+    state: JobState
+
+
+class JobJournal:
+    """
+    Download jobs which are scheduled but not finished, saved as JSON in the data folder
+
+    A job is added as pending when it is scheduled, moves to downloaded when the original (or the render in fleet
+    mode) is stored, to rendered when the wallpaper is in the image folder and is removed when it finishes. Jobs
+    left in the journal were cancelled or interrupted by shutdown and are resumed on the next start.
+    """
+
+    def __init__(self, path: str | None = None) -> None:
+        """
+        Init journal, entries are loaded on first use
+        :param path: path to JSON file, by default jobs.json in the data folder
+        """
+        self._path = path
+        self._entries: dict[str, JournalEntry] | None = None
+        self._loaded_path = ""
+        self._lock = threading.RLock()
+
+    @property
+    def path(self) -> str:
+        """
+        Path to journal file
+        :return: path
+        """
+        return self._path or os.path.join(config.data_path, "jobs.json")
+
+    @property
+    def entries(self) -> dict[str, JournalEntry]:
+        """
+        Unfinished jobs, loaded from disk on first access and when the data folder changes
+        :return: code to entry mapping
+        """
+        with self._lock:
+            if self._entries is None or self._loaded_path != self.path:
+                self._loaded_path = self.path
+                self._entries = self.load()
+            return self._entries
+
+    def load(self) -> dict[str, JournalEntry]:
+        """
+        Read journal file
+        :return: code to entry mapping, empty if file does not exist or is broken
+        """
+        try:
+            with open(self.path, encoding="utf-8") as fp:
+                data = json.load(fp)
+            entries: dict[str, JournalEntry] = {
+                code: {"image": str(entry["image"]), "state": entry["state"]}
+                for code, entry in data.items()
+                if entry["state"] in JOB_STATES
+            }
+            app_logger.debug(f"Job journal loaded with {len(entries)} entries")
+            return entries
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as exception:
+            app_logger.error(f"Job journal can't be loaded: {exception!r}")
+            return {}
+
+    def save(self) -> None:
+        """
+        Write journal file, the file is replaced atomically
+        :return: None
+        """
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temporary_path = f"{self.path}.tmp"
+            with open(temporary_path, "w", encoding="utf-8") as fp:
+                json.dump(self.entries, fp)
+            os.replace(temporary_path, self.path)
+
+    def add(self, code: str, image: str) -> None:
+        """
+        Add scheduled job as pending, progress of job which is already in the journal is kept
+        :param code: coded date and time of the frame
+        :param image: name of image in api
+        :return: None
+        """
+        self.add_many({code: image})
+
+    def add_many(self, jobs: dict[str, str]) -> None:
+        """
+        Add scheduled jobs as pending and save the journal once, progress of jobs which are already in the journal
+        is kept
+        :param jobs: code to image name mapping
+        :return: None
+        """
+        with self._lock:
+            added = [code for code in jobs if code not in self.entries]
+            for code in added:
+                self.entries[code] = {"image": jobs[code], "state": "pending"}
+            if added:
+                self.save()
+
+    def mark(self, code: str, state: JobState) -> None:
+        """
+        Save progress of the job
+        :param code: coded date and time of the frame
+        :param state: reached state
+        :return: None
+        """
+        with self._lock:
+            entry = self.entries.get(code)
+            if entry is not None and entry["state"] != state:
+                entry["state"] = state
+                self.save()
+
+    def remove(self, code: str) -> None:
+        """
+        Remove finished job
+        :param code: coded date and time of the frame
+        :return: None
+        """
+        with self._lock:
+            if self.entries.pop(code, None) is not None:
+                self.save()
+
+
+journal = JobJournal()
@@ -2,49 +2,280 @@
 Main file of the app
 """
 
+import argparse
 import ctypes
+import multiprocessing
 import os
+import signal
 import sys
-import time
+from types import FrameType
+from typing import Callable
 
-from api import check_new_data
+from api import check_new_data, resume_downloads, shutdown_downloads
+from clock import get_clock
 from config import config
-from image.management import check_or_create_image_path, delete_files
+from fleet import FleetServer
+from image.batch import benchmark_render, render_directory
+from image.cache import prune_renders
+from image.management import (
+    check_or_create_image_path,
+    check_wallpapers_batch,
+    delete_files,
+)
+from image.retention import archive, get_latest_day
+from image.timelapse import export_timelapse
 from logger import app_logger
+from polling import poller
+from sync_profiler import profiler
 
 
-def display_wallpapers() -> None:
+def set_wallpaper(image_path: str) -> None:
+    """
+    Set image as desktop wallpaper
+    :param image_path: path to image
+    :return: None
+    :raises OSError: when wallpaper can't be set
+    """
+    ctypes.windll.user32.SystemParametersInfoW(20, 0, image_path, 1 | 2)
+
+
+def publish_wallpaper(image_path: str, wallpaper_setter: Callable[[str], None] = set_wallpaper) -> bool:
+    """
+    Set the newest image as wallpaper as soon as it is downloaded
+    :param image_path: path to image
+    :param wallpaper_setter: function setting wallpaper
+    :return: True if wallpaper was set
+    """
+    try:
+        wallpaper_setter(image_path)
+        app_logger.info("The newest wallpaper set up")
+        return True
+    except OSError as exception:
+        app_logger.critical(f"Exception while set wallpaper: {exception}")
+        return False
+
+
+def display_wallpapers(
+    wallpaper_setter: Callable[[str], None] = set_wallpaper,
+    duration: int | None = None,
+    published: str | None = None,
+) -> None:
     """
     A function that sets all files in a folder as wallpaper at equal intervals
+    :param wallpaper_setter: function setting wallpaper
+    :param duration: time in seconds until the next sync, by default every file is shown once during sync interval,
+        otherwise the rotation continues where it stopped and as many files are shown as fit into the duration
+    :param published: filename of the wallpaper which is already displayed, the rotation starts with it
     :return:
     """
-    number_of_files = len(os.listdir(config.image_path))
+    files = os.listdir(config.image_path)
+    if config.retention_enabled:
+        # older days are kept only in the archive
+        files = get_latest_day(files)
+    number_of_files = len(files)
     app_logger.info(f"Current number of images: {number_of_files}")
+    if not number_of_files and duration is not None:
+        get_clock().sleep(duration)
     if number_of_files:
         change_wallpaper_interval = config.sync_interval // number_of_files
+        first, count = 0, number_of_files
+        if duration is not None:
+            # position in the rotation follows the clock so short cycles don't start from the first file again
+            files = sorted(files)
+            first = int(get_clock().time() // max(change_wallpaper_interval, 1))
+            count = max(1, duration // max(change_wallpaper_interval, 1))
+            change_wallpaper_interval = duration // count
+        if published in files:
+            # the newest frame was set as soon as it was downloaded, it stays until its turn ends
+            first = files.index(published)
+        files = [files[(first + index) % number_of_files] for index in range(count)]
         app_logger.info(f"Wallpapers will be changed every {change_wallpaper_interval} seconds")
-        for file in os.listdir(config.image_path):
-            try:
-                ctypes.windll.user32.SystemParametersInfoW(20, 0, os.path.join(config.image_path, file), 1 | 2)
-            except OSError as exception:
-                app_logger.critical(f"Exception while set wallpaper: {exception}")
-                delete_files([file])
-                continue
-            app_logger.info("New wallpaper set up")
-            time.sleep(change_wallpaper_interval)
+        for index, file in enumerate(files):
+            if index or file != published:
+                try:
+                    wallpaper_setter(os.path.join(config.image_path, file))
+                except OSError as exception:
+                    app_logger.critical(f"Exception while set wallpaper: {exception}")
+                    delete_files([file])
+                    continue
+                app_logger.info("New wallpaper set up")
+            if config.retention_enabled:
+                archive.mark_displayed(file)
+            get_clock().sleep(change_wallpaper_interval)
+
+
+class ShutdownRequest(BaseException):
+    """
+    Raised in the main thread when the app receives a termination signal, like KeyboardInterrupt it isn't caught by
+    handlers of Exception
+    """
+
+
+def handle_signal(signum: int, _: FrameType | None) -> None:
+    """
+    Interrupt the main loop, a second signal interrupts waiting for running downloads
+    :param signum: number of the signal
+    :return: None
+    :raises ShutdownRequest: always
+    """
+    raise ShutdownRequest(signal.Signals(signum).name)
+
+
+def install_signal_handlers() -> None:
+    """
+    Handle signals which terminate the app, SIGBREAK is sent on Windows when the console is closed
+    :return: None
+    """
+    for name in ("SIGINT", "SIGTERM", "SIGBREAK"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), handle_signal)
 
 
 def main() -> None:
     """
-    Main loop of the program
+    Main loop of the program, jobs interrupted by the previous shutdown are resumed first
+    :return:
+    """
+    install_signal_handlers()
+    try:
+        prune_renders()
+        if config.fleet_port:
+            FleetServer(config.fleet_port, config.fleet_host).start()
+        resume_downloads()
+        while True:  # Checks for new data every half hour or when new data are expected
+            run_cycle()
+    except ShutdownRequest as request:
+        app_logger.info(f"{request} received, waiting up to {config.shutdown_timeout} seconds for running downloads")
+        try:
+            shutdown_downloads(config.shutdown_timeout)
+        except ShutdownRequest:
+            app_logger.warning("Shutdown forced, running downloads will be resumed on the next start")
+
+
+def run_cycle(wallpaper_setter: Callable[[str], None] = set_wallpaper) -> None:
+    """
+    Single sync cycle, checks for new data and displays wallpapers until the next sync
+    :param wallpaper_setter: function setting wallpaper
     :return:
     """
-    while True:  # Checks for new data every half hour
-        check_or_create_image_path()
-        check_new_data()
-        display_wallpapers()
+    profiler.start_cycle()
+    check_or_create_image_path()
+    published: list[str] = []
+
+    def on_latest(image_path: str) -> None:
+        if publish_wallpaper(image_path, wallpaper_setter):
+            published.append(os.path.basename(image_path))
+
+    check_new_data(on_latest=on_latest)
+    # with adaptive polling the next sync comes when new data are likely to be published
+    duration = poller.next_delay() if config.adaptive_polling else None
+    display_wallpapers(wallpaper_setter, duration, published[-1] if published else None)
+
+
+def parse_resolution(value: str) -> tuple[int, int]:
+    """
+    Parse resolution argument
+    :param value: resolution e.g. 1920x1080
+    :return: width and height
+    :raises argparse.ArgumentTypeError: when value is not a resolution
+    """
+    try:
+        width, height = (int(part) for part in value.lower().split("x"))
+    except ValueError as exception:
+        raise argparse.ArgumentTypeError(f"resolution should be WIDTHxHEIGHT, current {value!r}") from exception
+    return width, height
+
+
+def parse_args(args: list[str]) -> argparse.Namespace:
+    """
+    Parse command line arguments, sync is run when no command is given
+    :param args: arguments without program name
+    :return: parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Earth images from EPIC API as desktop wallpapers")
+    profile_help = "profile every sync cycle, reports are saved in data/profiles (same as NASA_API_PROFILE=1)"
+    parser.add_argument("--profile", action="store_true", help=profile_help)
+    commands = parser.add_subparsers(dest="command", metavar="command")
+
+    sync = commands.add_parser("sync", help="sync and display wallpapers in a loop (default)")
+    sync.add_argument("--profile", action="store_true", default=argparse.SUPPRESS, help=profile_help)
+
+    render = commands.add_parser("render", help="render folder of originals on all cores")
+    render.add_argument("source", help="folder with originals, names contain date and time e.g. 20240208003145.png")
+    render.add_argument("destination", help="folder for rendered images")
+    render.add_argument("--resolution", type=parse_resolution, help="e.g. 1920x1080, screen resolution by default")
+    render.add_argument("--workers", type=int, help="number of processes, number of cores by default")
+    render.add_argument("--force", action="store_true", help="render also images which are up to date")
+
+    validate = commands.add_parser("validate", help="validate wallpapers folder")
+    validate.add_argument("--path", help="folder with wallpapers, the app image folder by default")
+
+    bench = commands.add_parser("bench", help="measure time of rendering a frame")
+    bench.add_argument("--frames", type=int, default=10, help="number of rendered frames")
+    bench.add_argument("--resolution", type=parse_resolution, help="e.g. 1920x1080, screen resolution by default")
+
+    timelapse = commands.add_parser("timelapse", help="export frames of a day as animated .gif or .webp")
+    timelapse.add_argument("path", help="path to animation")
+    timelapse.add_argument("--day", help="date of frames e.g. 20240208, the latest day by default")
+    return parser.parse_args(args)
+
+
+def print_progress(done: int, total: int, code: str) -> None:
+    """
+    Print progress of batch rendering
+    :param done: number of finished frames
+    :param total: number of all frames
+    :param code: code of the last finished frame
+    :return: None
+    """
+    print(f"[{done:>{len(str(total))}}/{total}] {code}", flush=True)
+
+
+def run_command(arguments: argparse.Namespace) -> int:
+    """
+    Run command given in arguments
+    :param arguments: parsed arguments
+    :return: exit code
+    """
+    if arguments.command == "render":
+        rendered, skipped, failed = render_directory(
+            arguments.source,
+            arguments.destination,
+            resolution=arguments.resolution,
+            workers=arguments.workers,
+            force=arguments.force,
+            progress=print_progress,
+        )
+        print(f"Rendered {len(rendered)}, up to date {len(skipped)}, failed {len(failed)}")
+        return 1 if failed else 0
+    if arguments.command == "validate":
+        if arguments.path:
+            config.image_path = arguments.path
+        latest, valid, invalid = check_wallpapers_batch()
+        for file in invalid:
+            print(f"invalid: {file}")
+        print(f"Valid {len(valid)}, invalid {len(invalid)}, latest {latest}")
+        return 1 if invalid else 0
+    if arguments.command == "bench":
+        for stage, seconds in benchmark_render(arguments.frames, arguments.resolution).items():
+            print(f"{stage:<16} {seconds * 1000:8.1f} ms/frame")
+        return 0
+    if arguments.command == "timelapse":
+        try:
+            count = export_timelapse(arguments.path, day=arguments.day)
+        except ValueError as exception:
+            print(f"Time-lapse not exported: {exception}")
+            return 1
+        print(f"Exported {count} frames to {arguments.path}")
+        return 0
+    if arguments.profile:
+        config.profiling = True
+    main()
+    return 0
 
 
 if __name__ == "__main__":
+    # render workers of the frozen executable run this script again, they must stop here
+    multiprocessing.freeze_support()
     app_logger.debug(f"App start with args: {sys.argv[1:]}")
-    main()
+    sys.exit(run_command(parse_args(sys.argv[1:])))
@@ -0,0 +1,155 @@
+"""
+Adaptive polling of EPIC API
+"""
+
+import json
+import os
+import threading
+from typing import Any, TypedDict
+
+from clock import get_clock
+from config import ONE_DAY, config
+from logger import app_logger
+
+
+class PollHistory(TypedDict):
+    """
+    Saved state of poll scheduler
+    """
+
+    last_code: str
+    arrivals: list[float]
+
+
+def get_circular_distance(first: float, second: float, period: float = ONE_DAY) -> float:
+    """
+    Distance between two moments of a cycle, e.g. 23:50 and 0:10 are 20 minutes apart
+    :param first: moment in seconds
+    :param second: moment in seconds
+    :param period: length of the cycle in seconds
+    :return: distance in seconds
+    """
+    distance = abs(first - second) % period
+    return min(distance, period - distance)
+
+
+class PollScheduler:
+    """
+    Learns at what time of day new data arrive and chooses delay of the next poll
+
+    Every time the newest frame in API changes, time of its arrival is saved. Around the time of day of past arrivals
+    the API is polled often, at other times rarely, but never later than the next expected arrival. After data
+    arrived the scheduler waits for the next window.
+    """
+
+    def __init__(
+        self,
+        path: str | None = None,
+        min_interval: int = 5 * 60,
+        max_interval: int = 2 * 60 * 60,
+        margin: int = 45 * 60,
+        history_size: int = 30,
+    ) -> None:
+        """
+        Init scheduler, history is loaded on first use
+        :param path: path to JSON file, by default poll_history.json in the data folder
+        :param min_interval: delay in seconds when data are expected
+        :param max_interval: maximum delay in seconds
+        :param margin: time in seconds before and after past arrivals when data are expected
+        :param history_size: number of remembered arrivals
+        """
+        self._path = path
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.margin = margin
+        self.history_size = history_size
+        self._history: PollHistory | None = None
+        self._loaded_path = ""
+        self._lock = threading.RLock()
+
+    @property
+    def path(self) -> str:
+        """
+        Path to history file
+        :return: path
+        """
+        return self._path or os.path.join(config.data_path, "poll_history.json")
+
+    @property
+    def history(self) -> PollHistory:
+        """
+        Saved state, loaded from disk on first access and when the data folder changes
+        :return: history
+        """
+        with self._lock:
+            if self._history is None or self._loaded_path != self.path:
+                self._loaded_path = self.path
+                self._history = self.load()
+            return self._history
+
+    def load(self) -> PollHistory:
+        """
+        Read history file
+        :return: history, empty if file does not exist or is broken
+        """
+        try:
+            with open(self.path, encoding="utf-8") as fp:
+                data: dict[str, Any] = json.load(fp)
+            return {"last_code": str(data["last_code"]), "arrivals": [float(value) for value in data["arrivals"]]}
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as exception:
+            app_logger.error(f"Poll history can't be loaded: {exception!r}")
+        return {"last_code": "", "arrivals": []}
+
+    def save(self) -> None:
+        """
+        Write history file, the file is replaced atomically
+        :return: None
+        """
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(f"{self.path}.tmp", "w", encoding="utf-8") as fp:
+                json.dump(self.history, fp)
+            os.replace(f"{self.path}.tmp", self.path)
+
+    def observe(self, code: str, now: float | None = None) -> bool:
+        """
+        Note the newest frame returned by API, arrival is recorded when it is newer than the last one
+        :param code: code of the newest frame
+        :param now: timestamp of the poll, current time by default
+        :return: True if new data arrived
+        """
+        now = get_clock().time() if now is None else now
+        with self._lock:
+            history = self.history
+            if code <= history["last_code"]:
+                return False
+            # the first poll tells nothing about time of publication
+            if history["last_code"]:
+                history["arrivals"] = (history["arrivals"] + [now])[-self.history_size :]
+                app_logger.info(f"New data arrived, {len(history['arrivals'])} arrivals in poll history")
+            history["last_code"] = code
+            self.save()
+            return True
+
+    def next_delay(self, now: float | None = None) -> int:
+        """
+        Delay of the next poll
+        :param now: current timestamp, current time by default
+        :return: delay in seconds, sync interval when nothing is learned yet
+        """
+        now = get_clock().time() if now is None else now
+        arrivals = self.history["arrivals"]
+        if not arrivals:
+            return config.sync_interval
+        time_of_day = now % ONE_DAY
+        arrived_recently = now - arrivals[-1] < 2 * self.margin
+        expected = any(get_circular_distance(time_of_day, arrival % ONE_DAY) <= self.margin for arrival in arrivals)
+        if expected and not arrived_recently:
+            return self.min_interval
+        next_window = min((arrival % ONE_DAY - self.margin - time_of_day) % ONE_DAY for arrival in arrivals)
+        return int(max(self.min_interval, min(self.max_interval, next_window)))
+
+
+poller = PollScheduler()
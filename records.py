@@ -0,0 +1,144 @@
+"""
+Compact records of EPIC API responses and streaming parser of JSON arrays
+"""
+
+import codecs
+import json
+from typing import Any, Iterable, Iterator
+
+from image.management import generate_code
+
+
+class Record:
+    """
+    Frame listed by EPIC API, only fields used by the app are kept
+    """
+
+    __slots__ = ("image", "code", "lat", "lon")
+
+    def __init__(self, image: str, code: str, lat: float | None = None, lon: float | None = None) -> None:
+        """
+        Init record
+        :param image: name of image in api
+        :param code: coded date and time of the frame
+        :param lat: latitude of the point of the earth in the centre of the frame
+        :param lon: longitude of the point of the earth in the centre of the frame
+        """
+        self.image = image
+        self.code = code
+        self.lat = lat
+        self.lon = lon
+
+    def __repr__(self) -> str:
+        """
+        Representation of record
+        :return: representation
+        """
+        return f"Record({self.image!r}, {self.code!r}, {self.lat!r}, {self.lon!r})"
+
+    def __eq__(self, other: object) -> bool:
+        """
+        Records are equal when all fields are equal
+        :param other: compared object
+        :return: True if equal
+        """
+        if not isinstance(other, Record):
+            return NotImplemented
+        return (self.image, self.code, self.lat, self.lon) == (other.image, other.code, other.lat, other.lon)
+
+    @property
+    def date(self) -> str:
+        """
+        Date of the frame in format of API
+        :return: date e.g. 2024-02-08 00:03:42
+        """
+        code = self.code
+        return f"{code[0:4]}-{code[4:6]}-{code[6:8]} {code[8:10]}:{code[10:12]}:{code[12:14]}"
+
+    @classmethod
+    def from_json(cls, data: dict[str, Any]) -> "Record":
+        """
+        Create record from JSON object of API response
+        :param data: JSON object with image, date and optionally centroid_coordinates
+        :return: record
+        :raises KeyError: when image or date is missing
+        :raises ValueError: when date has unknown format
+        """
+        centroid = data.get("centroid_coordinates") or {}
+        return cls(data["image"], generate_code(data["date"]), centroid.get("lat"), centroid.get("lon"))
+
+    def to_json(self) -> dict[str, Any]:
+        """
+        Convert record to JSON object in format of API response
+        :return: JSON object
+        """
+        data: dict[str, Any] = {"image": self.image, "date": self.date}
+        if self.lat is not None and self.lon is not None:
+            data["centroid_coordinates"] = {"lat": self.lat, "lon": self.lon}
+        return data
+
+
+def iter_json_batches(chunks: Iterable[bytes]) -> Iterator[list[Any]]:
+    """
+    Parse JSON array from chunks of UTF-8 text, items completed by every chunk are yielded together as soon as the
+    chunk is parsed so only the unparsed tail of the document is kept in memory
+    :param chunks: parts of the document
+    :return: iterator of lists of items, lists may be empty
+    :raises ValueError: when document is not a JSON array or is incomplete
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    started = False
+    expect_item = True
+    for chunk in chunks:
+        buffer += text_decoder.decode(chunk)
+        position = 0
+        items: list[Any] = []
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position == len(buffer):
+                break
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError(f"JSON array expected, got {buffer[position]!r}")
+                started = True
+                position += 1
+            elif buffer[position] == "]":
+                yield items
+                return
+            elif not expect_item:
+                if buffer[position] != ",":
+                    raise ValueError(f"Comma expected between items, got {buffer[position]!r}")
+                expect_item = True
+                position += 1
+            else:
+                try:
+                    item, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    # item continues in the next chunk
+                    break
+                # a number may continue in the next chunk, e.g. "1." or "1e" is decoded as 1 followed by garbage, so it
+                # is complete only when a delimiter follows it
+                if not isinstance(item, (dict, list, str)) and (
+                    end == len(buffer) or not (buffer[end].isspace() or buffer[end] in ",]")
+                ):
+                    break
+                items.append(item)
+                position = end
+                expect_item = False
+        buffer = buffer[position:]
+        yield items
+    raise ValueError("JSON array is incomplete")
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """
+    Parse JSON array from chunks of UTF-8 text, every item is yielded as soon as the chunk completing it is parsed
+    :param chunks: parts of the document
+    :return: iterator of items
+    :raises ValueError: when document is not a JSON array or is incomplete
+    """
+    for items in iter_json_batches(chunks):
+        yield from items
@@ -0,0 +1,59 @@
+"""
+Region-aware selection of frames
+"""
+
+import numpy as np
+import numpy.typing as npt
+
+from logger import app_logger
+from records import Record
+
+
+def get_angular_distances(records: list[Record], lat: float, lon: float) -> npt.NDArray[np.float64]:
+    """
+    Angular distance between the region and the point of the earth in the centre of every frame
+
+    Records without coordinates get distance of 180 degrees
+    :param records: records of the data from API
+    :param lat: latitude of the region in degrees
+    :param lon: longitude of the region in degrees
+    :return: distances in degrees
+    """
+    centroids = np.array(
+        [
+            (record.lat, record.lon) if record.lat is not None and record.lon is not None else (np.nan, np.nan)
+            for record in records
+        ],
+        dtype=np.float64,
+    ).reshape(-1, 2)
+    latitudes, longitudes = np.radians(centroids).T
+    region_lat, region_lon = np.radians(lat), np.radians(lon)
+    cosines = np.sin(latitudes) * np.sin(region_lat) + np.cos(latitudes) * np.cos(region_lat) * np.cos(
+        longitudes - region_lon
+    )
+    distances: npt.NDArray[np.float64] = np.nan_to_num(np.degrees(np.arccos(np.clip(cosines, -1, 1))), nan=180.0)
+    return distances
+
+
+def select_records(
+    records: list[Record],
+    region: tuple[float, float],
+    max_frames: int = 0,
+    max_angle: int = 0,
+) -> list[Record]:
+    """
+    Select frames in which the region faces the camera
+    :param records: records of the data from API
+    :param region: latitude and longitude of the region in degrees
+    :param max_frames: number of frames closest to the region, 0 means no limit
+    :param max_angle: maximum distance between the region and the centre of the frame in degrees, 0 means no limit
+    :return: selected records in original order
+    """
+    distances = get_angular_distances(records, *region)
+    indexes = np.argsort(distances, kind="stable")
+    if max_angle:
+        indexes = indexes[distances[indexes] <= max_angle]
+    if max_frames:
+        indexes = indexes[:max_frames]
+    app_logger.info(f"{len(indexes)} of {len(records)} frames selected for region {region}")
+    return [records[index] for index in np.sort(indexes)]
@@ -0,0 +1,284 @@
+"""
+Job scheduler
+"""
+
+import itertools
+import queue
+import threading
+from concurrent.futures import Future, InvalidStateError, wait
+from typing import Any, Callable
+
+from logger import app_logger
+
+# job run by the current worker thread
+_local = threading.local()
+
+
+class Job:
+    """
+    Single unit of work waiting in the scheduler queue
+    """
+
+    def __init__(
+        self,
+        key: str,
+        func: Callable[..., Any],
+        kwargs: dict[str, Any],
+        priority: int,
+        timeout: float | None,
+        defer_timeout: bool = False,
+    ) -> None:
+        """
+        Init job
+        :param key: unique name of the job, e.g. image name
+        :param func: function to be called
+        :param kwargs: keyword arguments of the function
+        :param priority: lower value is run first
+        :param timeout: maximum time of running in seconds
+        :param defer_timeout: timeout is started by the job itself with start_timeout
+        """
+        self.key = key
+        self.func = func
+        self.kwargs = kwargs
+        self.priority = priority
+        self.timeout = timeout
+        self.defer_timeout = defer_timeout
+        self.future: Future[Any] = Future()
+        self.expired = threading.Event()
+        self.watchdog: threading.Timer | None = None
+
+    def start_timeout(self) -> None:
+        """
+        Start watchdog of the job, it is started only once
+        :return: None
+        """
+        if self.timeout is None or self.watchdog is not None:
+            return
+        self.watchdog = threading.Timer(self.timeout, JobScheduler._expire, args=(self,))
+        self.watchdog.daemon = True
+        self.watchdog.start()
+
+
+def start_timeout() -> None:
+    """
+    Start timeout of the job run by the current thread, e.g. when its transfer begins after waiting for a free slot,
+    nothing is done outside of scheduler jobs
+    :return: None
+    """
+    job: Job | None = getattr(_local, "job", None)
+    if job is not None:
+        job.start_timeout()
+
+
+def check_timeout() -> None:
+    """
+    Stop the job run by the current thread when it exceeded its timeout, nothing is done outside of scheduler jobs
+    :return: None
+    :raises TimeoutError: when timeout is exceeded
+    """
+    job: Job | None = getattr(_local, "job", None)
+    if job is not None and job.expired.is_set():
+        raise TimeoutError(f"Job {job.key} timed out")
+
+
+class JobScheduler:
+    """
+    Runs jobs on a pool of worker threads in order of priority
+
+    Every job gets a future which can be cancelled while the job is waiting in the queue. A running job that exceeds
+    its timeout has TimeoutError set on its future, its result is discarded when it finally finishes. The key stays
+    registered until the function returns so the same job is never run twice at once, long running steps should
+    call check_timeout to stop early.
+    """
+
+    def __init__(self, max_workers: int = 4, name: str = "Worker") -> None:
+        """
+        Init scheduler, worker threads are started with the first job
+        :param max_workers: number of worker threads
+        :param name: prefix of worker thread names
+        """
+        self.max_workers = max_workers
+        self.name = name
+        self._queue: queue.PriorityQueue[tuple[int, int, Job | None]] = queue.PriorityQueue()
+        self._counter = itertools.count()
+        self._jobs: dict[str, Job] = {}
+        self._workers: list[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        key: str,
+        func: Callable[..., Any],
+        priority: int = 0,
+        timeout: float | None = None,
+        defer_timeout: bool = False,
+        **kwargs: Any,
+    ) -> Future[Any]:
+        """
+        Add job to the queue, if job with the same key is still waiting or running its future is returned
+        :param key: unique name of the job
+        :param func: function to be called
+        :param priority: lower value is run first
+        :param timeout: maximum time of running in seconds
+        :param defer_timeout: timeout starts when the job calls start_timeout instead of when it starts running
+        :param kwargs: keyword arguments of the function
+        :return: future of the job
+        """
+        with self._lock:
+            if key in self._jobs:
+                app_logger.debug(f"Job {key} already scheduled")
+                return self._jobs[key].future
+            job = Job(key, func, kwargs, priority, timeout, defer_timeout)
+            self._jobs[key] = job
+            # running job is forgotten when its function returns, not when the watchdog sets its future
+            job.future.add_done_callback(lambda future: self._forget(job) if future.cancelled() else None)
+            self._queue.put((priority, next(self._counter), job))
+            self._start_worker()
+        app_logger.debug(f"Job {key} scheduled with priority {priority}")
+        return job.future
+
+    def cancel(self, key: str) -> bool:
+        """
+        Cancel job which is still waiting in the queue
+        :param key: name of the job
+        :return: True if job was cancelled
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+        return job is not None and job.future.cancel()
+
+    def cancel_all(self) -> int:
+        """
+        Cancel all jobs waiting in the queue
+        :return: number of cancelled jobs
+        """
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return sum(job.future.cancel() for job in jobs)
+
+    def pending(self) -> list[str]:
+        """
+        Names of jobs which are waiting or running
+        :return: list of keys
+        """
+        with self._lock:
+            return list(self._jobs)
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """
+        Wait until all jobs scheduled so far are done
+        :param timeout: maximum time of waiting in seconds
+        :return: True if all jobs are done
+        """
+        with self._lock:
+            futures = [job.future for job in self._jobs.values()]
+        done, _ = wait(futures, timeout=timeout)
+        return len(done) == len(futures)
+
+    def _forget(self, job: Job) -> None:
+        """
+        Remove finished or cancelled job from the register
+        :param job: finished job
+        :return: None
+        """
+        with self._lock:
+            if self._jobs.get(job.key) is job:
+                del self._jobs[job.key]
+
+    def _start_worker(self) -> None:
+        """
+        Start new worker thread if limit is not reached, must be called with lock acquired
+        :return: None
+        """
+        self._workers = [worker for worker in self._workers if worker.is_alive()]
+        if len(self._workers) >= min(self.max_workers, len(self._jobs)):
+            return
+        worker = threading.Thread(
+            target=self._work,
+            name=f"{self.name}_{len(self._workers)}",
+            daemon=True,
+        )
+        self._workers.append(worker)
+        worker.start()
+
+    def _work(self) -> None:
+        """
+        Worker loop, takes jobs from the queue until stop marker is received
+        :return: None
+        """
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                return
+            if not job.future.set_running_or_notify_cancel():
+                app_logger.debug(f"Job {job.key} cancelled")
+                continue
+            self._run(job)
+            self._forget(job)
+
+    @staticmethod
+    def _run(job: Job) -> None:
+        """
+        Run job and set its result
+        :param job: job to be run
+        :return: None
+        """
+        _local.job = job
+        if not job.defer_timeout:
+            job.start_timeout()
+        try:
+            result = job.func(**job.kwargs)
+        except BaseException as exception:  # pylint: disable=broad-exception-caught
+            app_logger.error(f"Job {job.key} failed: {exception!r}")
+            JobScheduler._set(job, exception=exception)
+        else:
+            JobScheduler._set(job, result=result)
+        finally:
+            _local.job = None
+            if job.watchdog is not None:
+                job.watchdog.cancel()
+
+    @staticmethod
+    def _expire(job: Job) -> None:
+        """
+        Mark job which exceeded its timeout as failed
+        :param job: running job
+        :return: None
+        """
+        app_logger.error(f"Job {job.key} exceeded timeout of {job.timeout} seconds")
+        job.expired.set()
+        JobScheduler._set(job, exception=TimeoutError(f"Job {job.key} timed out"))
+
+    @staticmethod
+    def _set(job: Job, result: Any = None, exception: BaseException | None = None) -> None:
+        """
+        Set result of the job unless it has been already set by the watchdog
+        :param job: job
+        :param result: value returned by the job
+        :param exception: exception raised by the job
+        :return: None
+        """
+        try:
+            if exception is not None:
+                job.future.set_exception(exception)
+            else:
+                job.future.set_result(result)
+        except InvalidStateError:
+            app_logger.debug(f"Result of job {job.key} discarded")
+
+    def shutdown(self, cancel_pending: bool = False, timeout: float | None = None) -> None:
+        """
+        Stop worker threads after the queue is processed
+        :param cancel_pending: cancel jobs waiting in the queue
+        :param timeout: maximum time of waiting for each worker in seconds
+        :return: None
+        """
+        if cancel_pending:
+            app_logger.info(f"Cancelled {self.cancel_all()} waiting jobs")
+        with self._lock:
+            workers = list(self._workers)
+            self._workers = []
+        for _ in workers:
+            self._queue.put((2**63, next(self._counter), None))
+        for worker in workers:
+            worker.join(timeout)
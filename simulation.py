@@ -0,0 +1,320 @@
+"""
+Simulation of long-running sync and rotation schedules against a local EPIC API stand-in
+"""
+
+import argparse
+import datetime
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from PIL import Image, ImageDraw
+
+from api import scheduler
+from clock import SimulatedClock, get_clock, set_clock
+from config import ONE_DAY, config
+from image.cache import ARCHIVE_VARIANTS
+from image.management import generate_code
+from logger import app_logger
+from main import run_cycle
+
+# EPIC takes about 13 frames a day and publishes them in one batch on the next day
+FRAMES_PER_DAY = 13
+FRAME_INTERVAL = 110 * 60
+PUBLISH_DELAY = ONE_DAY + 8 * 60 * 60
+
+ARCHIVE_PATTERN = re.compile(
+    r"^/archive/natural/\d{4}/\d{2}/\d{2}/(?P<variant>png|jpg|thumbs)/(?P<image>epic_1b_\d{14})\.(png|jpg)$"
+)
+
+
+def to_utc(timestamp: float) -> datetime.datetime:
+    """
+    Convert timestamp to naive UTC datetime used by EPIC
+    :param timestamp: seconds since epoch
+    :return: datetime
+    """
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).replace(tzinfo=None)
+
+
+def to_timestamp(date: datetime.datetime) -> float:
+    """
+    Convert naive UTC datetime to timestamp
+    :param date: datetime
+    :return: seconds since epoch
+    """
+    return date.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+class LocalEpicServer:
+    """
+    HTTP server imitating EPIC API and image archive, frames are published according to the simulated clock
+    """
+
+    def __init__(self, image_size: int = 512) -> None:
+        """
+        Init server
+        :param image_size: width and height of served png images, other variants are scaled like in EPIC archive
+        """
+        self.image_size = image_size
+        self.bytes_sent = 0
+        self._images: dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, name="LocalEpicServer", daemon=True)
+
+    @property
+    def url(self) -> str:
+        """
+        Base url of the server
+        :return: url
+        """
+        host, port = self._server.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    def start(self) -> None:
+        """
+        Start serving in background thread
+        :return: None
+        """
+        self._thread.start()
+        app_logger.info(f"Local EPIC server started at {self.url}")
+
+    def stop(self) -> None:
+        """
+        Stop server
+        :return: None
+        """
+        self._server.shutdown()
+        self._server.server_close()
+
+    @staticmethod
+    def published_at(code: str) -> float:
+        """
+        Moment the frame becomes available in the API
+        :param code: coded date and time of the frame
+        :return: timestamp
+        """
+        day = datetime.datetime.strptime(code[:8], "%Y%m%d")
+        return to_timestamp(day) + PUBLISH_DELAY
+
+    @staticmethod
+    def records(timestamp: float) -> list[dict[str, Any]]:
+        """
+        Records returned by the API at given moment, frames of the latest published day
+        :param timestamp: current timestamp
+        :return: records ordered by date
+        """
+        day = to_utc(timestamp - PUBLISH_DELAY).replace(hour=0, minute=0, second=0, microsecond=0)
+        records = []
+        for index in range(FRAMES_PER_DAY):
+            date = day + datetime.timedelta(seconds=30 * 60 + index * FRAME_INTERVAL)
+            records.append(
+                {
+                    "image": f"epic_1b_{date:%Y%m%d%H%M%S}",
+                    "date": f"{date:%Y-%m-%d %H:%M:%S}",
+                    "centroid_coordinates": {"lat": 0.0, "lon": 180.0 - 360.0 * (date.hour * 60 + date.minute) / 1440},
+                }
+            )
+        return records
+
+    def image(self, image_name: str, variant: str = "png") -> bytes:
+        """
+        Synthetic image of the earth, generated once per frame and variant
+        :param image_name: name of image in api
+        :param variant: archive variant, png, jpg or thumbs
+        :return: content of PNG or JPEG file
+        """
+        with self._lock:
+            key = f"{variant}/{image_name}"
+            if key not in self._images:
+                extension, size = ARCHIVE_VARIANTS[variant]
+                size = max(size * self.image_size // ARCHIVE_VARIANTS["png"][1], 1)
+                shade = int(image_name[-6:]) % 200
+                image = Image.new("RGB", (size, size), "black")
+                ImageDraw.Draw(image).ellipse((0, 0, size - 1, size - 1), (20, shade, 255 - shade))
+                buffer = io.BytesIO()
+                image.save(buffer, format="PNG" if extension == "png" else "JPEG")
+                self._images[key] = buffer.getvalue()
+            return self._images[key]
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        """
+        Create request handler bound to this server
+        :return: handler class
+        """
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """
+            Handler of API and archive requests
+            """
+
+            def do_GET(self) -> None:  # pylint: disable=invalid-name
+                """
+                Serve API or archive request
+                :return: None
+                """
+                match = ARCHIVE_PATTERN.match(self.path)
+                etag = None
+                if self.path == "/api/natural":
+                    records = server.records(get_clock().time())
+                    etag = f'"{generate_code(records[-1]["date"])}"'
+                    if self.headers.get("If-None-Match") == etag:
+                        self.send_response(304)
+                        self.send_header("ETag", etag)
+                        self.end_headers()
+                        return
+                    body = json.dumps(records).encode()
+                    content_type = "application/json"
+                elif match and server.published_at(match["image"][8:]) <= get_clock().time():
+                    body = server.image(match["image"], match["variant"])
+                    content_type = "image/png" if match["variant"] == "png" else "image/jpeg"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                if etag:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+                with server._lock:  # pylint: disable=protected-access
+                    server.bytes_sent += len(body)
+
+            def log_message(self, format: str, *args: Any) -> None:  # pylint: disable=redefined-builtin
+                """
+                Redirect request log to app logger
+                :return: None
+                """
+                app_logger.debug(f"Local EPIC server: {format % args}")
+
+        return Handler
+
+
+class CycleReport:
+    """
+    Measurements of a single simulated cycle
+    """
+
+    def __init__(self, cycle: int, simulated_time: float) -> None:
+        """
+        Init empty report
+        :param cycle: number of the cycle
+        :param simulated_time: simulated timestamp of the cycle start
+        """
+        self.cycle = cycle
+        self.simulated_time = simulated_time
+        self.cpu_time = 0.0
+        self.wall_time = 0.0
+        self.downloaded_bytes = 0
+        self.stored_bytes = 0
+        self.latency: float | None = None
+
+    def __str__(self) -> str:
+        """
+        Format report as table row
+        :return: row
+        """
+        latency = "-" if self.latency is None else f"{self.latency / 60:.0f} min"
+        return (
+            f"{self.cycle:>6} {to_utc(self.simulated_time):%Y-%m-%d %H:%M} {self.cpu_time:>8.3f} s "
+            f"{self.wall_time:>8.3f} s {self.downloaded_bytes:>12} {self.stored_bytes:>12} {latency:>10}"
+        )
+
+
+def get_folder_size(path: str) -> int:
+    """
+    Sum size of all files in folder and subfolders
+    :param path: folder
+    :return: size in bytes
+    """
+    return sum(os.path.getsize(os.path.join(root, file)) for root, _, files in os.walk(path) for file in files)
+
+
+def simulate(days: float, start: float | None = None, image_size: int = 512) -> list[CycleReport]:
+    """
+    Replay sync and rotation cycles in simulated time
+
+    The app runs against local API stand-in in temporary folders, sleeping moves the simulated clock
+    :param days: simulated period
+    :param start: simulated timestamp of the first cycle, now by default
+    :param image_size: size of images served by the stand-in
+    :return: report of every cycle
+    """
+    clock = SimulatedClock(time.time() if start is None else start)
+    previous_clock = set_clock(clock)
+    previous_settings = (config.image_path, config.data_path, config.api_url)
+    server = LocalEpicServer(image_size=image_size)
+    server.start()
+    directory = tempfile.TemporaryDirectory(prefix="nasa_api_simulation_")
+    config.image_path = os.path.join(directory.name, "images")
+    config.data_path = os.path.join(directory.name, "data")
+    config.api_url = server.url
+
+    reports: list[CycleReport] = []
+    first_display: dict[str, float] = {}
+
+    def record_wallpaper(image_path: str) -> None:
+        first_display.setdefault(os.path.basename(image_path)[:14], clock.time())
+
+    try:
+        end = clock.time() + days * ONE_DAY
+        while clock.time() < end:
+            report = CycleReport(len(reports), clock.time())
+            cpu_time, wall_time, bytes_sent = time.process_time(), time.perf_counter(), server.bytes_sent
+            known = set(first_display)
+
+            run_cycle(wallpaper_setter=record_wallpaper)
+            scheduler.wait()
+
+            report.cpu_time = time.process_time() - cpu_time
+            report.wall_time = time.perf_counter() - wall_time
+            report.downloaded_bytes = server.bytes_sent - bytes_sent
+            report.stored_bytes = get_folder_size(directory.name)
+            newest = max(first_display, default="")
+            if newest and newest not in known:
+                report.latency = first_display[newest] - server.published_at(newest)
+            if clock.time() == report.simulated_time:
+                # nothing to display, wait for the next sync like main loop does
+                clock.sleep(config.sync_interval)
+            reports.append(report)
+    finally:
+        scheduler.wait()
+        server.stop()
+        config.image_path, config.data_path, config.api_url = previous_settings
+        set_clock(previous_clock)
+        directory.cleanup()
+    return reports
+
+
+def parse_args(args: list[str]) -> argparse.Namespace:
+    """
+    Parse command line arguments
+    :param args: arguments without program name
+    :return: parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Replay sync cycles in simulated time")
+    parser.add_argument("--days", type=float, default=3, help="simulated period in days")
+    parser.add_argument("--image-size", type=int, default=512, help="size of images served by the stand-in")
+    return parser.parse_args(args)
+
+
+if __name__ == "__main__":
+    arguments = parse_args(sys.argv[1:])
+    cycle_reports = simulate(days=arguments.days, image_size=arguments.image_size)
+    print(
+        f"{'cycle':>6} {'simulated time':<16} {'cpu':>10} {'wall':>10} "
+        f"{'downloaded':>12} {'stored':>12} {'latency':>10}"
+    )
+    for cycle_report in cycle_reports:
+        print(cycle_report)
+    print(f"Simulated {arguments.days} days in {sum(report.wall_time for report in cycle_reports):.1f} s")
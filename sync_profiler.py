@@ -0,0 +1,158 @@
+"""
+Profiling of sync cycles
+"""
+
+import cProfile
+import datetime
+import functools
+import itertools
+import os
+import threading
+import tracemalloc
+from typing import Any, Callable, TypeVar
+
+from config import config
+from logger import app_logger
+
+FuncType = TypeVar("FuncType", bound=Callable[..., Any])
+
+# number of frames stored by tracemalloc for every allocation
+TRACEMALLOC_FRAMES = 10
+
+
+class CycleProfiler:
+    """
+    Profiles decorated functions with cProfile and tracemalloc and saves reports per sync cycle
+
+    When profiling is disabled decorated functions are called directly, the only cost is one attribute check.
+    Reports of every cycle are stored in own folder, only the newest folders are kept.
+    """
+
+    def __init__(self, path: str, keep_cycles: int = 20, top_allocations: int = 25) -> None:
+        """
+        Init profiler
+        :param path: folder for reports
+        :param keep_cycles: number of the newest cycles kept on disk
+        :param top_allocations: number of allocation sites in memory report
+        """
+        self.path = path
+        self.keep_cycles = keep_cycles
+        self.top_allocations = top_allocations
+        self.enabled = False
+        self.cycle = ""
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        self._tracing = 0
+        self._started_tracing = False
+
+    def start_cycle(self) -> None:
+        """
+        Start new cycle, reports of old cycles are removed
+        :return: None
+        """
+        self.enabled = config.profiling
+        if not self.enabled:
+            return
+        self.cycle = datetime.datetime.now().strftime("%Y%m%d%H%M%S%f")
+        os.makedirs(os.path.join(self.path, self.cycle), exist_ok=True)
+        self.rotate()
+        app_logger.info(f"Profiling cycle {self.cycle}")
+
+    def rotate(self) -> None:
+        """
+        Remove the oldest cycle folders above the limit
+        :return: None
+        """
+        cycles = sorted(os.listdir(self.path))
+        for cycle in cycles[: max(len(cycles) - self.keep_cycles, 0)]:
+            cycle_path = os.path.join(self.path, cycle)
+            for file in os.listdir(cycle_path):
+                os.remove(os.path.join(cycle_path, file))
+            os.rmdir(cycle_path)
+            app_logger.debug(f"Profiling cycle {cycle} removed")
+
+    def profile(self, func: FuncType) -> FuncType:
+        """
+        Decorator profiling function when profiling is enabled
+        :param func: function to be profiled
+        :return: wrapped function
+        """
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            # nested calls are already covered by the outer profile
+            if not self.enabled or getattr(self._local, "active", False):
+                return func(*args, **kwargs)
+            return self._run(func, *args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    def _run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run function under cProfile and tracemalloc and save reports
+        :param func: function to be profiled
+        :return: result of the function
+        """
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as exception:
+            # only one profiler can be active at once since Python 3.12
+            app_logger.debug(f"{func.__name__} not profiled: {exception}")
+            return func(*args, **kwargs)
+
+        self._local.active = True
+        self._start_tracing()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+            snapshot = tracemalloc.take_snapshot()
+            self._stop_tracing()
+            self._local.active = False
+            self.save(func.__name__, profile, snapshot)
+
+    def _start_tracing(self) -> None:
+        """
+        Start tracemalloc if it is not started by another profiled call
+        :return: None
+        """
+        with self._lock:
+            if not self._tracing and not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+                self._started_tracing = True
+            self._tracing += 1
+
+    def _stop_tracing(self) -> None:
+        """
+        Stop tracemalloc when the last profiled call is finished
+        :return: None
+        """
+        with self._lock:
+            self._tracing -= 1
+            if not self._tracing and self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+
+    def save(self, name: str, profile: cProfile.Profile, snapshot: tracemalloc.Snapshot) -> None:
+        """
+        Save pstats file and report of the top allocations
+        :param name: name of profiled function
+        :param profile: finished profile
+        :param snapshot: memory snapshot taken at the end of the call
+        :return: None
+        """
+        cycle_path = os.path.join(self.path, self.cycle)
+        os.makedirs(cycle_path, exist_ok=True)
+        prefix = os.path.join(cycle_path, f"{name}_{next(self._counter):04d}_{threading.current_thread().name}")
+        profile.dump_stats(f"{prefix}.pstats")
+        with open(f"{prefix}_allocations.txt", "w", encoding="utf-8") as fp:
+            fp.write(f"Top {self.top_allocations} allocations at the end of {name}\n")
+            for statistic in snapshot.statistics("lineno")[: self.top_allocations]:
+                fp.write(f"{statistic}\n")
+        app_logger.debug(f"Profile of {name} saved to {prefix}")
+
+
+profiler = CycleProfiler(os.path.join(config.data_path, "profiles"))
+profiled = profiler.profile
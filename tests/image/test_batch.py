@@ -0,0 +1,107 @@
+"""
+Test for batch rendering
+"""
+
+import os
+import tempfile
+import time
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import PIL.Image
+
+from image.batch import benchmark_render, find_originals, render_directory
+
+
+class TestBatchRender(TestCase):
+    """
+    Test rendering of folder with originals
+    """
+
+    def setUp(self) -> None:
+        """
+        Create folder with originals
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.directory.name, "originals")
+        self.destination = os.path.join(self.directory.name, "renders")
+        os.makedirs(self.source)
+        for file in ["20240208003145.png", "epic_1b_20240208041947.png", "20240208081011.thumbs.jpg"]:
+            PIL.Image.new("RGB", (64, 64), "blue").save(os.path.join(self.source, file))
+        with open(os.path.join(self.source, "notes.txt"), "w", encoding="utf-8") as fp:
+            fp.write("20240208120000")
+
+    def tearDown(self) -> None:
+        """
+        Remove temporary folder
+        :return:
+        """
+        self.directory.cleanup()
+
+    def test_find_originals(self) -> None:
+        """
+        Code should be taken from name of original, other files are ignored
+        :return:
+        """
+        self.assertListEqual(
+            ["20240208003145", "20240208041947", "20240208081011"], sorted(find_originals(self.source))
+        )
+
+    def test_render_directory(self) -> None:
+        """
+        Up to date outputs should be skipped, changed originals and resolutions rendered again
+        :return:
+        """
+        progress = MagicMock()
+        rendered, skipped, failed = render_directory(
+            self.source, self.destination, resolution=(160, 90), workers=2, progress=progress
+        )
+        self.assertListEqual(["20240208003145", "20240208041947", "20240208081011"], rendered)
+        self.assertListEqual([], skipped + failed)
+        self.assertListEqual([1, 2, 3], sorted(call.args[0] for call in progress.call_args_list))
+        with PIL.Image.open(os.path.join(self.destination, "20240208041947.png")) as image:
+            self.assertEqual((160, 90), image.size)
+
+        future = time.time() + 10
+        os.utime(os.path.join(self.source, "20240208003145.png"), (future, future))
+        rendered, skipped, _ = render_directory(self.source, self.destination, resolution=(160, 90), workers=2)
+        self.assertListEqual(["20240208003145"], rendered)
+        self.assertListEqual(["20240208041947", "20240208081011"], skipped)
+
+        rendered, skipped, _ = render_directory(self.source, self.destination, resolution=(120, 90), workers=2)
+        self.assertEqual(3, len(rendered))
+
+    @patch("image.batch.ProcessPoolExecutor")
+    def test_broken_pool(self, executor_mock: MagicMock) -> None:
+        """
+        Frames should be reported as failed when a worker process dies
+        :param executor_mock: mock of process pool
+        :return:
+        """
+
+        def submit(*_: Any) -> Future[str]:
+            future: Future[str] = Future()
+            future.set_exception(BrokenProcessPool("worker died"))
+            return future
+
+        executor_mock.return_value.__enter__.return_value.submit.side_effect = submit
+        progress = MagicMock()
+        rendered, skipped, failed = render_directory(
+            self.source, self.destination, resolution=(160, 90), progress=progress
+        )
+        self.assertListEqual([], rendered + skipped)
+        self.assertListEqual(["20240208003145", "20240208041947", "20240208081011"], failed)
+        self.assertEqual(3, progress.call_args.args[0])
+        self.assertEqual(1, progress.call_count)
+
+    def test_benchmark_render(self) -> None:
+        """
+        Every stage of rendering should be measured
+        :return:
+        """
+        results = benchmark_render(frames=1, resolution=(160, 90))
+        self.assertListEqual(["resize", "description", "connect", "compose", "encode"], list(results))
+        self.assertTrue(all(seconds > 0 for seconds in results.values()))
@@ -0,0 +1,208 @@
+"""
+Test for originals and render cache
+"""
+
+import os
+import tempfile
+import threading
+from unittest import TestCase
+from unittest.mock import patch
+
+from parameterized import parameterized
+
+from image.cache import (
+    discard_cached,
+    find_original,
+    get_render_key,
+    get_render_path,
+    get_source_variant,
+    has_original,
+    prune_renders,
+    render_for_key,
+    render_frame,
+    rerender_files,
+    save_original,
+)
+
+
+def fake_process_image(
+    image_path: str, code: str, output_path: str | None = None, resolution: tuple[int, int] | None = None
+) -> None:
+    """
+    Replacement of process_image copying original with code appended
+    :param image_path: path to original
+    :param code: coded date and time
+    :param output_path: path to rendered image
+    :param resolution: size of rendered image
+    :return: None
+    """
+    with open(image_path, "rb") as source, open(output_path or image_path, "wb") as destination:
+        destination.write(source.read() + code.encode())
+
+
+class TestRenderCache(TestCase):
+    """
+    Test if wallpapers are rendered from stored originals
+    """
+
+    def setUp(self) -> None:
+        """
+        Create temporary data and image folders
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.config_patch = patch("image.cache.config")
+        self.config_mock = self.config_patch.start()
+        self.config_mock.data_path = os.path.join(self.directory.name, "data")
+        self.config_mock.image_path = os.path.join(self.directory.name, "images")
+        self.config_mock.resolution = (1920, 1080)
+        self.config_mock.source_quality = "auto"
+        os.makedirs(self.config_mock.image_path)
+        self.process_patch = patch("image.cache.process_image", side_effect=fake_process_image)
+        self.process_mock = self.process_patch.start()
+
+    def tearDown(self) -> None:
+        """
+        Remove temporary folders
+        :return:
+        """
+        self.process_patch.stop()
+        self.config_patch.stop()
+        self.directory.cleanup()
+
+    def read_wallpaper(self, code: str) -> bytes:
+        """
+        Read wallpaper from image folder
+        :param code: coded date and time
+        :return: content of the file
+        """
+        with open(os.path.join(self.config_mock.image_path, code + ".png"), "rb") as fp:
+            return fp.read()
+
+    def test_missing_original(self) -> None:
+        """
+        Frame without original can't be rendered
+        :return:
+        """
+        with self.assertRaises(FileNotFoundError):
+            render_frame("20240208000342")
+
+    def test_render_is_cached_per_resolution(self) -> None:
+        """
+        Frame should be rendered once per resolution and taken from cache later
+        :return:
+        """
+        save_original("20240208000342", b"original")
+        image_path = render_frame("20240208000342")
+        self.assertEqual(os.path.join(self.config_mock.image_path, "20240208000342.png"), image_path)
+        self.assertEqual(b"original20240208000342", self.read_wallpaper("20240208000342"))
+
+        os.remove(image_path)
+        render_frame("20240208000342")
+        self.assertEqual(1, self.process_mock.call_count)
+        self.assertTrue(os.path.isfile(image_path))
+
+        self.config_mock.resolution = (1280, 720)
+        render_frame("20240208000342")
+        self.assertEqual(2, self.process_mock.call_count)
+        self.assertIn("1280x720_jpg_v", get_render_path("20240208000342"))
+
+    def test_concurrent_render(self) -> None:
+        """
+        Request of other instance rendering the same frame during download job should use its own temporary file
+        :return:
+        """
+        save_original("20240208000342", b"original")
+        outputs: list[str] = []
+
+        def process_image(image_path: str, code: str, output_path: str, resolution: None = None) -> None:
+            outputs.append(output_path)
+            if len(outputs) == 1:
+                request = threading.Thread(target=render_for_key, args=(code, get_render_key()))
+                request.start()
+                request.join()
+            fake_process_image(image_path, code, output_path, resolution)
+
+        self.process_mock.side_effect = process_image
+        render_frame("20240208000342")
+        self.assertEqual(2, len(set(outputs)))
+        self.assertEqual(b"original20240208000342", self.read_wallpaper("20240208000342"))
+        self.assertListEqual(["20240208000342.png"], os.listdir(os.path.dirname(get_render_path("20240208000342"))))
+
+    @parameterized.expand(
+        [
+            ((1920, 1080), "auto", "png"),
+            ((1366, 768), "auto", "jpg"),
+            ((160, 90), "auto", "thumbs"),
+            ((3840, 2160), "auto", "png"),
+            ((1920, 1080), "jpg", "jpg"),
+            ((160, 90), "png", "png"),
+        ]
+    )  # type: ignore
+    def test_get_source_variant(self, resolution: tuple[int, int], quality: str, expected: str) -> None:
+        """
+        The smallest variant covering screen height should be chosen unless quality is set
+        :param resolution: screen resolution
+        :param quality: source quality setting
+        :param expected: chosen variant
+        :return:
+        """
+        self.config_mock.resolution = resolution
+        self.config_mock.source_quality = quality
+        self.assertEqual(expected, get_source_variant())
+
+    def test_original_variants(self) -> None:
+        """
+        Only one variant of original should be kept and smaller one is not enough for larger screen
+        :return:
+        """
+        self.config_mock.resolution = (1366, 768)
+        save_original("20240208000342", b"thumbs", "thumbs")
+        self.assertFalse(has_original("20240208000342"))
+        jpg_path = save_original("20240208000342", b"jpg", "jpg")
+        self.assertTrue(has_original("20240208000342"))
+        self.assertListEqual(["20240208000342.jpg"], os.listdir(os.path.dirname(jpg_path)))
+
+        self.config_mock.resolution = (1920, 1080)
+        self.assertFalse(has_original("20240208000342"))
+        self.assertEqual(jpg_path, find_original("20240208000342"))
+        save_original("20240208000342", b"png", "png")
+        self.config_mock.resolution = (1366, 768)
+        render_frame("20240208000342")
+        self.assertEqual(b"png20240208000342", self.read_wallpaper("20240208000342"))
+
+    def test_rerender_files(self) -> None:
+        """
+        Only files with stored originals should be rendered again
+        :return:
+        """
+        save_original("20240208000342", b"original")
+        rendered = rerender_files(["20240208000342.png", "20240208010000.png", "broken_file"])
+        self.assertListEqual(["20240208000342.png"], rendered)
+
+    def test_discard_cached(self) -> None:
+        """
+        Originals and renders of all resolutions should be removed
+        :return:
+        """
+        save_original("20240208000342", b"original")
+        save_original("20240208010000", b"original")
+        render_frame("20240208000342")
+        self.config_mock.resolution = (1280, 720)
+        render_frame("20240208000342")
+
+        discard_cached(["20240208000342.png"])
+        self.assertListEqual(["20240208010000.png"], os.listdir(os.path.join(self.config_mock.data_path, "originals")))
+        for key in os.listdir(os.path.join(self.config_mock.data_path, "renders")):
+            self.assertListEqual([], os.listdir(os.path.join(self.config_mock.data_path, "renders", key)))
+
+    @patch("image.cache.TEMPLATE_VERSION", 2)
+    def test_prune_renders(self) -> None:
+        """
+        Render folders of older template versions should be removed
+        :return:
+        """
+        renders_path = os.path.join(self.config_mock.data_path, "renders")
+        for key in ["1920x1080_v1", "1920x1080_v2", "1280x720_v2"]:
+            os.makedirs(os.path.join(renders_path, key))
+        prune_renders()
+        self.assertListEqual(["1280x720_v2", "1920x1080_v2"], sorted(os.listdir(renders_path)))
@@ -0,0 +1,102 @@
+"""
+Test for frame compositor
+"""
+
+import threading
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import PIL.Image
+from parameterized import parameterized
+
+from image.compositor import FrameCompositor
+from image.processing import connect_images, process_image
+
+
+def get_description() -> PIL.Image.Image:
+    """
+    Create rotated description image of the same size as get_description_image
+    :return: description image
+    """
+    return PIL.Image.linear_gradient("L").resize((600, 50)).rotate(90, expand=True, fillcolor="white")
+
+
+class TestFrameCompositor(TestCase):
+    """
+    Test if compositor gives the same result as connect_images
+    """
+
+    @parameterized.expand([[(1920, 1080)], [(1280, 720)], [(800, 500)], [(600, 800)]])  # type: ignore
+    def test_compose_equals_connect_images(self, resolution: tuple[int, int]) -> None:
+        """
+        Pooled frame should be pixel equal to frame created by connect_images, also when it is reused
+        :param resolution: screen resolution
+        :return:
+        """
+        compositor = FrameCompositor()
+        description = get_description()
+        for color in ((10, 120, 200), (200, 30, 0)):
+            earth = PIL.Image.new("RGB", (resolution[1], resolution[1]), color)
+            expected = connect_images(earth_image=earth, description_image=description, resolution=resolution)
+            result = compositor.compose(earth, description, resolution)
+            self.assertEqual(expected.size, result.size)
+            self.assertTrue(np.array_equal(np.asarray(expected), np.asarray(result)))
+
+    def test_frame_is_reused(self) -> None:
+        """
+        One frame should be allocated per resolution in every thread
+        :return:
+        """
+        compositor = FrameCompositor()
+        description = get_description()
+        first = compositor.compose(PIL.Image.new("RGB", (720, 720)), description, (1280, 720))
+        second = compositor.compose(PIL.Image.new("RGB", (720, 720)), description, (1280, 720))
+        other = compositor.compose(PIL.Image.new("RGB", (600, 600)), description, (800, 600))
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+
+        frames = []
+        thread = threading.Thread(target=lambda: frames.append(compositor.get_frame((1280, 720))))
+        thread.start()
+        thread.join()
+        self.assertIsNot(first, frames[0])
+
+        compositor.clear()
+        self.assertIsNot(first, compositor.get_frame((1280, 720)))
+
+    def test_unexpected_size_is_cleared(self) -> None:
+        """
+        Frame should be cleared when images would not overwrite regions of the previous frame
+        :return:
+        """
+        compositor = FrameCompositor()
+        description = get_description()
+        compositor.compose(PIL.Image.new("RGB", (720, 720), "white"), description, (1280, 720))
+        earth = PIL.Image.new("RGB", (600, 600), "red")
+        expected = connect_images(earth_image=earth, description_image=description, resolution=(1280, 720))
+        result = compositor.compose(earth, description, (1280, 720))
+        self.assertTrue(np.array_equal(np.asarray(expected), np.asarray(result)))
+
+    @patch("image.processing.compositor")
+    @patch("image.processing.connect_images")
+    @patch("image.processing.get_description_image")
+    @patch("image.processing.resize_image")
+    def test_process_image_uses_compositor(
+        self,
+        resize_mock: MagicMock,
+        description_mock: MagicMock,
+        connect_mock: MagicMock,
+        compositor_mock: MagicMock,
+    ) -> None:
+        """
+        process_image should use compositor only when it is enabled in config
+        :return:
+        """
+        with patch("image.processing.config") as config_mock:
+            for enabled in (False, True):
+                config_mock.use_compositor = enabled
+                process_image("path.png", "20240208000342")
+        self.assertEqual(1, connect_mock.call_count)
+        self.assertEqual(1, compositor_mock.compose.call_count)
+        compositor_mock.compose.return_value.save.assert_called_once_with("path.png", format="PNG")
@@ -11,6 +11,7 @@ import parameterized
 from image.management import (
     check_or_create_image_path,
     check_wallpapers,
+    check_wallpapers_batch,
     delete_files,
     generate_code,
 )
@@ -111,3 +112,34 @@ class TestImageManagement(TestCase):
             self.assertEqual(oldest_file, result[0])
             self.assertListEqual(valid, result[1])
             self.assertListEqual(invalid, result[2])
+
+    @parameterized.parameterized.expand(
+        [
+            [[], None, [], []],
+            [["1_invalid", "20241212000000"], "20241212000000", ["20241212000000"], ["1_invalid"]],
+            [["20241212000001", "20241212000000"], "20241212000001", ["20241212000001", "20241212000000"], []],
+        ]
+    )  # type: ignore
+    def test_check_wallpapers_batch(
+        self,
+        files: list[str],
+        latest: str | None,
+        valid: list[str],
+        invalid: list[str],
+    ) -> None:
+        """
+        Test if check_wallpapers_batch returns the same contract as check_wallpapers
+        :param files: filenames to validate
+        :param latest: the latest file
+        :param valid: list of valid files
+        :param invalid: list of invalid files
+        :return:
+        """
+        with patch("image.management.os") as os_mock, patch("image.management.validate_files") as validator_mock:
+            os_mock.listdir.return_value = files
+            validator_mock.return_value = (valid, invalid)
+            result = check_wallpapers_batch()
+            validator_mock.assert_called_once_with(files, max_workers=None)
+            self.assertEqual(latest, result[0])
+            self.assertListEqual(valid, result[1])
+            self.assertListEqual(invalid, result[2])
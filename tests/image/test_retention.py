@@ -0,0 +1,165 @@
+"""
+Test for archive retention
+"""
+
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from parameterized import parameterized
+
+from image.retention import (
+    ArchiveEntry,
+    ArchiveIndex,
+    get_frame_time,
+    get_latest_day,
+    select_evictions,
+)
+
+
+def entry(size: int = 10, displayed: float = 0.0) -> ArchiveEntry:
+    """
+    Create archive entry for tests
+    :param size: size of the file
+    :param displayed: timestamp of the last display
+    :return: entry
+    """
+    return {"size": size, "added": 0.0, "displayed": displayed}
+
+
+class TestSelectEvictions(TestCase):
+    """
+    Test choice of frames to be evicted
+    """
+
+    def setUp(self) -> None:
+        """
+        Create archive with three days
+        """
+        self.entries = {
+            "20240101000000.png": entry(displayed=30.0),
+            "20240102000000.png": entry(displayed=10.0),
+            "20240103000000.png": entry(),
+            "20240103120000.png": entry(),
+        }
+        self.now = get_frame_time("20240104000000.png")
+
+    @parameterized.expand(
+        [
+            (0, 0, []),
+            (40, 0, []),
+            (30, 0, ["20240103000000.png"]),
+            (20, 0, ["20240103000000.png", "20240103120000.png"]),
+            (0, 2 * 24 * 60 * 60, ["20240101000000.png"]),
+            (10, 2 * 24 * 60 * 60, ["20240101000000.png", "20240103000000.png", "20240103120000.png"]),
+        ]
+    )  # type: ignore
+    def test_select_evictions(self, budget: int, max_age: int, expected: list[str]) -> None:
+        """
+        Old frames should be evicted first, then least recently displayed ones until archive fits budget
+        :param budget: disk budget
+        :param max_age: age limit
+        :param expected: evicted frames in order
+        :return:
+        """
+        self.assertListEqual(expected, select_evictions(self.entries, budget, max_age, self.now))
+
+    def test_protected_frames_are_kept(self) -> None:
+        """
+        Protected frames can't be evicted even if budget is exceeded
+        :return:
+        """
+        protected = {"20240103000000.png", "20240103120000.png"}
+        evicted = select_evictions(self.entries, 1, 0, self.now, protected=protected)
+        self.assertListEqual(["20240102000000.png", "20240101000000.png"], evicted)
+
+    @parameterized.expand(
+        [
+            ([], []),
+            (["20240101000000.png"], ["20240101000000.png"]),
+            (
+                ["20240101000000.png", "20240102000000.png", "20240102120000.png"],
+                ["20240102000000.png", "20240102120000.png"],
+            ),
+        ]
+    )  # type: ignore
+    def test_get_latest_day(self, files: list[str], expected: list[str]) -> None:
+        """
+        Only frames from the latest day should be returned
+        :param files: filenames
+        :param expected: frames of the latest day
+        :return:
+        """
+        self.assertListEqual(expected, get_latest_day(files))
+
+
+class TestArchiveIndex(TestCase):
+    """
+    Test archive index persistence and enforcement
+    """
+
+    def setUp(self) -> None:
+        """
+        Create temporary image folder and index
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.image_path = os.path.join(self.directory.name, "images")
+        os.makedirs(self.image_path)
+        for size, file in enumerate(["20240101000000.png", "20240102000000.png", "20240103000000.png"], start=1):
+            with open(os.path.join(self.image_path, file), "wb") as fp:
+                fp.write(b"0" * size * 100)
+        self.index_path = os.path.join(self.directory.name, "data", "archive.json")
+        self.config_patch = patch("image.retention.config")
+        self.config_mock = self.config_patch.start()
+        self.config_mock.image_path = self.image_path
+
+    def tearDown(self) -> None:
+        """
+        Remove temporary folder
+        :return:
+        """
+        self.config_patch.stop()
+        self.directory.cleanup()
+
+    def test_index_is_persisted(self) -> None:
+        """
+        Entries should be saved to disk and restored by new instance
+        :return:
+        """
+        index = ArchiveIndex(self.index_path)
+        index.adopt(sorted(os.listdir(self.image_path)))
+        index.mark_displayed("20240102000000.png")
+        index.discard(["20240101000000.png", "not_in_index.png"])
+
+        restored = ArchiveIndex(self.index_path)
+        self.assertListEqual(["20240102000000.png", "20240103000000.png"], sorted(restored.entries))
+        self.assertEqual(200, restored.entries["20240102000000.png"]["size"])
+        self.assertGreater(restored.entries["20240102000000.png"]["displayed"], 0)
+
+    def test_broken_index(self) -> None:
+        """
+        Broken index file should be treated as empty index
+        :return:
+        """
+        os.makedirs(os.path.dirname(self.index_path))
+        with open(self.index_path, "w", encoding="utf-8") as fp:
+            fp.write("not json")
+        self.assertDictEqual({}, ArchiveIndex(self.index_path).entries)
+
+    @patch("image.retention.delete_files")
+    def test_enforce(self, delete_files_mock: MagicMock) -> None:
+        """
+        Enforce should delete evicted files and remove them from index
+        :param delete_files_mock: mock delete function
+        :return:
+        """
+        self.config_mock.retention_budget = 500
+        self.config_mock.retention_max_age = 0
+        index = ArchiveIndex(self.index_path)
+        index.adopt(sorted(os.listdir(self.image_path)))
+
+        evicted = index.enforce(protected={"20240103000000.png"})
+        self.assertListEqual(["20240101000000.png"], evicted)
+        delete_files_mock.assert_called_once_with(["20240101000000.png"])
+        self.assertListEqual(["20240102000000.png", "20240103000000.png"], sorted(index.entries))
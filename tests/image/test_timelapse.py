@@ -0,0 +1,115 @@
+"""
+Test for time-lapse export
+"""
+
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import PIL.Image
+from parameterized import parameterized
+
+from image.timelapse import LazyFrames, export_timelapse, get_day_frames
+
+FILES = ["20240207220000.png", "20240208003145.png", "20240208022546.png", "20240208041947.png"]
+
+
+class TestTimelapse(TestCase):
+    """
+    Test if frames of a day are exported as animation
+    """
+
+    def setUp(self) -> None:
+        """
+        Create image folder with wallpapers, the first frame of the latest day has stored original, the second one
+        has broken wallpaper but stored render, broken frame of the next day has neither
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.config_patch = patch("image.timelapse.config")
+        self.config_mock = self.config_patch.start()
+        self.config_mock.image_path = self.directory.name
+        self.config_mock.resolution = (160, 90)
+        validators_config_mock = patch("image.validators.config").start()
+        validators_config_mock.image_path = self.directory.name
+        validators_config_mock.resolution = (320, 180)
+        renders_path = os.path.join(self.directory.name, "renders")
+        os.makedirs(renders_path)
+        for index, file in enumerate(FILES):
+            path = renders_path if file == "20240208022546.png" else self.directory.name
+            PIL.Image.new("RGB", (320, 180), (index * 60, 0, 0)).save(os.path.join(path, file))
+        for file in ["20240208022546.png", "20240209000000.png", "notes.png"]:
+            with open(os.path.join(self.directory.name, file), "wb") as fp:
+                fp.write(b"broken")
+        patch(
+            "image.timelapse.get_render_path", side_effect=lambda code: os.path.join(renders_path, f"{code}.png")
+        ).start()
+        self.original_path = os.path.join(self.directory.name, "original.png")
+        PIL.Image.new("RGB", (100, 100), "blue").save(self.original_path)
+        self.original_patch = patch(
+            "image.timelapse.find_original",
+            side_effect=lambda code: self.original_path if code == "20240208003145" else None,
+        )
+        self.original_patch.start()
+
+    def tearDown(self) -> None:
+        """
+        Remove temporary folder
+        :return:
+        """
+        patch.stopall()
+        self.directory.cleanup()
+
+    def test_get_day_frames(self) -> None:
+        """
+        Frames of the latest day should be taken by default, past frames are usable and broken ones without original
+        or render are skipped
+        :return:
+        """
+        self.assertListEqual(FILES[1:], get_day_frames())
+        self.assertListEqual(FILES[:1], get_day_frames("20240207"))
+        self.assertListEqual([], get_day_frames("20240209"))
+
+    @parameterized.expand([["timelapse.gif"], ["timelapse.webp"]])  # type: ignore
+    def test_export_timelapse(self, filename: str) -> None:
+        """
+        Every frame of the day should be exported in order with requested size
+        :param filename: name of animation
+        :return:
+        """
+        output_path = os.path.join(self.directory.name, filename)
+        with patch("image.processing.config") as processing_config_mock:
+            processing_config_mock.resolution = (160, 90)
+            self.assertEqual(3, export_timelapse(output_path, day="20240208", duration=100))
+        with PIL.Image.open(output_path) as animation:
+            self.assertEqual(3, animation.n_frames)
+            self.assertEqual((160, 90), animation.size)
+            for frame, expected in [(1, 120), (2, 180)]:
+                animation.seek(frame)
+                red = animation.convert("RGB").getpixel((80, 45))[0]
+                self.assertAlmostEqual(expected, red, delta=10)
+        self.assertFalse(os.path.exists(f"{output_path}.tmp"))
+
+    def test_unsupported_format(self) -> None:
+        """
+        Format is chosen by extension and frames must exist
+        :return:
+        """
+        with self.assertRaises(ValueError):
+            export_timelapse(os.path.join(self.directory.name, "timelapse.png"))
+        with self.assertRaises(ValueError):
+            export_timelapse(os.path.join(self.directory.name, "timelapse.gif"), day="20240209")
+
+    def test_lazy_frames(self) -> None:
+        """
+        Frames should be rendered one at a time when they are seeked
+        :return:
+        """
+        render = MagicMock(side_effect=lambda file: PIL.Image.new("RGB", (4, 4), (int(file), 0, 0)))
+        frames = LazyFrames(["10", "20", "30"], render)
+        self.assertEqual(3, frames.n_frames)
+        render.assert_called_once_with("10")
+        frames.seek(2)
+        frames.seek(2)
+        self.assertEqual(2, render.call_count)
+        self.assertEqual((30, 0, 0), frames.getpixel((0, 0)))
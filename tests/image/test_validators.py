@@ -15,9 +15,11 @@ from image.validators import (
     check_date_of_image,
     check_file_extension,
     check_filename_without_extension,
+    check_filenames,
     check_if_file_is_not_broken,
     check_length_of_file,
     validate_file,
+    validate_files,
 )
 
 
@@ -189,3 +191,42 @@ class TestValidators(TestCase):
 
             status = validate_file("")
             self.assertEqual(is_valid, status)
+
+    @parameterized.expand(
+        [
+            [[]],
+            [["", "file.png", "20241212121222.jpg", "2024121212122.png", "abcdefghijklmn.png"]],
+            [["20231212121222.png", "20241212121222.png", "20241212121221.png"]],
+            [["+2024121212122.png", " 2024121212122.png", "2_24121212122.png", "2_241212121222.png"]],
+            [["²9991212121222.png", "٢٠٢٤١٢١٢١٢١٢٢٢.png", "2024121212122².png"]],
+        ]
+    )  # type: ignore
+    @patch("image.validators.datetime")
+    def test_check_filenames(self, files: list[str], datetime_now_mock: MagicMock) -> None:
+        """
+        Batch filename check should give the same results as single file validators
+        :param files: filenames to valid
+        :param datetime_now_mock: mock patch
+        :return:
+        """
+        datetime_now_mock.now.return_value = datetime(2024, 1, 1, 12, 12, 12)
+        validators = [check_file_extension, check_length_of_file, check_filename_without_extension, check_date_of_image]
+        expected = [all(validator(file) for validator in validators) for file in files]
+        datetime_now_mock.now.reset_mock()
+        self.assertListEqual(expected, check_filenames(files))
+        self.assertLessEqual(datetime_now_mock.now.call_count, 1)
+
+    def test_validate_files(self) -> None:
+        """
+        Batch validation should split files in the same way as validate_file and keep their order
+        :return:
+        """
+        files = [
+            os.path.basename(self.broken_file),
+            os.path.basename(self.correct_file),
+            self.not_existing_file,
+            os.path.basename(self.empty_file),
+        ]
+        valid, invalid = validate_files(files, max_workers=2)
+        self.assertListEqual([file for file in files if validate_file(file)], valid)
+        self.assertListEqual([file for file in files if file not in valid], invalid)
@@ -0,0 +1,532 @@
+"""
+Test api.py
+"""
+
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import Future
+from typing import Any
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import requests
+from parameterized import parameterized
+
+from api import (
+    check_new_data,
+    download_and_save_image,
+    download_render,
+    fetch_records,
+    get_archive_url,
+    last_responses,
+    resume_downloads,
+    schedule_downloads,
+    shutdown_downloads,
+    wait_for_latest,
+)
+from journal import JobJournal
+from polling import PollScheduler
+from records import Record
+from scheduler import JobScheduler
+
+RECORDS = [
+    {"image": "epic_1b_20240208003633", "date": "2024-02-08 00:31:45"},
+    {"image": "epic_1b_20240208042436", "date": "2024-02-08 04:19:47"},
+    {"image": "epic_1b_20240208023034", "date": "2024-02-08 02:25:46"},
+]
+
+
+def mock_response(requests_mock: MagicMock, records: list[dict[str, Any]]) -> MagicMock:
+    """
+    Set streamed API response of mock requests
+    :param requests_mock: mock requests
+    :param records: JSON records of the response
+    :return: mock response
+    """
+    response: MagicMock = requests_mock.get.return_value.__enter__.return_value
+    response.status_code = 200
+    response.headers = {}
+    response.iter_content.return_value = [json.dumps(records).encode()]
+    return response
+
+
+class TestCheckNewData(TestCase):
+    """
+    Test downloading of new data
+    """
+
+    def setUp(self) -> None:
+        """
+        Keep job journal and poll history in temporary folder
+        :return:
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.journal = JobJournal(os.path.join(self.directory.name, "jobs.json"))
+        patch("api.journal", self.journal).start()
+        self.poller = PollScheduler(path=os.path.join(self.directory.name, "poll_history.json"))
+        patch("api.poller", self.poller).start()
+
+    def tearDown(self) -> None:
+        """
+        Remove temporary folder
+        :return:
+        """
+        patch.stopall()
+        self.directory.cleanup()
+
+    @patch("api.scheduler")
+    def test_schedule_downloads_newest_first(self, scheduler_mock: MagicMock) -> None:
+        """
+        The newest image should get the highest priority
+        :param scheduler_mock: mock scheduler
+        :return:
+        """
+        schedule_downloads([Record.from_json(record) for record in RECORDS])
+        calls = scheduler_mock.submit.call_args_list
+        self.assertListEqual(
+            ["epic_1b_20240208042436", "epic_1b_20240208023034", "epic_1b_20240208003633"],
+            [call.args[0] for call in calls],
+        )
+        self.assertListEqual([0, 1, 2], [call.kwargs["priority"] for call in calls])
+        self.assertEqual("20240208041947", calls[0].kwargs["code"])
+
+    def test_wait_for_latest(self) -> None:
+        """
+        Callback should be called only with path of successfully processed image
+        :return:
+        """
+        callback = MagicMock()
+        for result in ["image.png", None]:
+            future: Future[str | None] = Future()
+            future.set_result(result)
+            wait_for_latest(future, callback)
+        failed: Future[str | None] = Future()
+        failed.set_exception(TimeoutError())
+        wait_for_latest(failed, callback)
+        callback.assert_called_once_with("image.png")
+
+    @parameterized.expand([(False,), (True,)])  # type: ignore
+    @patch("api.wait_for_latest")
+    @patch("api.submit_download", side_effect=lambda record, priority: f"future {record.code}")
+    @patch("api.delete_files")
+    @patch("api.check_wallpapers_batch")
+    @patch("api.requests")
+    def test_new_data(
+        self,
+        adaptive_polling: bool,
+        requests_mock: MagicMock,
+        check_mock: MagicMock,
+        delete_mock: MagicMock,
+        schedule_mock: MagicMock,
+        wait_mock: MagicMock,
+    ) -> None:
+        """
+        When new data is available downloads are scheduled while the response is parsed, old files removed and the
+        newest image awaited, arrival of data is recorded only with adaptive polling and jobs are journaled together
+        :param adaptive_polling: adaptive polling is enabled
+        :return:
+        """
+        mock_response(requests_mock, RECORDS)
+        check_mock.return_value = ("20240207000000.png", ["20240207000000.png"], ["broken"])
+        callback = MagicMock()
+        with patch("api.config") as config_mock:
+            config_mock.retention_enabled = False
+            config_mock.fleet_url = ""
+            config_mock.fleet_port = 0
+            config_mock.region = None
+            config_mock.adaptive_polling = adaptive_polling
+            with patch.object(self.journal, "save", wraps=self.journal.save) as save_mock:
+                check_new_data(on_latest=callback)
+        # journal is saved once per chunk of the response
+        self.assertEqual(1, save_mock.call_count)
+        self.assertListEqual(sorted(Record.from_json(record).code for record in RECORDS), sorted(self.journal.entries))
+        self.assertListEqual(
+            [
+                (Record.from_json(RECORDS[1]), -2),
+                (Record.from_json(RECORDS[2]), -3),
+                (Record.from_json(RECORDS[0]), -1),
+            ],
+            [(c.args[0], c.kwargs["priority"]) for c in schedule_mock.call_args_list],
+        )
+        self.assertListEqual([(["broken"],), (["20240207000000.png"],)], [c.args for c in delete_mock.call_args_list])
+        wait_mock.assert_called_once_with("future 20240208041947", callback)
+        self.assertEqual("20240208022546" if adaptive_polling else "", self.poller.history["last_code"])
+        self.assertEqual(adaptive_polling, os.path.isfile(self.poller.path))
+
+    @patch("api.wait_for_latest")
+    @patch("api.delete_files")
+    @patch("api.check_wallpapers_batch", return_value=(None, [], []))
+    @patch("api.requests")
+    def test_newest_download_starts_first(self, requests_mock: MagicMock, *_: MagicMock) -> None:
+        """
+        Idle workers should start with the newest frame although records are parsed from the oldest
+        :param requests_mock: mock requests
+        :return:
+        """
+        records = [{"image": f"epic_1b_{minute:02}", "date": f"2024-02-08 00:{minute:02}:00"} for minute in range(13)]
+        mock_response(requests_mock, records)
+        started: list[str] = []
+        scheduler = JobScheduler(max_workers=1)
+        with (
+            patch("api.scheduler", scheduler),
+            patch("api.download_and_save_image", side_effect=lambda code, image_name: started.append(code)),
+            patch("api.config") as config_mock,
+        ):
+            config_mock.retention_enabled = False
+            config_mock.fleet_url = ""
+            config_mock.fleet_port = 0
+            config_mock.region = None
+            check_new_data()
+            self.assertTrue(scheduler.wait(5))
+        scheduler.shutdown(timeout=5)
+        self.assertListEqual([f"2024020800{minute:02}00" for minute in reversed(range(13))], started)
+
+    @parameterized.expand([(b'[{"image": "epic_1b", "date": "2024-02-08 00:31:45"}',), (b"<html>",)])  # type: ignore
+    @patch("api.schedule_downloads")
+    @patch("api.check_wallpapers_batch", return_value=(None, [], []))
+    @patch("api.requests")
+    def test_broken_response(
+        self, content: bytes, requests_mock: MagicMock, _: MagicMock, schedule_mock: MagicMock
+    ) -> None:
+        """
+        Truncated or malformed response should be logged and not stop the main loop
+        :param content: body of the response
+        :return:
+        """
+        requests_mock.exceptions = requests.exceptions
+        mock_response(requests_mock, []).iter_content.return_value = [content]
+        with patch("api.submit_download") as schedule_one_mock:
+            check_new_data()
+        schedule_mock.assert_not_called()
+        self.assertLessEqual(schedule_one_mock.call_count, 1)
+
+    @patch("api.is_bulk_allowed", return_value=False)
+    @patch("api.schedule_downloads")
+    @patch("api.delete_files")
+    @patch("api.check_wallpapers_batch")
+    @patch("api.requests")
+    def test_downloads_deferred(
+        self,
+        requests_mock: MagicMock,
+        check_mock: MagicMock,
+        delete_mock: MagicMock,
+        schedule_mock: MagicMock,
+        _: MagicMock,
+    ) -> None:
+        """
+        Outside bulk hours new images shouldn't be downloaded and stored images shouldn't be removed
+        :return:
+        """
+        mock_response(requests_mock, RECORDS)
+        check_mock.return_value = ("20240207000000.png", ["20240207000000.png"], [])
+        check_new_data()
+        schedule_mock.assert_not_called()
+        delete_mock.assert_called_once_with([])
+
+    @patch("api.schedule_downloads")
+    @patch("api.delete_files")
+    @patch("api.check_wallpapers_batch")
+    @patch("api.requests")
+    def test_no_new_data(
+        self,
+        requests_mock: MagicMock,
+        check_mock: MagicMock,
+        delete_mock: MagicMock,
+        schedule_mock: MagicMock,
+    ) -> None:
+        """
+        Nothing should be downloaded when the latest image is already stored
+        :return:
+        """
+        mock_response(requests_mock, RECORDS[:1])
+        check_mock.return_value = ("20240208003145.png", ["20240208003145.png"], [])
+        check_new_data()
+        schedule_mock.assert_not_called()
+        delete_mock.assert_called_once_with([])
+
+    @patch("api.requests")
+    def test_fetch_records_conditional(self, requests_mock: MagicMock) -> None:
+        """
+        Records should be parsed from chunks of the response, validators of the previous response should be sent
+        and its records reused when data are not modified
+        :param requests_mock: mock requests
+        :return:
+        """
+        url = "http://epic/api/natural"
+        last_responses.pop(url, None)
+        response = mock_response(requests_mock, [])
+        content = json.dumps(RECORDS).encode()
+        response.iter_content.return_value = [content[index : index + 10] for index in range(0, len(content), 10)]
+        response.headers = {"ETag": '"abc"', "Last-Modified": "Thu, 08 Feb 2024 08:00:00 GMT"}
+        expected = [Record.from_json(record) for record in RECORDS]
+        self.assertListEqual(expected, [record for batch in fetch_records(url) for record in batch])
+        self.assertEqual({}, requests_mock.get.call_args.kwargs["headers"])
+        self.assertTrue(requests_mock.get.call_args.kwargs["stream"])
+
+        response.status_code = 304
+        response.iter_content.return_value = []
+        self.assertListEqual(expected, [record for batch in fetch_records(url) for record in batch])
+        self.assertEqual(
+            {"If-None-Match": '"abc"', "If-Modified-Since": "Thu, 08 Feb 2024 08:00:00 GMT"},
+            requests_mock.get.call_args.kwargs["headers"],
+        )
+        last_responses.pop(url)
+
+    @patch("api.requests")
+    def test_fetch_records_invalid(self, requests_mock: MagicMock) -> None:
+        """
+        Records without date should be reported as invalid response
+        :param requests_mock: mock requests
+        :return:
+        """
+        mock_response(requests_mock, [{"image": "epic_1b_20240208003633"}])
+        with self.assertRaises(ValueError):
+            list(fetch_records("http://epic/api/natural"))
+
+    @patch("api.get_source_variant", return_value="png")
+    @patch("api.render_frame")
+    @patch("api.save_original")
+    @patch("api.requests")
+    @patch("api.has_original")
+    def test_download_and_save_image(
+        self,
+        has_original_mock: MagicMock,
+        requests_mock: MagicMock,
+        save_mock: MagicMock,
+        render_mock: MagicMock,
+        _: MagicMock,
+    ) -> None:
+        """
+        Original is downloaded only when it is not stored, frame is rendered in both cases
+        :return:
+        """
+        response = requests_mock.get.return_value.__enter__.return_value
+        response.status_code = 200
+        response.iter_content.return_value = [b"ima", b"ge"]
+        for stored in [True, False]:
+            has_original_mock.return_value = stored
+            self.assertEqual(render_mock.return_value, download_and_save_image("20240208000342", "epic_1b"))
+        self.assertEqual(1, requests_mock.get.call_count)
+        save_mock.assert_called_once_with("20240208000342", b"image", "png")
+        self.assertEqual(2, render_mock.call_count)
+        self.assertTrue(requests_mock.get.call_args.args[0].endswith("/2024/02/08/png/epic_1b.png"))
+
+    @patch("api.has_original", return_value=True)
+    def test_journal(self, _: MagicMock) -> None:
+        """
+        Scheduled job should be journaled as pending, its progress saved and entry removed when the job ends
+        :return:
+        """
+        with patch("api.scheduler"):
+            schedule_downloads([Record("epic_1b", "20240208000342")])
+        self.assertEqual(
+            {"20240208000342": {"image": "epic_1b", "state": "pending"}}, JobJournal(self.journal.path).entries
+        )
+        with patch("api.render_frame", side_effect=lambda code: self.journal.entries[code]["state"]):
+            self.assertEqual("downloaded", download_and_save_image("20240208000342", "epic_1b"))
+        self.assertEqual({}, JobJournal(self.journal.path).entries)
+
+    @patch("api.scheduler")
+    def test_resume_downloads(self, scheduler_mock: MagicMock) -> None:
+        """
+        Jobs left in the journal should be scheduled again from the newest
+        :param scheduler_mock: mock scheduler
+        :return:
+        """
+        self.journal.add("20240208000342", "epic_1b_20240208000342")
+        self.journal.add("20240208041947", "epic_1b_20240208041947")
+        self.journal.mark("20240208041947", "downloaded")
+        resume_downloads()
+        self.assertListEqual(
+            ["epic_1b_20240208041947", "epic_1b_20240208000342"],
+            [call.args[0] for call in scheduler_mock.submit.call_args_list],
+        )
+        self.assertEqual("downloaded", self.journal.entries["20240208041947"]["state"])
+
+    @patch("api.render_frame")
+    def test_shutdown_downloads(self, _: MagicMock) -> None:
+        """
+        Waiting jobs should be cancelled and stay in the journal, running job should be awaited up to the timeout
+        :return:
+        """
+        gate = threading.Event()
+        scheduler = JobScheduler(max_workers=1)
+        with patch("api.scheduler", scheduler), patch("api.has_original", side_effect=lambda code: gate.wait(5)):
+            running, waiting = schedule_downloads(
+                [Record("epic_1b_20240208041947", "20240208041947"), Record("epic_1b_20240208000342", "20240208000342")]
+            )
+            self.assertFalse(shutdown_downloads(0.1))
+            self.assertTrue(waiting.cancelled())
+            self.assertFalse(running.done())
+            gate.set()
+            self.assertTrue(shutdown_downloads(5))
+        scheduler.shutdown(timeout=5)
+        self.assertListEqual(["20240208000342"], list(JobJournal(self.journal.path).entries))
+
+    @parameterized.expand(
+        [
+            ("png", "/archive/natural/2024/02/08/png/epic_1b_20240208000342.png"),
+            ("jpg", "/archive/natural/2024/02/08/jpg/epic_1b_20240208000342.jpg"),
+            ("thumbs", "/archive/natural/2024/02/08/thumbs/epic_1b_20240208000342.jpg"),
+        ]
+    )  # type: ignore
+    def test_get_archive_url(self, variant: str, path: str) -> None:
+        """
+        Url should point to folder and extension of the variant
+        :param variant: archive variant
+        :param path: expected path
+        :return:
+        """
+        with patch("api.config") as config_mock:
+            config_mock.api_url = "https://epic.gsfc.nasa.gov"
+            url = get_archive_url("20240208000342", "epic_1b_20240208000342", variant)
+        self.assertEqual("https://epic.gsfc.nasa.gov" + path, url)
+
+    @patch("api.wait_for_latest")
+    @patch("api.submit_download")
+    @patch("api.delete_files")
+    @patch("api.rerender_files")
+    @patch("api.check_wallpapers_batch")
+    @patch("api.requests")
+    def test_rerendered_files_are_not_downloaded(
+        self,
+        requests_mock: MagicMock,
+        check_mock: MagicMock,
+        rerender_mock: MagicMock,
+        delete_mock: MagicMock,
+        schedule_mock: MagicMock,
+        wait_mock: MagicMock,
+    ) -> None:
+        """
+        Files rendered again from originals should be treated as valid and not downloaded
+        :return:
+        """
+        mock_response(requests_mock, [RECORDS[0], RECORDS[2], RECORDS[1]])
+        check_mock.return_value = (None, [], ["20240208003145.png", "20240208022546.png", "broken"])
+        rerender_mock.return_value = ["20240208003145.png", "20240208022546.png"]
+        with patch("api.config") as config_mock:
+            config_mock.retention_enabled = False
+            config_mock.fleet_url = ""
+            config_mock.fleet_port = 0
+            config_mock.region = None
+            check_new_data()
+        schedule_mock.assert_called_once_with(Record.from_json(RECORDS[1]), priority=-3)
+        self.assertListEqual([(["broken"],), ([],)], [c.args for c in delete_mock.call_args_list])
+
+    @parameterized.expand([(206, b"partfull"), (200, b"full")])  # type: ignore
+    def test_download_render_resumes(self, status_code: int, expected: bytes) -> None:
+        """
+        Partial render should be resumed with range request, full response replaces it
+        :param status_code: status of upstream response
+        :param expected: content of render
+        :return:
+        """
+        with tempfile.TemporaryDirectory() as directory, patch("api.requests") as requests_mock:
+            render_path = os.path.join(directory, "1920x1080_png_v1", "20240208000342.png")
+            os.makedirs(os.path.dirname(render_path))
+            with open(f"{render_path}.part", "wb") as fp:
+                fp.write(b"part")
+            response = requests_mock.get.return_value.__enter__.return_value
+            response.status_code = status_code
+            response.iter_content.return_value = [b"full"]
+            with patch("api.get_render_path", return_value=render_path), patch("api.config") as config_mock:
+                config_mock.fleet_url = "http://upstream:8400"
+                self.assertTrue(download_render("20240208000342"))
+            self.assertEqual({"Range": "bytes=4-"}, requests_mock.get.call_args.kwargs["headers"])
+            self.assertTrue(requests_mock.get.call_args.args[0].startswith("http://upstream:8400/renders/"))
+            with open(render_path, "rb") as fp:
+                self.assertEqual(expected, fp.read())
+            self.assertFalse(os.path.exists(f"{render_path}.part"))
+
+    @parameterized.expand([(True,), (False,)])  # type: ignore
+    @patch("api.render_frame", return_value="image.png")
+    @patch("api.save_original")
+    @patch("api.has_original", return_value=False)
+    @patch("api.get_source_variant", return_value="png")
+    @patch("api.fetch_archive_image", return_value=b"original")
+    @patch("api.download_render", side_effect=FileNotFoundError("Render not available on upstream instance"))
+    def test_upstream_fallback(
+        self,
+        bulk_allowed: bool,
+        render_mock: MagicMock,
+        fetch_mock: MagicMock,
+        _: MagicMock,
+        __: MagicMock,
+        save_mock: MagicMock,
+        ___: MagicMock,
+    ) -> None:
+        """
+        Original should be downloaded from EPIC when upstream can't render the frame, but only in bulk hours
+        :param bulk_allowed: current hour is in bulk window
+        :return:
+        """
+        with (
+            patch("api.config") as config_mock,
+            patch("api.get_render_path", return_value="missing.png"),
+            patch("api.is_bulk_allowed", return_value=bulk_allowed),
+        ):
+            config_mock.fleet_url = "http://upstream:8400"
+            config_mock.fleet_port = 0
+            config_mock.api_url = "https://epic.gsfc.nasa.gov"
+            config_mock.retention_enabled = False
+            result = download_and_save_image("20240208000342", "epic_1b")
+        render_mock.assert_called_once_with("20240208000342")
+        if bulk_allowed:
+            self.assertEqual("image.png", result)
+            self.assertTrue(fetch_mock.call_args.args[0].startswith("https://epic.gsfc.nasa.gov/archive/"))
+            save_mock.assert_called_once_with("20240208000342", b"original", "png")
+        else:
+            self.assertIsNone(result)
+            fetch_mock.assert_not_called()
+
+    @patch("api.fetch_archive_image")
+    def test_upstream_not_stored_yet(self, fetch_mock: MagicMock) -> None:
+        """
+        Frame which upstream is still downloading should be left for the next sync, not downloaded from EPIC
+        :param fetch_mock: mock download from EPIC
+        :return:
+        """
+        with tempfile.TemporaryDirectory() as directory, patch("api.requests") as requests_mock:
+            render_path = os.path.join(directory, "1920x1080_png_v1", "20240208000342.png")
+            requests_mock.get.return_value.__enter__.return_value.status_code = 503
+            with patch("api.get_render_path", return_value=render_path), patch("api.config") as config_mock:
+                config_mock.fleet_url = "http://upstream:8400"
+                self.assertIsNone(download_and_save_image("20240208000342", "epic_1b"))
+            self.assertFalse(os.path.exists(render_path))
+        fetch_mock.assert_not_called()
+
+    @patch("api.wait_for_latest")
+    @patch("api.schedule_downloads")
+    @patch("api.delete_files")
+    @patch("api.check_wallpapers_batch")
+    @patch("api.requests")
+    def test_region_selection(
+        self,
+        requests_mock: MagicMock,
+        check_mock: MagicMock,
+        delete_mock: MagicMock,
+        schedule_mock: MagicMock,
+        _: MagicMock,
+    ) -> None:
+        """
+        Only frames showing the region should be downloaded and kept
+        :return:
+        """
+        records = [
+            {**record, "centroid_coordinates": {"lat": 0.0, "lon": lon}}
+            for record, lon in zip(RECORDS, [20.0, -140.0, 40.0])
+        ]
+        mock_response(requests_mock, records)
+        check_mock.return_value = ("20240208041947.png", ["20240208041947.png"], [])
+        with patch("api.config") as config_mock:
+            config_mock.retention_enabled = False
+            config_mock.fleet_url = ""
+            config_mock.fleet_port = 0
+            config_mock.region = (0.0, 30.0)
+            config_mock.region_frames = 2
+            config_mock.region_max_angle = 90
+            check_new_data()
+        schedule_mock.assert_called_once_with([Record.from_json(records[2]), Record.from_json(records[0])])
+        self.assertListEqual([([],), (["20240208041947.png"],)], [c.args for c in delete_mock.call_args_list])
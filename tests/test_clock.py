@@ -0,0 +1,52 @@
+"""
+Test clock.py
+"""
+
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from clock import SimulatedClock, SystemClock, get_clock, set_clock
+
+
+class TestClock(TestCase):
+    """
+    Test system and simulated clocks
+    """
+
+    @patch("clock.time.sleep")
+    def test_system_clock_sleeps(self, sleep_mock: MagicMock) -> None:
+        """
+        System clock should block the thread
+        :param sleep_mock: mock sleep
+        :return:
+        """
+        SystemClock().sleep(5)
+        sleep_mock.assert_called_once_with(5)
+
+    @patch("clock.time.sleep")
+    def test_simulated_clock_advances(self, sleep_mock: MagicMock) -> None:
+        """
+        Simulated clock should move forward without blocking
+        :param sleep_mock: mock sleep
+        :return:
+        """
+        clock = SimulatedClock(1000.0)
+        clock.sleep(60)
+        clock.sleep(-5)
+        self.assertEqual(1060.0, clock.time())
+        self.assertEqual(60.0, clock.slept)
+        self.assertEqual(1060.0, clock.now().timestamp())
+        sleep_mock.assert_not_called()
+
+    def test_set_clock(self) -> None:
+        """
+        Replaced clock should be returned by get_clock until restored
+        :return:
+        """
+        clock = SimulatedClock(0.0)
+        previous = set_clock(clock)
+        try:
+            self.assertIs(clock, get_clock())
+        finally:
+            set_clock(previous)
+        self.assertIs(previous, get_clock())
@@ -0,0 +1,179 @@
+"""
+Test fleet.py
+"""
+
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import requests
+from parameterized import parameterized
+
+from fleet import FleetServer, parse_range, publish_manifest, save_manifest
+from image.cache import MAX_REQUESTED_KEYS, save_original
+from records import Record
+
+RECORDS = [{"image": "epic_1b_20240208003633", "date": "2024-02-08 00:31:45"}]
+
+
+def fake_process_image(
+    image_path: str, code: str, output_path: str | None = None, resolution: tuple[int, int] | None = None
+) -> None:
+    """
+    Replacement of process_image writing resolution and code
+    :param image_path: path to original
+    :param code: coded date and time
+    :param output_path: path to rendered image
+    :param resolution: size of rendered image
+    :return: None
+    """
+    with open(output_path or image_path, "wb") as fp:
+        fp.write(f"{resolution}-{code}".encode())
+
+
+class TestFleetServer(TestCase):
+    """
+    Test sharing of manifest and renders with other instances
+    """
+
+    def setUp(self) -> None:
+        """
+        Start server with manifest and one stored original
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        for target in ("fleet.config", "image.cache.config"):
+            config_mock = patch(target).start()
+            config_mock.data_path = self.directory.name
+            config_mock.resolution = (1920, 1080)
+            config_mock.source_quality = "auto"
+        self.process_mock = patch("image.cache.process_image", side_effect=fake_process_image).start()
+        save_original("20240208003145", b"original", "jpg")
+        save_manifest([Record.from_json(record) for record in RECORDS])
+        self.server = FleetServer(0, host="127.0.0.1")
+        self.server.start()
+
+    def tearDown(self) -> None:
+        """
+        Stop server and remove temporary folder
+        :return:
+        """
+        self.server.stop()
+        patch.stopall()
+        self.directory.cleanup()
+
+    @parameterized.expand(
+        [
+            ("bytes=0-3", (0, 3)),
+            ("bytes=4-", (4, 9)),
+            ("bytes=-3", (7, 9)),
+            ("bytes=5-100", (5, 9)),
+            ("bytes=0-1,4-5", None),
+            ("items=0-1", None),
+        ]
+    )  # type: ignore
+    def test_parse_range(self, header: str, expected: tuple[int, int] | None) -> None:
+        """
+        Single byte ranges should be clipped to file size, other ranges ignored
+        :param header: Range header
+        :param expected: first and last byte
+        :return:
+        """
+        self.assertEqual(expected, parse_range(header, 10))
+
+    def test_unsatisfiable_range(self) -> None:
+        """
+        Range starting after the end of file can't be satisfied
+        :return:
+        """
+        with self.assertRaises(ValueError):
+            parse_range("bytes=10-", 10)
+
+    def test_manifest(self) -> None:
+        """
+        Manifest should be returned with ETag and not sent again when it is not modified
+        :return:
+        """
+        response = requests.get(f"{self.server.url}/api/natural", timeout=5)
+        self.assertEqual(RECORDS, response.json())
+        cached = requests.get(
+            f"{self.server.url}/api/natural", headers={"If-None-Match": response.headers["ETag"]}, timeout=5
+        )
+        self.assertEqual(304, cached.status_code)
+        self.assertEqual(b"", cached.content)
+
+    def test_frame_not_stored_yet(self) -> None:
+        """
+        Manifest should list only stored frames, frame of the response which is still downloaded should get 503
+        :return:
+        """
+        pending = {"image": "epic_1b_20240208042436", "date": "2024-02-08 04:19:47"}
+        save_manifest([Record.from_json(record) for record in RECORDS + [pending]])
+        self.assertEqual(RECORDS, requests.get(f"{self.server.url}/api/natural", timeout=5).json())
+        url = f"{self.server.url}/renders/1280x720_jpg_v1/20240208041947.png"
+        self.assertEqual(503, requests.get(url, timeout=5).status_code)
+
+        save_original("20240208041947", b"original", "jpg")
+        publish_manifest()
+        self.assertEqual(RECORDS + [pending], requests.get(f"{self.server.url}/api/natural", timeout=5).json())
+        self.assertEqual(200, requests.get(url, timeout=5).status_code)
+
+    def test_render_on_request(self) -> None:
+        """
+        Frame should be rendered once per key and supported only when original is good enough
+        :return:
+        """
+        url = f"{self.server.url}/renders/1280x720_jpg_v1/20240208003145.png"
+        for _ in range(2):
+            response = requests.get(url, timeout=5)
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(b"(1280, 720)-20240208003145", response.content)
+        self.assertEqual(1, self.process_mock.call_count)
+
+        partial = requests.get(url, headers={"Range": "bytes=12-"}, timeout=5)
+        self.assertEqual(206, partial.status_code)
+        self.assertEqual(b"20240208003145", partial.content)
+        self.assertEqual("bytes 12-25/26", partial.headers["Content-Range"])
+        self.assertEqual(416, requests.get(url, headers={"Range": "bytes=26-"}, timeout=5).status_code)
+
+    def test_requested_keys_limit(self) -> None:
+        """
+        Only limited number of keys of other instances should be rendered, cached keys are still served
+        :return:
+        """
+        urls = [f"{self.server.url}/renders/{width}x720_jpg_v1/20240208003145.png" for width in range(1280, 1286)]
+        statuses = [requests.get(url, timeout=5).status_code for url in urls]
+        self.assertListEqual([200] * MAX_REQUESTED_KEYS + [404] * (len(urls) - MAX_REQUESTED_KEYS), statuses)
+        self.assertEqual(200, requests.get(urls[0], timeout=5).status_code)
+        self.assertEqual(MAX_REQUESTED_KEYS, self.process_mock.call_count)
+
+    def test_local_by_default(self) -> None:
+        """
+        Server should accept only local connections unless address is given
+        :return:
+        """
+        server = FleetServer(0)
+        server.start()
+        try:
+            self.assertTrue(server.url.startswith("http://127.0.0.1:"))
+        finally:
+            server.stop()
+
+    @parameterized.expand(
+        [
+            ["/renders/1920x1080_png_v1/20240208003145.png"],
+            ["/renders/1280x720_jpg_v0/20240208003145.png"],
+            ["/renders/99999x720_jpg_v1/20240208003145.png"],
+            ["/renders/1280x720_jpg_v1/20240209003145.png"],
+            ["/renders/../20240208003145.png"],
+            ["/archive/natural/2024/02/08/png/epic_1b_20240208003633.png"],
+        ]
+    )  # type: ignore
+    def test_not_found(self, path: str) -> None:
+        """
+        Frames without good enough original, other template versions, frames outside manifest and other paths
+        are not served
+        :param path: path of the request
+        :return:
+        """
+        self.assertEqual(404, requests.get(self.server.url + path, timeout=5).status_code)
+        self.process_mock.assert_not_called()
@@ -0,0 +1,85 @@
+"""
+Test journal.py
+"""
+
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from journal import JobJournal
+
+
+class TestJobJournal(TestCase):
+    """
+    Test journal of unfinished download jobs
+    """
+
+    def setUp(self) -> None:
+        """
+        Create journal in temporary folder
+        :return:
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "jobs.json")
+        self.journal = JobJournal(self.path)
+
+    def tearDown(self) -> None:
+        """
+        Remove temporary folder
+        :return:
+        """
+        self.directory.cleanup()
+
+    def test_progress(self) -> None:
+        """
+        Every change should be saved, adding job again shouldn't reset its progress
+        :return:
+        """
+        self.journal.add("20240208003145", "epic_1b_20240208003633")
+        self.journal.mark("20240208003145", "rendered")
+        self.journal.add("20240208003145", "epic_1b_20240208003633")
+        self.journal.add("20240208041947", "epic_1b_20240208042436")
+        self.assertEqual(
+            {
+                "20240208003145": {"image": "epic_1b_20240208003633", "state": "rendered"},
+                "20240208041947": {"image": "epic_1b_20240208042436", "state": "pending"},
+            },
+            JobJournal(self.path).entries,
+        )
+        self.journal.remove("20240208003145")
+        self.journal.mark("20240208003145", "downloaded")
+        self.assertListEqual(["20240208041947"], list(JobJournal(self.path).entries))
+
+    def test_add_many(self) -> None:
+        """
+        Batch of jobs should be saved at once and progress of known jobs kept
+        :return:
+        """
+        self.journal.add("20240208003145", "epic_1b_20240208003633")
+        self.journal.mark("20240208003145", "downloaded")
+        with patch.object(self.journal, "save", wraps=self.journal.save) as save_mock:
+            self.journal.add_many(
+                {"20240208003145": "epic_1b_20240208003633", "20240208041947": "epic_1b_20240208042436"}
+            )
+            self.journal.add_many({"20240208041947": "epic_1b_20240208042436"})
+        self.assertEqual(1, save_mock.call_count)
+        self.assertEqual(
+            {
+                "20240208003145": {"image": "epic_1b_20240208003633", "state": "downloaded"},
+                "20240208041947": {"image": "epic_1b_20240208042436", "state": "pending"},
+            },
+            JobJournal(self.path).entries,
+        )
+
+    def test_broken_journal(self) -> None:
+        """
+        Broken file and unknown states should be ignored
+        :return:
+        """
+        with open(self.path, "w", encoding="utf-8") as fp:
+            fp.write('{"20240208003145": {"image": "epic_1b", "state": "unknown"}}')
+        self.assertEqual({}, JobJournal(self.path).entries)
+        with open(self.path, "w", encoding="utf-8") as fp:
+            fp.write("[")
+        self.assertEqual({}, JobJournal(self.path).entries)
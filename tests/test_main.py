@@ -3,13 +3,22 @@ Test main.py
 """
 
 import os
+import signal
 from unittest import TestCase
 from unittest.mock import MagicMock, patch
 
 import parameterized
 
 from config import config
-from main import display_wallpapers
+from main import (
+    ShutdownRequest,
+    display_wallpapers,
+    handle_signal,
+    main,
+    parse_args,
+    run_command,
+    run_cycle,
+)
 
 
 class TestDisplayWallpapers(TestCase):
@@ -48,7 +57,7 @@ class TestDisplayWallpapers(TestCase):
 
         with (
             patch("main.ctypes.windll.user32.SystemParametersInfoW") as system_parameters_mock,
-            patch("main.time.sleep") as sleep_mock,
+            patch("clock.time.sleep") as sleep_mock,
             patch("main.os.listdir") as listdir_mock,
         ):
             filenames = [f"{i}.jpg" for i in range(number_of_files)]
@@ -71,7 +80,7 @@ class TestDisplayWallpapers(TestCase):
         """
         with (
             patch("main.ctypes.windll.user32.SystemParametersInfoW") as system_parameters_mock,
-            patch("main.time.sleep") as sleep_mock,
+            patch("clock.time.sleep") as sleep_mock,
             patch("main.os.listdir") as listdir_mock,
         ):
             listdir_mock.return_value = []
@@ -79,6 +88,36 @@ class TestDisplayWallpapers(TestCase):
             self.assertEqual(sleep_mock.call_count, 0)
             self.assertEqual(system_parameters_mock.call_count, 0)
 
+    @parameterized.parameterized.expand(
+        [
+            (300, 0, ["00.jpg", "01.jpg", "02.jpg"], 100),
+            (300, 1700, ["17.jpg", "00.jpg", "01.jpg"], 100),
+            (7200, 0, [f"{i % 18:02}.jpg" for i in range(72)], 100),
+            (30, 0, ["00.jpg"], 30),
+        ]
+    )  # type: ignore
+    def test_duration(self, duration: int, now: float, expected: list[str], delay_time: int) -> None:
+        """
+        Number of shown files should fit into the duration and rotation should follow the clock
+        :param duration: time until the next sync
+        :param now: current timestamp
+        :param expected: shown files
+        :param delay_time: expected arg for time.sleep()
+        :return:
+        """
+        setter = MagicMock()
+        with (
+            patch("main.get_clock") as clock_mock,
+            patch("main.os.listdir") as listdir_mock,
+        ):
+            clock_mock.return_value.time.return_value = now
+            listdir_mock.return_value = [f"{i:02}.jpg" for i in reversed(range(18))]
+            display_wallpapers(setter, duration)
+            self.assertListEqual(
+                [os.path.join(config.image_path, file) for file in expected], [c.args[0] for c in setter.call_args_list]
+            )
+            self.assertEqual(delay_time, clock_mock.return_value.sleep.call_args.args[0])
+
     @patch("main.delete_files")
     def test_system_parameters_side_effect(self, delete_files_mock: MagicMock) -> None:
         """
@@ -88,7 +127,7 @@ class TestDisplayWallpapers(TestCase):
         """
         with (
             patch("main.ctypes.windll.user32.SystemParametersInfoW") as system_parameters_mock,
-            patch("main.time.sleep") as sleep_mock,
+            patch("clock.time.sleep") as sleep_mock,
             patch("main.os.listdir") as listdir_mock,
         ):
             listdir_mock.return_value = ["not_existing_file_1.png", "not_existing_file_2.png"]
@@ -100,3 +139,171 @@ class TestDisplayWallpapers(TestCase):
             self.assertEqual(sleep_mock.call_count, 0)
             self.assertEqual(system_parameters_mock.call_count, 2)
             self.assertEqual(delete_files_mock.call_count, 2)
+
+    @patch("main.archive")
+    def test_retention_displays_latest_day(self, archive_mock: MagicMock) -> None:
+        """
+        In retention mode only frames of the latest day should be displayed and marked in archive
+        :param archive_mock: mock archive index
+        :return:
+        """
+        with (
+            patch("main.ctypes.windll.user32.SystemParametersInfoW") as system_parameters_mock,
+            patch("clock.time.sleep") as sleep_mock,
+            patch("main.os.listdir") as listdir_mock,
+            patch("main.config") as config_mock,
+        ):
+            config_mock.sync_interval = 1800
+            config_mock.retention_enabled = True
+            listdir_mock.return_value = ["20240101000000.png", "20240102000000.png", "20240102120000.png"]
+            display_wallpapers()
+            self.assertEqual(2, system_parameters_mock.call_count)
+            self.assertEqual(900, sleep_mock.call_args.args[0])
+            displayed = [call.args[0] for call in archive_mock.mark_displayed.call_args_list]
+            self.assertListEqual(["20240102000000.png", "20240102120000.png"], displayed)
+
+    @parameterized.parameterized.expand([(False,), (True,)])  # type: ignore
+    @patch("main.check_or_create_image_path")
+    @patch("main.check_new_data")
+    def test_published_frame_is_not_replaced(
+        self, adaptive_polling: bool, check_mock: MagicMock, *_: MagicMock
+    ) -> None:
+        """
+        Rotation should start with the newest frame published during sync instead of replacing it at once
+        :param adaptive_polling: adaptive polling is enabled
+        :param check_mock: mock check of new data
+        :return:
+        """
+        newest = os.path.join(config.image_path, "20240208041947.png")
+        check_mock.side_effect = lambda on_latest: on_latest(newest)
+        events = MagicMock()
+        with (
+            patch("main.get_clock") as clock_mock,
+            patch("main.os.listdir", return_value=["20240208003145.png", "20240208022546.png", "20240208041947.png"]),
+            patch("main.poller") as poller_mock,
+            patch("main.config") as config_mock,
+        ):
+            config_mock.image_path = config.image_path
+            config_mock.sync_interval = 1800
+            config_mock.retention_enabled = False
+            config_mock.adaptive_polling = adaptive_polling
+            poller_mock.next_delay.return_value = 1800
+            clock_mock.return_value.time.return_value = 0
+            clock_mock.return_value.sleep.side_effect = lambda seconds: events("sleep", seconds)
+            run_cycle(lambda path: events("set", os.path.basename(path)))
+        self.assertListEqual(
+            [
+                ("set", "20240208041947.png"),
+                ("sleep", 600),
+                ("set", "20240208003145.png"),
+                ("sleep", 600),
+                ("set", "20240208022546.png"),
+                ("sleep", 600),
+            ],
+            [c.args for c in events.call_args_list],
+        )
+
+
+class TestShutdown(TestCase):
+    """
+    Test graceful shutdown of the main loop
+    """
+
+    def test_handle_signal(self) -> None:
+        """
+        Signal should interrupt the main thread with its name
+        :return:
+        """
+        with self.assertRaisesRegex(ShutdownRequest, "SIGTERM"):
+            handle_signal(signal.SIGTERM, None)
+
+    @patch("main.install_signal_handlers")
+    @patch("main.prune_renders")
+    @patch("main.shutdown_downloads")
+    @patch("main.resume_downloads")
+    @patch("main.run_cycle", side_effect=[None, ShutdownRequest("SIGTERM")])
+    def test_main(
+        self,
+        run_cycle_mock: MagicMock,
+        resume_mock: MagicMock,
+        shutdown_mock: MagicMock,
+        *_: MagicMock,
+    ) -> None:
+        """
+        Unfinished jobs should be resumed before the first cycle and downloads stopped within timeout on shutdown
+        :return:
+        """
+        with patch("main.config") as config_mock:
+            config_mock.fleet_port = 0
+            config_mock.shutdown_timeout = 12
+            main()
+        resume_mock.assert_called_once_with()
+        self.assertEqual(2, run_cycle_mock.call_count)
+        shutdown_mock.assert_called_once_with(12)
+
+
+class TestCommands(TestCase):
+    """
+    Test command line interface
+    """
+
+    @parameterized.parameterized.expand(
+        [
+            ([], None, False),
+            (["--profile"], None, True),
+            (["sync", "--profile"], "sync", True),
+            (["--profile", "sync"], "sync", True),
+        ]
+    )  # type: ignore
+    @patch("main.main")
+    def test_sync(self, args: list[str], command: str | None, profiling: bool, main_mock: MagicMock) -> None:
+        """
+        Sync loop should be run by default and with sync command
+        :param args: command line arguments
+        :param command: parsed command
+        :param profiling: expected profiling mode
+        :param main_mock: mock main loop
+        :return:
+        """
+        arguments = parse_args(args)
+        self.assertEqual(command, arguments.command)
+        with patch("main.config") as config_mock:
+            config_mock.profiling = False
+            self.assertEqual(0, run_command(arguments))
+            self.assertEqual(profiling, config_mock.profiling)
+        main_mock.assert_called_once_with()
+
+    @patch("main.render_directory")
+    def test_render(self, render_mock: MagicMock) -> None:
+        """
+        Render command should pass options and fail when some frames failed
+        :param render_mock: mock batch render
+        :return:
+        """
+        render_mock.return_value = (["20240208003145"], [], ["20240208041947"])
+        arguments = parse_args(["render", "originals", "renders", "--resolution", "1280x720", "--workers", "2"])
+        with patch("builtins.print"):
+            self.assertEqual(1, run_command(arguments))
+        self.assertEqual(("originals", "renders"), render_mock.call_args.args)
+        self.assertEqual((1280, 720), render_mock.call_args.kwargs["resolution"])
+        self.assertEqual(2, render_mock.call_args.kwargs["workers"])
+
+    @patch("main.export_timelapse", side_effect=ValueError("No usable frames of day 20240209"))
+    def test_timelapse_without_frames(self, export_mock: MagicMock) -> None:
+        """
+        Time-lapse command should report missing frames with exit code instead of traceback
+        :param export_mock: mock export
+        :return:
+        """
+        with patch("builtins.print") as print_mock:
+            self.assertEqual(1, run_command(parse_args(["timelapse", "earth.webp", "--day", "20240209"])))
+        export_mock.assert_called_once_with("earth.webp", day="20240209")
+        self.assertIn("No usable frames of day 20240209", print_mock.call_args.args[0])
+
+    def test_invalid_resolution(self) -> None:
+        """
+        Resolution should be given as WIDTHxHEIGHT
+        :return:
+        """
+        with patch("sys.stderr"), self.assertRaises(SystemExit):
+            parse_args(["render", "originals", "renders", "--resolution", "1280"])
@@ -0,0 +1,112 @@
+"""
+Test polling.py
+"""
+
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from parameterized import parameterized
+
+from config import ONE_DAY
+from polling import PollScheduler, get_circular_distance
+
+HOUR = 60 * 60
+# arrivals at 8:00 on three days
+ARRIVALS = [10 * ONE_DAY + 8 * HOUR, 11 * ONE_DAY + 8 * HOUR, 12 * ONE_DAY + 8 * HOUR]
+
+
+class TestPollScheduler(TestCase):
+    """
+    Test learning of arrival times and delay of the next poll
+    """
+
+    def setUp(self) -> None:
+        """
+        Create scheduler with history in temporary folder
+        :return:
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "poll_history.json")
+        self.poller = PollScheduler(path=self.path)
+
+    def tearDown(self) -> None:
+        """
+        Remove temporary folder
+        :return:
+        """
+        self.directory.cleanup()
+
+    def test_get_circular_distance(self) -> None:
+        """
+        Distance should be measured across midnight
+        :return:
+        """
+        self.assertEqual(20 * 60, get_circular_distance(23 * HOUR + 50 * 60, 10 * 60))
+        self.assertEqual(2 * HOUR, get_circular_distance(8 * HOUR, 10 * HOUR))
+
+    def test_observe(self) -> None:
+        """
+        Arrival should be recorded only when newer data are seen after the first poll and history should be saved
+        :return:
+        """
+        self.assertTrue(self.poller.observe("20240208003145", now=100.0))
+        self.assertListEqual([], self.poller.history["arrivals"])
+        self.assertFalse(self.poller.observe("20240208003145", now=200.0))
+        self.assertTrue(self.poller.observe("20240209003145", now=300.0))
+        self.assertListEqual([300.0], self.poller.history["arrivals"])
+        self.assertEqual({"last_code": "20240209003145", "arrivals": [300.0]}, PollScheduler(path=self.path).history)
+
+    def test_history_size(self) -> None:
+        """
+        Only the newest arrivals should be kept
+        :return:
+        """
+        poller = PollScheduler(path=self.path, history_size=2)
+        for day in range(8, 12):
+            poller.observe(f"202402{day:02}003145", now=float(day))
+        self.assertListEqual([10.0, 11.0], poller.history["arrivals"])
+
+    @patch("polling.config")
+    def test_no_history(self, config_mock: MagicMock) -> None:
+        """
+        Sync interval should be used until the first arrival is seen
+        :param config_mock: mock config
+        :return:
+        """
+        config_mock.sync_interval = 1800
+        self.assertEqual(1800, self.poller.next_delay(now=ARRIVALS[0]))
+
+    @parameterized.expand(
+        [
+            # expected window, data didn't come yet
+            (13 * ONE_DAY + 7 * HOUR + 30 * 60, 5 * 60),
+            (13 * ONE_DAY + 8 * HOUR + 40 * 60, 5 * 60),
+            # the next window is far, the maximum delay is used
+            (13 * ONE_DAY + 1 * HOUR, 2 * HOUR),
+            # the next window starts in 30 minutes
+            (13 * ONE_DAY + 6 * HOUR + 45 * 60, 30 * 60),
+            # data arrived today, poll again before tomorrow's window
+            (12 * ONE_DAY + 8 * HOUR + 10 * 60, 2 * HOUR),
+            (12 * ONE_DAY + 8 * HOUR + 30 * 60, 2 * HOUR),
+        ]
+    )  # type: ignore
+    def test_next_delay(self, now: float, expected: int) -> None:
+        """
+        Polls should be frequent around past arrivals and rare otherwise
+        :param now: current timestamp
+        :param expected: delay in seconds
+        :return:
+        """
+        self.poller.history["arrivals"] = list(ARRIVALS)
+        self.assertEqual(expected, self.poller.next_delay(now=now))
+
+    def test_broken_history(self) -> None:
+        """
+        Broken history file should be ignored
+        :return:
+        """
+        with open(self.path, "w", encoding="utf-8") as fp:
+            fp.write("{")
+        self.assertEqual({"last_code": "", "arrivals": []}, self.poller.history)
@@ -0,0 +1,99 @@
+"""
+Test records.py
+"""
+
+import json
+from typing import Any
+from unittest import TestCase
+
+from parameterized import parameterized
+
+from records import Record, iter_json_array
+
+DOCUMENT: list[Any] = [
+    {"image": "epic_1b_20240208003633", "date": "2024-02-08 00:31:45", "caption": "Zdjęcie Ziemi"},
+    {"image": "epic_1b_20240208042436", "date": "2024-02-08 04:19:47", "centroid_coordinates": {"lat": 1, "lon": 2}},
+    [1, 2.5, None, True],
+    12345,
+    "text with ] and , inside",
+]
+
+
+class TestRecords(TestCase):
+    """
+    Test compact records and streaming parser
+    """
+
+    @parameterized.expand([(1,), (3,), (64,), (10_000,)])  # type: ignore
+    def test_iter_json_array(self, chunk_size: int) -> None:
+        """
+        Items should be parsed regardless of where chunks are split, also inside multibyte characters
+        :param chunk_size: size of chunks in bytes
+        :return:
+        """
+        content = json.dumps(DOCUMENT, ensure_ascii=False, indent=1).encode()
+        chunks = [content[index : index + chunk_size] for index in range(0, len(content), chunk_size)]
+        self.assertListEqual(DOCUMENT, list(iter_json_array(chunks)))
+
+    def test_items_are_yielded_early(self) -> None:
+        """
+        Item should be yielded before the rest of the document is received
+        :return:
+        """
+        items = iter_json_array(iter([b'[{"a": 1}, {"b"', b": 2}]"]))
+        self.assertEqual({"a": 1}, next(items))
+        self.assertEqual({"b": 2}, next(items))
+
+    @parameterized.expand(
+        [
+            ([b"[1.", b"5]"], [1.5]),
+            ([b"[1e", b"3]"], [1000.0]),
+            ([b"[-", b"2.5E-", b"1, 3", b"0]"], [-0.25, 30]),
+            ([b"[tr", b"ue, nu", b"ll]"], [True, None]),
+        ]
+    )  # type: ignore
+    def test_split_scalars(self, chunks: list[bytes], expected: list[Any]) -> None:
+        """
+        Number or literal split between chunks should be decoded as a whole
+        :param chunks: parts of the document
+        :param expected: items
+        :return:
+        """
+        self.assertListEqual(expected, list(iter_json_array(chunks)))
+
+    @parameterized.expand([(b"",), (b"[]",), (b"  [ ]  ",)])  # type: ignore
+    def test_empty(self, content: bytes) -> None:
+        """
+        Empty array should yield nothing, empty document is incomplete
+        :param content: document
+        :return:
+        """
+        if content:
+            self.assertListEqual([], list(iter_json_array([content])))
+        else:
+            with self.assertRaises(ValueError):
+                list(iter_json_array([content]))
+
+    @parameterized.expand([(b'{"a": 1}',), (b"[1 2]",), (b"[1, 2",), (b'[{"a": 1}',)])  # type: ignore
+    def test_invalid(self, content: bytes) -> None:
+        """
+        Documents which are not complete arrays should raise ValueError
+        :param content: document
+        :return:
+        """
+        with self.assertRaises(ValueError):
+            list(iter_json_array([content]))
+
+    def test_record(self) -> None:
+        """
+        Record should keep only used fields and convert back to API format
+        :return:
+        """
+        record = Record.from_json(DOCUMENT[1])
+        self.assertEqual(Record("epic_1b_20240208042436", "20240208041947", 1, 2), record)
+        self.assertEqual(DOCUMENT[1], record.to_json())
+        self.assertEqual(
+            {k: v for k, v in DOCUMENT[0].items() if k != "caption"}, Record.from_json(DOCUMENT[0]).to_json()
+        )
+        with self.assertRaises(AttributeError):
+            record.caption = "caption"  # type: ignore[attr-defined]
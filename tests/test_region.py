@@ -0,0 +1,72 @@
+"""
+Test region.py
+"""
+
+from unittest import TestCase
+
+import numpy as np
+from parameterized import parameterized
+
+from records import Record
+from region import get_angular_distances, select_records
+
+
+def make_record(code: str, lat: float, lon: float) -> Record:
+    """
+    Create API record with centroid coordinates
+    :param code: coded date and time
+    :param lat: latitude of the centre of the frame
+    :param lon: longitude of the centre of the frame
+    :return: record
+    """
+    return Record(f"epic_1b_{code}", code, lat, lon)
+
+
+RECORDS = [
+    make_record("20240208003145", 0.0, 170.0),
+    make_record("20240208041947", 0.0, 100.0),
+    make_record("20240208081011", 0.0, 30.0),
+    make_record("20240208120000", 0.0, -30.0),
+    make_record("20240208160000", 0.0, -100.0),
+]
+
+
+class TestRegion(TestCase):
+    """
+    Test selection of frames by distance to the region
+    """
+
+    def test_get_angular_distances(self) -> None:
+        """
+        Distance should be measured on the sphere and be 180 degrees for records without coordinates
+        :return:
+        """
+        records = [
+            *RECORDS[:3],
+            Record("epic_1b_20240208200000", "20240208200000"),
+            make_record("20240208220000", 90.0, 0.0),
+        ]
+        distances = get_angular_distances(records, 0.0, 20.0)
+        np.testing.assert_allclose([150.0, 80.0, 10.0, 180.0, 90.0], distances, atol=1e-9)
+        np.testing.assert_allclose([20.0], get_angular_distances(RECORDS[:1], 0.0, -170.0), atol=1e-9)
+        self.assertEqual((0,), get_angular_distances([], 0.0, 0.0).shape)
+
+    @parameterized.expand(
+        [
+            (0, 0, [0, 1, 2, 3, 4]),
+            (2, 0, [2, 3]),
+            (0, 60, [2, 3]),
+            (1, 60, [2]),
+            (3, 5, []),
+        ]
+    )  # type: ignore
+    def test_select_records(self, max_frames: int, max_angle: int, expected: list[int]) -> None:
+        """
+        Closest frames within the angle should be selected and returned in original order
+        :param max_frames: number of frames
+        :param max_angle: maximum distance
+        :param expected: indexes of selected records
+        :return:
+        """
+        selected = select_records(RECORDS, (10.0, 20.0), max_frames=max_frames, max_angle=max_angle)
+        self.assertListEqual([RECORDS[index] for index in expected], selected)
@@ -0,0 +1,156 @@
+"""
+Test scheduler.py
+"""
+
+import threading
+import time
+from concurrent.futures import CancelledError
+from unittest import TestCase
+
+from scheduler import JobScheduler, check_timeout, start_timeout
+
+
+class TestJobScheduler(TestCase):
+    """
+    Test priority job scheduler
+    """
+
+    def setUp(self) -> None:
+        """
+        Create scheduler with single worker so order of jobs is deterministic
+        """
+        self.scheduler = JobScheduler(max_workers=1, name="TestWorker")
+        self.gate = threading.Event()
+        self.order: list[str] = []
+
+    def tearDown(self) -> None:
+        """
+        Stop workers
+        :return:
+        """
+        self.gate.set()
+        self.scheduler.shutdown(cancel_pending=True, timeout=5)
+
+    def block(self) -> None:
+        """
+        Job blocking the worker until gate is opened
+        :return:
+        """
+        self.gate.wait(5)
+
+    def record(self, name: str) -> str:
+        """
+        Job saving order of execution
+        :param name: name to be saved
+        :return: name
+        """
+        self.order.append(name)
+        return name
+
+    def test_jobs_are_run_by_priority(self) -> None:
+        """
+        Jobs waiting in queue should be run from the lowest priority value
+        :return:
+        """
+        self.scheduler.submit("block", self.block)
+        futures = [
+            self.scheduler.submit(name, self.record, priority=priority, name=name)
+            for name, priority in [("old", 2), ("newest", 0), ("middle", 1)]
+        ]
+        self.gate.set()
+        self.assertListEqual(["old", "newest", "middle"], [future.result(timeout=5) for future in futures])
+        self.assertListEqual(["newest", "middle", "old"], self.order)
+
+    def test_duplicated_key(self) -> None:
+        """
+        Job with key which is already scheduled should not be added again
+        :return:
+        """
+        self.scheduler.submit("block", self.block)
+        first = self.scheduler.submit("job", self.record, name="first")
+        second = self.scheduler.submit("job", self.record, name="second")
+        self.assertIs(first, second)
+        self.assertListEqual(["block", "job"], self.scheduler.pending())
+        self.gate.set()
+        self.assertEqual("first", second.result(timeout=5))
+
+    def test_cancel(self) -> None:
+        """
+        Waiting job can be cancelled and is never run
+        :return:
+        """
+        self.scheduler.submit("block", self.block)
+        future = self.scheduler.submit("job", self.record, name="job")
+        self.assertTrue(self.scheduler.cancel("job"))
+        self.assertFalse(self.scheduler.cancel("not_existing"))
+        self.gate.set()
+        with self.assertRaises(CancelledError):
+            future.result(timeout=5)
+        self.scheduler.submit("last", self.record, name="last").result(timeout=5)
+        self.assertListEqual(["last"], self.order)
+
+    def test_timeout(self) -> None:
+        """
+        Job running longer than timeout should fail with TimeoutError, but it should stay registered until it returns
+        so it isn't run twice at once
+        :return:
+        """
+        future = self.scheduler.submit("block", self.block, timeout=0.05)
+        with self.assertRaises(TimeoutError):
+            future.result(timeout=5)
+        self.assertIs(future, self.scheduler.submit("block", self.record, name="second"))
+        self.assertListEqual(["block"], self.scheduler.pending())
+        self.gate.set()
+        self.assertTrue(self.scheduler.wait(5))
+        self.scheduler.shutdown(timeout=5)
+        self.assertListEqual([], self.scheduler.pending())
+        self.assertListEqual([], self.order)
+
+    def test_deferred_timeout(self) -> None:
+        """
+        Deferred timeout should start when the job starts it and the job should be able to stop when it is exceeded
+        :return:
+        """
+        checks: list[float] = []
+
+        def transfer() -> str:
+            # waiting for a free transfer slot is not counted
+            time.sleep(0.1)
+            start_timeout()
+            while True:
+                check_timeout()
+                checks.append(time.monotonic())
+                time.sleep(0.01)
+
+        future = self.scheduler.submit("transfer", transfer, timeout=0.05, defer_timeout=True)
+        with self.assertRaises(TimeoutError):
+            future.result(timeout=5)
+        self.scheduler.shutdown(timeout=5)
+        self.assertListEqual([], self.scheduler.pending())
+        self.assertGreater(len(checks), 1)
+        check_timeout()
+
+    def test_exception(self) -> None:
+        """
+        Exception raised by job should be set on its future and worker should continue
+        :return:
+        """
+
+        def fail() -> None:
+            raise ValueError("broken job")
+
+        future = self.scheduler.submit("fail", fail)
+        with self.assertRaises(ValueError):
+            future.result(timeout=5)
+        self.assertEqual("next", self.scheduler.submit("next", self.record, name="next").result(timeout=5))
+
+    def test_shutdown_drains_queue(self) -> None:
+        """
+        Shutdown without cancel should finish waiting jobs
+        :return:
+        """
+        self.scheduler.submit("sleep", time.sleep, secs=0.01)
+        future = self.scheduler.submit("job", self.record, name="job")
+        self.scheduler.shutdown(timeout=5)
+        self.assertTrue(future.done())
+        self.assertListEqual(["job"], self.order)
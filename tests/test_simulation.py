@@ -0,0 +1,46 @@
+"""
+Test simulation.py
+"""
+
+import datetime
+from unittest import TestCase
+
+from simulation import (
+    FRAMES_PER_DAY,
+    PUBLISH_DELAY,
+    LocalEpicServer,
+    simulate,
+    to_timestamp,
+)
+
+START = to_timestamp(datetime.datetime(2024, 2, 10, 12, 0))
+
+
+class TestSimulation(TestCase):
+    """
+    Test local API stand-in and simulated sync cycles
+    """
+
+    def test_records(self) -> None:
+        """
+        API should return frames of the latest published day only
+        :return:
+        """
+        records = LocalEpicServer.records(START)
+        self.assertEqual(FRAMES_PER_DAY, len(records))
+        self.assertTrue(all(record["image"].startswith("epic_1b_20240209") for record in records))
+        records = LocalEpicServer.records(to_timestamp(datetime.datetime(2024, 2, 8)) + PUBLISH_DELAY)
+        self.assertTrue(records[0]["date"].startswith("2024-02-08"))
+
+    def test_simulate(self) -> None:
+        """
+        Published day should be downloaded in the first cycle and not again until the next day is published
+        :return:
+        """
+        reports = simulate(days=0.25, start=START, image_size=64)
+        self.assertGreater(len(reports), 1)
+        self.assertGreater(reports[0].downloaded_bytes, 0)
+        self.assertIsNotNone(reports[0].latency)
+        for report in reports[1:]:
+            self.assertIsNone(report.latency)
+            self.assertLess(report.downloaded_bytes, reports[0].downloaded_bytes)
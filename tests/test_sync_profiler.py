@@ -0,0 +1,84 @@
+"""
+Test sync_profiler.py
+"""
+
+import os
+import pstats
+import tempfile
+import tracemalloc
+from unittest import TestCase
+from unittest.mock import patch
+
+from sync_profiler import CycleProfiler
+
+
+class TestCycleProfiler(TestCase):
+    """
+    Test profiling of sync cycles
+    """
+
+    def setUp(self) -> None:
+        """
+        Create profiler saving reports to temporary folder
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.profiler = CycleProfiler(self.directory.name, keep_cycles=2, top_allocations=3)
+        self.config_patch = patch("sync_profiler.config")
+        self.config_mock = self.config_patch.start()
+
+    def tearDown(self) -> None:
+        """
+        Remove temporary folder
+        :return:
+        """
+        self.config_patch.stop()
+        self.directory.cleanup()
+
+    def test_disabled(self) -> None:
+        """
+        Disabled profiler should call function directly and save nothing
+        :return:
+        """
+        self.config_mock.profiling = False
+        self.profiler.start_cycle()
+        with patch.object(self.profiler, "_run") as run_mock:
+            self.assertEqual(3, self.profiler.profile(sum)([1, 2]))
+            run_mock.assert_not_called()
+        self.assertListEqual([], os.listdir(self.directory.name))
+
+    def test_reports_are_saved(self) -> None:
+        """
+        Every profiled call should save pstats and allocation report, nested calls are not profiled separately
+        :return:
+        """
+        self.config_mock.profiling = True
+        self.profiler.start_cycle()
+
+        @self.profiler.profile
+        def inner() -> list[int]:
+            return list(range(1000))
+
+        @self.profiler.profile
+        def outer() -> int:
+            return len(inner())
+
+        self.assertEqual(1000, outer())
+        self.assertFalse(tracemalloc.is_tracing())
+        cycle_path = os.path.join(self.directory.name, self.profiler.cycle)
+        files = sorted(os.listdir(cycle_path))
+        self.assertListEqual(["outer_0000_MainThread.pstats", "outer_0000_MainThread_allocations.txt"], files)
+        stats = pstats.Stats(os.path.join(cycle_path, files[0]))
+        self.assertTrue(any(function[2] == "inner" for function in stats.stats))  # type: ignore[attr-defined]
+
+    def test_rotation(self) -> None:
+        """
+        Only the newest cycles should be kept
+        :return:
+        """
+        self.config_mock.profiling = True
+        cycles = []
+        for _ in range(4):
+            self.profiler.start_cycle()
+            self.profiler.profile(sum)([1])
+            cycles.append(self.profiler.cycle)
+        self.assertListEqual(cycles[-2:], sorted(os.listdir(self.directory.name)))
@@ -0,0 +1,106 @@
+"""
+Test throttle.py
+"""
+
+import datetime
+import threading
+import time
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from parameterized import parameterized
+
+from clock import SimulatedClock, set_clock
+from throttle import BandwidthLimiter, is_bulk_allowed, is_in_window
+
+
+class TestThrottle(TestCase):
+    """
+    Test download window and bandwidth limiter
+    """
+
+    @parameterized.expand(
+        [
+            (23, (22, 6), True),
+            (3, (22, 6), True),
+            (6, (22, 6), False),
+            (12, (22, 6), False),
+            (1, (1, 5), True),
+            (5, (1, 5), False),
+            (17, (0, 0), True),
+        ]
+    )  # type: ignore
+    def test_is_in_window(self, hour: int, window: tuple[int, int], expected: bool) -> None:
+        """
+        Window should be able to pass midnight
+        :param hour: hour of the day
+        :param window: first hour and hour after the window
+        :param expected: result
+        :return:
+        """
+        self.assertEqual(expected, is_in_window(hour, window))
+
+    @patch("throttle.config")
+    def test_is_bulk_allowed(self, config_mock: MagicMock) -> None:
+        """
+        Window should be checked with the app clock
+        :param config_mock: mock config
+        :return:
+        """
+        config_mock.bulk_hours = (22, 6)
+        previous = set_clock(SimulatedClock(datetime.datetime(2024, 2, 8, 12).timestamp()))
+        try:
+            self.assertFalse(is_bulk_allowed())
+            config_mock.bulk_hours = None
+            self.assertTrue(is_bulk_allowed())
+        finally:
+            set_clock(previous)
+
+    @patch("throttle.time")
+    @patch("throttle.config")
+    def test_consume(self, config_mock: MagicMock, time_mock: MagicMock) -> None:
+        """
+        Bucket should hold one second of tokens and make transfers wait for missing ones
+        :param config_mock: mock config
+        :param time_mock: mock time
+        :return:
+        """
+        config_mock.download_rate = 1000
+        time_mock.monotonic.return_value = 0.0
+        limiter = BandwidthLimiter()
+        time_mock.monotonic.return_value = 10.0
+        self.assertEqual(0.0, limiter.consume(600))
+        self.assertEqual(0.5, limiter.consume(900))
+        time_mock.monotonic.return_value = 10.5
+        self.assertEqual(0.5, limiter.consume(500))
+        time_mock.sleep.assert_called_with(0.5)
+        config_mock.download_rate = 0
+        self.assertEqual(0.0, limiter.consume(10**9))
+
+    @patch("throttle.config")
+    def test_max_transfers(self, config_mock: MagicMock) -> None:
+        """
+        Number of concurrent transfers shouldn't exceed the limit
+        :param config_mock: mock config
+        :return:
+        """
+        config_mock.max_transfers = 2
+        limiter = BandwidthLimiter()
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        def transfer() -> None:
+            with limiter.transfer():
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+                time.sleep(0.02)
+                with lock:
+                    active[0] -= 1
+
+        threads = [threading.Thread(target=transfer) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(2, peak[0])
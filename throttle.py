@@ -0,0 +1,91 @@
+"""
+Bandwidth limits of downloads
+"""
+
+import contextlib
+import threading
+import time
+from typing import Iterator
+
+from clock import get_clock
+from config import config
+
+
+def is_in_window(hour: int, window: tuple[int, int]) -> bool:
+    """
+    Check if hour is in the daily window, window can pass midnight
+    :param hour: hour of the day
+    :param window: first hour and hour after the window e.g. (22, 6) for 22:00-6:00, equal hours mean the whole day
+    :return: True if hour is in the window
+    """
+    start, end = window
+    if start == end:
+        return True
+    if start < end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+def is_bulk_allowed() -> bool:
+    """
+    Check if bulk transfers (image downloads) are allowed now, small API requests are allowed at any time
+    :return: True if there is no bulk window or current hour is in it
+    """
+    return config.bulk_hours is None or is_in_window(get_clock().now().hour, config.bulk_hours)
+
+
+class BandwidthLimiter:
+    """
+    Limits total rate of downloads with a token bucket and number of concurrent transfers
+
+    Limits are read from config on every use so they can be changed at runtime. A transfer takes tokens for every
+    received chunk, when the bucket runs out the thread sleeps until the debt is paid, so the rate is shared by all
+    transfers. The bucket holds at most one second of tokens.
+    """
+
+    def __init__(self) -> None:
+        """
+        Init limiter with empty bucket
+        """
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self._active = 0
+        self._condition = threading.Condition()
+
+    @contextlib.contextmanager
+    def transfer(self) -> Iterator[None]:
+        """
+        Context of a single transfer, waits while the maximum number of transfers is running
+        :return: context manager
+        """
+        with self._condition:
+            while config.max_transfers and self._active >= config.max_transfers:
+                self._condition.wait()
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                self._condition.notify()
+
+    def consume(self, amount: int) -> float:
+        """
+        Take tokens for received bytes, sleep when the rate is exceeded
+        :param amount: number of bytes
+        :return: time of sleeping in seconds
+        """
+        rate = config.download_rate
+        if not rate:
+            return 0.0
+        with self._condition:
+            now = time.monotonic()
+            self._tokens = min(self._tokens + (now - self._updated) * rate, rate) - amount
+            self._updated = now
+            delay = -self._tokens / rate if self._tokens < 0 else 0.0
+        if delay:
+            time.sleep(delay)
+        return delay
+
+
+limiter = BandwidthLimiter()